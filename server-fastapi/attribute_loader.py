@@ -1,8 +1,10 @@
 #attribute_loader.py
-import requests
 import time
 import os
 import socket
+import threading
+
+from solr_client import SOLR_BASE, collection_url, get_sync_session
 
 #CACHE = None
 LAST_REFRESH = 0
@@ -15,6 +17,33 @@ LAST_REFRESH_ORDERS = 0
 # Dynamic defaults
 DEFAULT_COLLECTION = os.getenv("SOLR_COLLECTION", "products")
 
+# One in-flight load per collection; concurrent callers (startup warm-up,
+# NLU init, request handlers) wait for it and then read the cache
+_LOAD_LOCKS = {}
+_LOAD_LOCKS_GUARD = threading.Lock()
+
+
+def _collection_lock(collection: str) -> threading.RLock:
+    with _LOAD_LOCKS_GUARD:
+        return _LOAD_LOCKS.setdefault(collection, threading.RLock())
+
+# Callbacks fired after a successful facet (re)load: fn(collection, facets)
+_REFRESH_LISTENERS = []
+
+
+def register_refresh_listener(fn):
+    """Register a callback to run whenever a collection's facets are reloaded."""
+    if fn not in _REFRESH_LISTENERS:
+        _REFRESH_LISTENERS.append(fn)
+
+
+def _notify_refresh(collection: str, facets: dict):
+    for fn in list(_REFRESH_LISTENERS):
+        try:
+            fn(collection, facets)
+        except Exception as e:
+            print(f"[WARN] Facet refresh listener failed: {e}")
+
 def get_solr_host():
     """Auto-detect host (works both in Docker and local)."""
     try:
@@ -27,29 +56,26 @@ SOLR_HOST = "localhost"#os.getenv("SOLR_HOST", get_solr_host())
 
 def load_facet_values(collection: str = DEFAULT_COLLECTION, force_refresh=False):
     """Load Solr facets on demand. Cached to avoid repeated hits."""
+    with _collection_lock(collection):
+        return _load_facet_values_locked(collection, force_refresh)
+
+
+def _load_facet_values_locked(collection: str, force_refresh: bool):
     global CACHE_PRODUCTS, LAST_REFRESH_PRODUCTS
 
     # ✅ Only refresh if cache expired or forced
 #    if CACHE_PRODUCTS is not None and not force_refresh and (time.time() - LAST_REFRESH < CACHE_TTL):
 #        return CACHE_PRODUCTS
-    if CACHE_PRODUCTS is not None and not force_refresh and (time.time() - LAST_REFRESH_PRODUCTS < CACHE_TTL):
+    is_default = collection == DEFAULT_COLLECTION
+    if is_default and CACHE_PRODUCTS is not None and not force_refresh and (time.time() - LAST_REFRESH_PRODUCTS < CACHE_TTL):
         return CACHE_PRODUCTS
 
-    session = requests.Session()
-    session.verify = False
-
-    solr_base = f"https://{SOLR_HOST}:8983/solr/{collection}"
-    solr_url = f"{solr_base}/select"
-    schema_url = f"{solr_base}/schema/fields"
-    
-    SOLR_USER = os.getenv("SOLR_USER", "solr")
-    SOLR_PASS = os.getenv("SOLR_PASS", "SolrRocks")
-
-    session = requests.Session()
-    session.auth = (SOLR_USER, SOLR_PASS)
-    session.verify = False
+    # Shared keep-alive session (solr_client.py)
+    session = get_sync_session()
+    solr_url = collection_url(collection, "select")
+    schema_url = collection_url(collection, "schema/fields")
 
-    print(f"[INFO] Loading facets from Solr collection '{collection}' via {SOLR_HOST} ...")
+    print(f"[INFO] Loading facets from Solr collection '{collection}' via {SOLR_BASE} ...")
 
     try:
         schema_resp = session.get(schema_url, timeout=5)
@@ -69,7 +95,10 @@ def load_facet_values(collection: str = DEFAULT_COLLECTION, force_refresh=False)
         data = response.json()
         facets = data.get("facet_counts", {}).get("facet_fields", {})
         CACHE = {k: [facets[k][i] for i in range(0, len(facets[k]), 2)] for k in facets}
-        LAST_REFRESH_PRODUCTS = time.time()
+        if is_default:
+            CACHE_PRODUCTS = CACHE
+            LAST_REFRESH_PRODUCTS = time.time()
+        _notify_refresh(collection, CACHE)
         return CACHE
     except Exception as e:
         print(f"[WARN] Solr facet load failed: {e}")
@@ -85,6 +114,11 @@ def clear_cache():
     
 def load_order_facets(force_refresh=False):
     """Load facets from the 'orderHistory' Solr collection (separate cache)."""
+    with _collection_lock("orderHistory"):
+        return _load_order_facets_locked(force_refresh)
+
+
+def _load_order_facets_locked(force_refresh: bool):
     global CACHE_ORDERS, LAST_REFRESH_ORDERS
 
     if CACHE_ORDERS is not None and not force_refresh and (time.time() - LAST_REFRESH_ORDERS < CACHE_TTL):
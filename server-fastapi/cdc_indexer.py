@@ -0,0 +1,322 @@
+# cdc_indexer.py
+# ================================================
+# Change capture: keeps Solr in step with rows changed directly in MySQL
+# (admin tools, imports, SQL fixes) - not only orders created through
+# create_order.
+#
+# Every CDC_POLL_SECONDS each source table is read past its watermark
+# (updated_at, primary key):
+#     WHERE updated_at >= ts AND (updated_at > ts OR pk > last_pk)
+#     ORDER BY updated_at, pk LIMIT n
+# so rows sharing one timestamp are neither skipped nor re-read. Rows
+# newer than NOW() - CDC_LAG_SECONDS are left for the next poll, since a
+# transaction still open may commit with an older updated_at.
+#
+#   order_header / order_item -> orderHistory docs (order_items.build_order_docs)
+#   CDC_PRODUCT_TABLE         -> products docs (one doc per row, as the
+#                                Spark ETL writes them), then the orders
+#                                containing those products are
+#                                re-denormalized
+#
+# A SHA-1 of each doc (minus updated_at) is kept next to the watermarks
+# in a local SQLite file; docs whose content did not change are skipped,
+# the rest go to Solr in bulk. Watermarks and hashes are saved only after
+# Solr accepted the batch (at-least-once).
+#
+#   python cdc_indexer.py            # poll forever; MySQL/Solr errors are
+#                                    # logged and retried with backoff
+#   python cdc_indexer.py --once     # one pass (cron); exits 1 on error
+#
+# Needs an updated_at column (ON UPDATE CURRENT_TIMESTAMP) and an index
+# on (updated_at, pk) on each table. Deleted rows are not detected.
+# ================================================
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from db.mysql_client import get_pooled_connection
+from order_items import default_serializer
+from solr_query import UNIQUE_KEY
+from tasks.order_indexer import INDEX_BATCH_SIZE, _load_orders, post_to_solr, redenormalize_products
+
+CDC_STATE_PATH = os.getenv("CDC_STATE_PATH", "cdc_state.sqlite3")
+CDC_POLL_SECONDS = float(os.getenv("CDC_POLL_SECONDS", "2"))
+CDC_LAG_SECONDS = int(os.getenv("CDC_LAG_SECONDS", "1"))
+CDC_BATCH_SIZE = int(os.getenv("CDC_BATCH_SIZE", "1000"))     # rows read per source per query
+CDC_PRODUCT_TABLE = os.getenv("CDC_PRODUCT_TABLE", "")        # "" = products not in MySQL (CSV ETL)
+CDC_PRODUCT_PK = os.getenv("CDC_PRODUCT_PK", "id")
+CDC_MAX_BACKOFF_SECONDS = float(os.getenv("CDC_MAX_BACKOFF_SECONDS", "60"))
+CDC_HASH_IGNORE = {"updated_at", "_version_"}
+
+Watermark = Tuple[Optional[datetime.datetime], Optional[str]]
+
+
+# --------------------------------------------------------
+# Checkpoint store (SQLite)
+# --------------------------------------------------------
+class CheckpointStore:
+    def __init__(self, path: str = CDC_STATE_PATH):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS watermarks (
+                source TEXT PRIMARY KEY, updated_at TEXT, pk TEXT
+            );
+            CREATE TABLE IF NOT EXISTS doc_hashes (
+                collection TEXT, id TEXT, hash TEXT, PRIMARY KEY (collection, id)
+            );
+        """)
+
+    def watermark(self, source: str) -> Optional[Watermark]:
+        row = self._db.execute(
+            "SELECT updated_at, pk FROM watermarks WHERE source = ?", (source,)
+        ).fetchone()
+        if row is None:
+            return None
+        ts = datetime.datetime.fromisoformat(row[0]) if row[0] else None
+        return ts, row[1]
+
+    def hashes(self, collection: str, ids: List[str]) -> Dict[str, str]:
+        found: Dict[str, str] = {}
+        for i in range(0, len(ids), 500):  # SQLite variable limit
+            chunk = ids[i:i + 500]
+            rows = self._db.execute(
+                f"SELECT id, hash FROM doc_hashes WHERE collection = ? AND id IN ({', '.join('?' * len(chunk))})",
+                (collection, *chunk),
+            )
+            found.update(dict(rows.fetchall()))
+        return found
+
+    def save(self, watermarks: Dict[str, Watermark], hashes: Dict[str, Dict[str, str]]) -> None:
+        """Watermarks and doc hashes in one transaction."""
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO watermarks (source, updated_at, pk) VALUES (?, ?, ?)",
+                [(src, str(ts) if ts else None, pk) for src, (ts, pk) in watermarks.items()],
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO doc_hashes (collection, id, hash) VALUES (?, ?, ?)",
+                [(coll, doc_id, h) for coll, by_id in hashes.items() for doc_id, h in by_id.items()],
+            )
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def doc_hash(doc: dict) -> str:
+    content = {k: v for k, v in doc.items() if k not in CDC_HASH_IGNORE}
+    return hashlib.sha1(json.dumps(content, sort_keys=True, default=default_serializer).encode("utf-8")).hexdigest()
+
+
+# --------------------------------------------------------
+# MySQL polling
+# --------------------------------------------------------
+def read_changes(cursor, table: str, pk: str, columns: str, mark: Watermark, limit: int) -> List[dict]:
+    """Rows of `table` past the (updated_at, pk) watermark, oldest first."""
+    ts, last_pk = mark
+    sql = f"SELECT {columns}, updated_at AS _cdc_ts, {pk} AS _cdc_pk FROM {table} WHERE updated_at <= NOW() - INTERVAL %s SECOND"
+    args: List = [CDC_LAG_SECONDS]
+    if ts is not None:
+        sql += f" AND updated_at >= %s AND (updated_at > %s OR {pk} > %s)"
+        args += [ts, ts, last_pk or ""]
+    cursor.execute(sql + f" ORDER BY updated_at, {pk} LIMIT %s", (*args, limit))
+    return cursor.fetchall()
+
+
+def current_watermark(cursor, table: str, pk: str) -> Watermark:
+    cursor.execute(f"SELECT updated_at, {pk} FROM {table} ORDER BY updated_at DESC, {pk} DESC LIMIT 1")
+    row = cursor.fetchone()
+    if not row:
+        return None, None
+    return row["updated_at"], str(row[pk])
+
+
+# --------------------------------------------------------
+# Change capture
+# --------------------------------------------------------
+class ChangeCapture:
+    def __init__(self, store: CheckpointStore, batch_size: int = CDC_BATCH_SIZE,
+                 product_table: str = CDC_PRODUCT_TABLE, product_pk: str = CDC_PRODUCT_PK):
+        self.store = store
+        self.batch_size = batch_size
+        # source -> (table, pk, columns to read)
+        self.sources = {
+            "order_header": ("order_header", "order_id", "order_id"),
+            "order_item": ("order_item", "item_id", "order_id"),
+        }
+        if product_table:
+            self.sources["products"] = (product_table, product_pk, "*")
+
+        self.polls = 0
+        self.rows_read = 0
+        self.pushed = 0
+        self.unchanged = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.last_lag: Optional[float] = None
+
+    def init_watermarks(self, from_start: bool = False) -> None:
+        """First run: start at the current end of each table (or, from_start, at the beginning)."""
+        missing = [s for s in self.sources if self.store.watermark(s) is None]
+        if not missing:
+            return
+        marks: Dict[str, Watermark] = {}
+        conn = get_pooled_connection()
+        try:
+            cursor = conn.cursor(dictionary=True)
+            for source in missing:
+                table, pk, _ = self.sources[source]
+                marks[source] = (None, None) if from_start else current_watermark(cursor, table, pk)
+                print(f"[INFO] CDC watermark for {source} starts at {marks[source]}")
+            cursor.close()
+        finally:
+            conn.close()
+        self.store.save(marks, {})
+
+    def _delta(self, collection: str, docs: List[dict]) -> Tuple[List[dict], Dict[str, str]]:
+        """Docs whose content hash changed since they were last pushed."""
+        fresh = {str(d[UNIQUE_KEY]): doc_hash(d) for d in docs}
+        known = self.store.hashes(collection, list(fresh))
+        changed = {doc_id: h for doc_id, h in fresh.items() if known.get(doc_id) != h}
+        self.unchanged += len(fresh) - len(changed)
+        return [d for d in docs if str(d[UNIQUE_KEY]) in changed], changed
+
+    def _push(self, collection: str, docs: List[dict]) -> None:
+        for i in range(0, len(docs), INDEX_BATCH_SIZE):
+            response = post_to_solr(docs[i:i + INDEX_BATCH_SIZE], collection)
+            if response.status_code != 200:
+                raise RuntimeError(f"Solr update of {collection} failed ({response.status_code}): {response.text[:200]}")
+        self.pushed += len(docs)
+
+    def poll_once(self) -> int:
+        """One batch per source; returns rows read (0 = caught up)."""
+        rows: Dict[str, List[dict]] = {}
+        conn = get_pooled_connection()
+        try:
+            cursor = conn.cursor(dictionary=True)
+            for source, (table, pk, columns) in self.sources.items():
+                rows[source] = read_changes(cursor, table, pk, columns, self.store.watermark(source), self.batch_size)
+            cursor.close()
+        finally:
+            conn.close()
+
+        read = sum(len(r) for r in rows.values())
+        self.polls += 1
+        self.rows_read += read
+        if not read:
+            return 0
+
+        hashes: Dict[str, Dict[str, str]] = {}
+
+        # Products first: orders re-denormalize from the products collection
+        product_rows = rows.get("products") or []
+        if product_rows:
+            docs = []
+            for row in product_rows:
+                doc = {k: v for k, v in row.items() if not k.startswith("_cdc_") and k not in CDC_HASH_IGNORE}
+                doc[UNIQUE_KEY] = str(row["_cdc_pk"])
+                docs.append(doc)
+            delta, hashes["products"] = self._delta("products", docs)
+            if delta:
+                self._push("products", delta)
+                # real-time get sees the new product docs before they are committed
+                redenormalize_products([d[UNIQUE_KEY] for d in delta])
+
+        order_ids = list(dict.fromkeys(
+            str(r["order_id"]) for src in ("order_header", "order_item") for r in rows[src]
+        ))
+        for i in range(0, len(order_ids), INDEX_BATCH_SIZE):
+            docs = _load_orders(order_ids[i:i + INDEX_BATCH_SIZE])
+            delta, changed = self._delta("orderHistory", docs)
+            hashes.setdefault("orderHistory", {}).update(changed)
+            if delta:
+                self._push("orderHistory", delta)
+
+        marks = {src: (r[-1]["_cdc_ts"], str(r[-1]["_cdc_pk"])) for src, r in rows.items() if r}
+        self.store.save(marks, hashes)
+        newest = max(ts for ts, _ in marks.values())
+        self.last_lag = round((datetime.datetime.now() - newest).total_seconds(), 1)
+        return read
+
+    def run(self, interval: float = CDC_POLL_SECONDS, once: bool = False, from_start: bool = False) -> None:
+        failures = 0
+        initialized = False
+        while True:
+            started = time.perf_counter()
+            pushed_before, unchanged_before = self.pushed, self.unchanged
+            read = 0
+            try:
+                if not initialized:
+                    self.init_watermarks(from_start=from_start)
+                    initialized = True
+                while True:  # drain backlog before sleeping
+                    n = self.poll_once()
+                    read += n
+                    if n < self.batch_size:
+                        break
+            except Exception as e:
+                # Nothing was checkpointed for the failed batch, so the retry re-reads it
+                if once:
+                    raise
+                failures += 1
+                self.errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                delay = min(interval * 2 ** failures, CDC_MAX_BACKOFF_SECONDS)
+                print(f"[WARN] CDC poll failed ({self.last_error}); retrying in {delay:.0f}s")
+                time.sleep(delay)
+                continue
+            failures = 0
+            if read:
+                print(f"[INFO] CDC: {read} changed rows -> {self.pushed - pushed_before} docs pushed, "
+                      f"{self.unchanged - unchanged_before} unchanged, "
+                      f"{(time.perf_counter() - started) * 1000:.0f}ms, lag {self.last_lag}s")
+            if once:
+                return
+            time.sleep(interval)
+
+    def stats(self) -> Dict:
+        return {
+            "polls": self.polls,
+            "rows_read": self.rows_read,
+            "pushed": self.pushed,
+            "unchanged": self.unchanged,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "last_lag_seconds": self.last_lag,
+            "sources": {s: str(self.store.watermark(s)) for s in self.sources},
+        }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Poll MySQL for changed orders/products and push them to Solr")
+    parser.add_argument("--once", action="store_true", help="one pass, then exit")
+    parser.add_argument("--interval", type=float, default=CDC_POLL_SECONDS)
+    parser.add_argument("--state", default=CDC_STATE_PATH, help="SQLite checkpoint file")
+    parser.add_argument("--from-start", action="store_true",
+                        help="first run: capture every existing row instead of starting at the current end")
+    args = parser.parse_args(argv)
+
+    store = CheckpointStore(args.state)
+    capture = ChangeCapture(store)
+    status = 0
+    try:
+        capture.run(interval=args.interval, once=args.once, from_start=args.from_start)
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:  # --once: let cron see the failure
+        print(f"[ERROR] CDC pass failed: {type(e).__name__}: {e}")
+        status = 1
+    finally:
+        print(f"[INFO] CDC stopped: {capture.stats()}")
+        store.close()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -24,6 +24,13 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="America/New_York",
     enable_utc=True,
+    # Re-denormalize orders whose products changed (run with `celery beat`)
+    beat_schedule={
+        "sweep-product-changes": {
+            "task": "tasks.order_indexer.sweep_product_changes",
+            "schedule": float(os.getenv("PRODUCT_SWEEP_SECONDS", "900")),
+        },
+    },
 )
 
 # --- Explicit import fix ---
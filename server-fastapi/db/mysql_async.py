@@ -0,0 +1,142 @@
+# db/mysql_async.py
+# ================================================
+# Application-scoped async MySQL pool (aiomysql) for the FastAPI
+# services, so request handlers neither block the event loop on the sync
+# driver nor pay a connect handshake per call. Opened and closed from the
+# main.py lifespan; created lazily on first use otherwise.
+#   sizing         MYSQL_POOL_MIN / MYSQL_POOL_MAX
+#   health         connections idle longer than MYSQL_PING_IDLE_SECONDS are
+#                  pinged (and reconnected) before use; MYSQL_POOL_RECYCLE
+#                  retires them before the server's wait_timeout does
+#   timeouts       MAX_EXECUTION_TIME per session (SELECTs, ms), connect and
+#                  pool-acquire timeouts
+# Celery tasks and CLIs keep the sync pool in db/mysql_client.py.
+# ================================================
+import asyncio
+import os
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+import aiomysql
+from aiomysql import Error as MySQLError  # noqa: F401  (re-exported for services)
+
+from db.mysql_client import MYSQL_CONFIG
+
+MYSQL_POOL_MIN = int(os.getenv("MYSQL_POOL_MIN", "1"))
+MYSQL_POOL_MAX = int(os.getenv("MYSQL_POOL_MAX", "10"))
+MYSQL_POOL_RECYCLE = int(os.getenv("MYSQL_POOL_RECYCLE", "1800"))             # seconds
+MYSQL_PING_IDLE_SECONDS = float(os.getenv("MYSQL_PING_IDLE_SECONDS", "30"))
+MYSQL_STATEMENT_TIMEOUT_MS = int(os.getenv("MYSQL_STATEMENT_TIMEOUT_MS", "5000"))  # 0 = off
+MYSQL_CONNECT_TIMEOUT = float(os.getenv("MYSQL_CONNECT_TIMEOUT", "5"))
+MYSQL_ACQUIRE_TIMEOUT = float(os.getenv("MYSQL_ACQUIRE_TIMEOUT", "5"))
+
+_pool: Optional[aiomysql.Pool] = None
+_pool_loop: Optional[asyncio.AbstractEventLoop] = None
+_pool_lock: Optional[asyncio.Lock] = None
+_last_used: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+_acquired = 0
+_pings = 0
+_timeouts = 0
+
+
+async def get_pool() -> aiomysql.Pool:
+    """Shared pool for the running event loop (created on first use)."""
+    global _pool, _pool_loop, _pool_lock
+    loop = asyncio.get_running_loop()
+    if _pool is not None and _pool_loop is loop and not _pool.closed:
+        return _pool
+    if _pool_loop is not loop:
+        _pool, _pool_loop, _pool_lock = None, loop, asyncio.Lock()
+    async with _pool_lock:
+        if _pool is None or _pool.closed:
+            init_command = (
+                f"SET SESSION MAX_EXECUTION_TIME={MYSQL_STATEMENT_TIMEOUT_MS}"
+                if MYSQL_STATEMENT_TIMEOUT_MS else None
+            )
+            _pool = await aiomysql.create_pool(
+                host=MYSQL_CONFIG["host"],
+                user=MYSQL_CONFIG["user"],
+                password=MYSQL_CONFIG["password"],
+                db=MYSQL_CONFIG["database"],
+                minsize=MYSQL_POOL_MIN,
+                maxsize=MYSQL_POOL_MAX,
+                pool_recycle=MYSQL_POOL_RECYCLE,
+                connect_timeout=MYSQL_CONNECT_TIMEOUT,
+                init_command=init_command,
+                autocommit=True,  # a pooled connection must not be returned mid-transaction
+                charset="utf8mb4",
+            )
+            print(f"[INFO] MySQL async pool ready (min={MYSQL_POOL_MIN}, max={MYSQL_POOL_MAX})")
+    return _pool
+
+
+async def open_pool() -> None:
+    """Lifespan hook: open the minimum connections now rather than on the first request."""
+    try:
+        await get_pool()
+    except Exception as e:
+        print(f"[WARN] MySQL async pool not opened at startup ({e}); retrying on first use")
+
+
+async def close_pool() -> None:
+    """Called on application shutdown."""
+    global _pool
+    if _pool is not None and not _pool.closed:
+        _pool.close()
+        await _pool.wait_closed()
+    _pool = None
+
+
+@asynccontextmanager
+async def acquire():
+    """A pooled connection, pinged first if it sat idle; always returned to the pool."""
+    global _acquired, _pings, _timeouts
+    pool = await get_pool()
+    try:
+        conn = await asyncio.wait_for(pool.acquire(), MYSQL_ACQUIRE_TIMEOUT)
+    except asyncio.TimeoutError:
+        _timeouts += 1
+        raise
+    _acquired += 1
+    try:
+        if time.monotonic() - _last_used.get(conn, 0.0) > MYSQL_PING_IDLE_SECONDS:
+            _pings += 1
+            await conn.ping(reconnect=True)
+        yield conn
+    finally:
+        _last_used[conn] = time.monotonic()
+        pool.release(conn)
+
+
+async def fetch_all(sql: str, args: Any = None, as_dict: bool = False) -> List:
+    """Rows as tuples (like cursor.fetchall()) or, with as_dict, as dicts."""
+    async with acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor if as_dict else aiomysql.Cursor) as cursor:
+            await cursor.execute(sql, args)
+            return list(await cursor.fetchall())
+
+
+async def execute(sql: str, args: Any = None) -> int:
+    """Run one write statement (autocommitted); returns the new row id, if any."""
+    async with acquire() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(sql, args)
+            return cursor.lastrowid
+
+
+def pool_stats() -> Dict:
+    pool = _pool
+    return {
+        "open": pool is not None and not pool.closed,
+        "minsize": MYSQL_POOL_MIN,
+        "maxsize": MYSQL_POOL_MAX,
+        "size": pool.size if pool is not None else 0,
+        "free": pool.freesize if pool is not None else 0,
+        "acquired": _acquired,
+        "pings": _pings,
+        "acquire_timeouts": _timeouts,
+        "statement_timeout_ms": MYSQL_STATEMENT_TIMEOUT_MS,
+    }
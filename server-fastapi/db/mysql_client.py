@@ -1,12 +1,40 @@
 #import pymysql
+import os
+import threading
 import mysql.connector
+from mysql.connector import pooling
+
+MYSQL_CONFIG = {
+    "host": os.getenv("MYSQL_HOST", "localhost"),
+    "user": os.getenv("MYSQL_USER", "sa"),
+    "password": os.getenv("MYSQL_PASSWORD", "nimda"),
+    "database": os.getenv("MYSQL_DATABASE", "openvoice360"),
+}
+MYSQL_POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "5"))
 
 def get_connection():
     return mysql.connector.connect(
-        host="localhost",
-        user="sa",
-        password="nimda",
-        database="openvoice360"
+        **MYSQL_CONFIG
         #cursorclass=pymysql.cursors.DictCursor,
         #autocommit=True
     )
+
+
+# --------------------------------------------------------
+# Pooled connections (Celery workers); close() returns them to the pool
+# --------------------------------------------------------
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pooled_connection():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pooling.MySQLConnectionPool(
+                    pool_name="openvoice360",
+                    pool_size=MYSQL_POOL_SIZE,
+                    pool_reset_session=True,
+                    **MYSQL_CONFIG,
+                )
+    return _pool.get_connection()
@@ -0,0 +1,257 @@
+# facet_matcher.py
+import os
+import re
+from collections import deque
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ngram_index import TrigramIndex
+
+# Solr bookkeeping fields that should never become entities
+IGNORE_FIELDS = {"search_text", "_text_", "_version_", "id"}
+
+FUZZY_THRESHOLD = 0.8
+
+# Identifier fields only match literally: a near-miss id is a different record
+IDENTIFIER_FIELDS = {"account_id", "order_id", "item_id"}
+
+# One-token windows ("back" ~ "black" scores 0.89) need a longer token and a higher ratio
+FUZZY_SINGLE_TOKEN_THRESHOLD = float(os.getenv("FACET_FUZZY_SINGLE_TOKEN_THRESHOLD", "0.9"))
+FUZZY_SINGLE_TOKEN_MIN_LEN = int(os.getenv("FACET_FUZZY_SINGLE_TOKEN_MIN_LEN", "5"))
+
+# Fuzzy candidates scored per utterance window, and the trigram Dice floor
+FUZZY_TOP_K = int(os.getenv("FACET_FUZZY_TOP_K", "10"))
+FUZZY_MIN_DICE = float(os.getenv("FACET_FUZZY_MIN_DICE", "0.3"))
+
+# Command / filler words that should never fuzzy-match a facet value on their own
+COMMAND_WORDS = {
+    "me", "my", "show", "find", "get", "list", "all", "order", "product", "item", "items",
+    "under", "over", "above", "below", "between", "and", "to", "for", "with", "by", "in",
+    "price", "status", "brand", "color", "material", "category", "account",
+}
+
+_WORD_CHAR = re.compile(r"\w")
+
+
+def _is_identifier_field(field: str) -> bool:
+    return field in IDENTIFIER_FIELDS or field.endswith("_id")
+
+
+def _is_word_char(ch: str) -> bool:
+    return bool(_WORD_CHAR.match(ch))
+
+
+class _AhoCorasick:
+    """
+    Character-level Aho-Corasick automaton.
+    Finds every occurrence of every pattern in a single left-to-right scan.
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        self._lengths: List[int] = []
+
+    def add(self, pattern: str) -> int:
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        pid = len(self._lengths)
+        self._lengths.append(len(pattern))
+        self._out[node].append(pid)
+        return pid
+
+    def build(self) -> None:
+        queue = deque()
+        for nxt in self._goto[0].values():
+            self._fail[nxt] = 0
+            queue.append(nxt)
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text: str) -> Iterable[Tuple[int, int, int]]:
+        """Yields (pattern_id, start, end) for every occurrence in text."""
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for pid in self._out[node]:
+                end = i + 1
+                yield pid, end - self._lengths[pid], end
+
+
+class _FieldIndex:
+    """Per-field values plus a trigram candidate index for fuzzy hits."""
+
+    def __init__(self, field: str, values: List):
+        self.field = field
+        self.values = values
+        self.fuzzy = not _is_identifier_field(field)
+        self.cleaned = [str(v).lower().strip() for v in values]
+        self.ngrams = TrigramIndex(self.cleaned)
+        # Token counts present in this field, so only matching windows are scored
+        self.token_counts = {len(c.split()) for c in self.cleaned if c}
+        # Values the automaton can't represent with \b semantics (empty,
+        # or starting/ending with punctuation) keep a precompiled regex.
+        self.regex_fallback: List[Tuple[int, re.Pattern]] = []
+
+
+class FacetMatcher:
+    """
+    Precompiled facet-value matcher used by NLU.extract_entities.
+
+    Built once per facet load. Per field, the first literal \\b-bounded hit
+    wins (one Aho-Corasick scan for all fields); otherwise each utterance
+    window (and the whole utterance) retrieves its top-k trigram candidates,
+    and the best SequenceMatcher ratio >= threshold is taken. Identifier
+    fields (account_id, order_id, *_id) take literal hits only.
+    """
+
+    def __init__(self, facets: Dict[str, List], threshold: float = FUZZY_THRESHOLD):
+        self.threshold = threshold
+        self._fields: List[_FieldIndex] = []
+        self._automaton = _AhoCorasick()
+        # pattern_id -> [(field_pos, value_idx), ...]
+        self._pattern_owners: List[List[Tuple[int, int]]] = []
+        pattern_ids: Dict[str, int] = {}
+
+        for field, values in (facets or {}).items():
+            if field in IGNORE_FIELDS:
+                continue
+            field_pos = len(self._fields)
+            index = _FieldIndex(field, list(values or []))
+            self._fields.append(index)
+
+            for idx, v_clean in enumerate(index.cleaned):
+                if v_clean and _is_word_char(v_clean[0]) and _is_word_char(v_clean[-1]):
+                    pid = pattern_ids.get(v_clean)
+                    if pid is None:
+                        pid = self._automaton.add(v_clean)
+                        pattern_ids[v_clean] = pid
+                        self._pattern_owners.append([])
+                    self._pattern_owners[pid].append((field_pos, idx))
+                else:
+                    index.regex_fallback.append((idx, re.compile(rf"\b{re.escape(v_clean)}\b")))
+
+        self._automaton.build()
+        print(f"[INFO] FacetMatcher built: {len(self._fields)} fields, {len(pattern_ids)} literal patterns")
+
+    # --------------------------------------------------------
+    # Literal pass (one automaton scan for all fields)
+    # --------------------------------------------------------
+    def _literal_hits(self, lowered: str) -> Dict[int, int]:
+        """Returns {field_pos: first value index with a \\b-bounded literal hit}."""
+        hits: Dict[int, int] = {}
+        n = len(lowered)
+        for pid, start, end in self._automaton.iter_matches(lowered):
+            if start > 0 and _is_word_char(lowered[start - 1]):
+                continue
+            if end < n and _is_word_char(lowered[end]):
+                continue
+            for field_pos, idx in self._pattern_owners[pid]:
+                cur = hits.get(field_pos)
+                if cur is None or idx < cur:
+                    hits[field_pos] = idx
+        return hits
+
+    # --------------------------------------------------------
+    # Fuzzy pass (trigram top-k per window, exact ratio on candidates only)
+    # --------------------------------------------------------
+    @staticmethod
+    def _windows(lowered: str) -> Dict[int, List[str]]:
+        """Token windows keyed by token count; the whole utterance is always included."""
+        tokens = lowered.split()
+        windows: Dict[int, List[str]] = {}
+        for size in range(1, len(tokens) + 1):
+            for i in range(len(tokens) - size + 1):
+                chunk = tokens[i:i + size]
+                if all(t in COMMAND_WORDS for t in chunk):
+                    continue
+                windows.setdefault(size, []).append(" ".join(chunk))
+        return windows
+
+    def _accept(self, window: str, value: str, score: float) -> bool:
+        """
+        Window-level gates on top of the overall ratio. A window is only
+        compared with values of the same token count, and every token pair
+        must match on its own ("about plastic" is not "abs plastic"); one
+        token needs FUZZY_SINGLE_TOKEN_MIN_LEN chars and a higher ratio.
+        """
+        w_tokens, v_tokens = window.split(), value.split()
+        if len(w_tokens) != len(v_tokens):
+            return False
+        if len(w_tokens) == 1:
+            return len(window) >= FUZZY_SINGLE_TOKEN_MIN_LEN and score >= FUZZY_SINGLE_TOKEN_THRESHOLD
+        return all(
+            w == v or SequenceMatcher(None, w, v).ratio() >= self.threshold
+            for w, v in zip(w_tokens, v_tokens)
+        )
+
+    def _best_fuzzy(self, index: _FieldIndex, lowered: str, windows: Dict[int, List[str]]) -> Optional[int]:
+        # The whole utterance is scored against any value (as before windows
+        # existed); sub-windows only against values with their token count.
+        texts = [(lowered, True)]
+        for size in index.token_counts:
+            texts.extend((w, False) for w in windows.get(size, []) if w != lowered)
+
+        matcher = SequenceMatcher(None, "", "")
+        best_idx, best_score = None, 0.0
+        scored = set()
+        for text, whole in texts:
+            matcher.set_seq1(text)
+            for idx in index.ngrams.top_k(text, FUZZY_TOP_K, FUZZY_MIN_DICE):
+                if (text, idx) in scored:
+                    continue
+                scored.add((text, idx))
+                value = index.cleaned[idx]
+                matcher.set_seq2(value)
+                if matcher.real_quick_ratio() < self.threshold or matcher.quick_ratio() < self.threshold:
+                    continue
+                score = matcher.ratio()
+                if score < self.threshold:
+                    continue
+                same_shape = len(text.split()) == len(value.split())
+                if (not whole or same_shape) and not self._accept(text, value, score):
+                    continue
+                if score > best_score or (score == best_score and idx < best_idx):
+                    best_idx, best_score = idx, score
+        return best_idx
+
+    def match(self, lowered: str) -> Dict[str, object]:
+        entities: Dict[str, object] = {}
+        literal = self._literal_hits(lowered)
+        windows = None
+
+        for field_pos, index in enumerate(self._fields):
+            hit = literal.get(field_pos)
+            for idx, pattern in index.regex_fallback:
+                if hit is not None and idx >= hit:
+                    break
+                if pattern.search(lowered):
+                    hit = idx
+                    break
+
+            if hit is None and index.fuzzy:
+                if windows is None:
+                    windows = self._windows(lowered)
+                hit = self._best_fuzzy(index, lowered, windows)
+
+            if hit is not None:
+                entities[index.field] = index.values[hit]
+        return entities
@@ -0,0 +1,187 @@
+# intent_backends.py
+# ================================================
+# Pluggable inference backends for the ./intent_model classifier.
+#   torch      - fp32 DistilBertForSequenceClassification (reference)
+#   quantized  - int8 dynamic-quantized torch (Linear layers)
+#   onnx       - ONNX Runtime session over intent_model/model.onnx
+#                (exported by train_intent_model.py)
+# Select with INTENT_BACKEND; non-reference backends are checked against
+# fp32 torch at load time and fall back to it if any label differs.
+# ================================================
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+INTENT_BACKEND = os.getenv("INTENT_BACKEND", "torch").lower()
+INTENT_PARITY_CHECK = os.getenv("INTENT_PARITY_CHECK", "true").lower() == "true"
+ONNX_MODEL_FILE = "model.onnx"
+
+# Representative utterances for the load-time parity check
+PARITY_SAMPLES = [
+    "show me bosch",
+    "find makita products",
+    "show me red drills",
+    "show products under 50",
+    "price above 300",
+    "between 100 and 250",
+    "back to products",
+    "show all products",
+    "show my orders",
+    "show all orders",
+    "filter by currency usd",
+    "filter by payment status refunded",
+    "show orders with status shipped",
+    "i want hand tools",
+    "show me power tools",
+]
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class TorchBackend:
+    name = "torch"
+
+    def __init__(self, model_path: str, num_threads: int = 0):
+        import torch
+        from transformers import DistilBertForSequenceClassification
+
+        self._torch = torch
+        if num_threads > 0:
+            torch.set_num_threads(num_threads)
+        self.model = DistilBertForSequenceClassification.from_pretrained(
+            model_path, local_files_only=True
+        )
+        self.model.eval()
+        self.id2label = {int(k): v for k, v in self.model.config.id2label.items()}
+
+    def predict_proba(self, inputs: Dict[str, np.ndarray]) -> np.ndarray:
+        torch = self._torch
+        tensors = {k: torch.from_numpy(v) for k, v in inputs.items()}
+        with torch.no_grad():
+            logits = self.model(**tensors).logits
+        return _softmax(logits.numpy())
+
+
+class QuantizedTorchBackend(TorchBackend):
+    name = "quantized"
+
+    def __init__(self, model_path: str, num_threads: int = 0):
+        super().__init__(model_path, num_threads)
+        torch = self._torch
+        self.model = torch.quantization.quantize_dynamic(
+            self.model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+        self.model.eval()
+
+
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(self, model_path: str, num_threads: int = 0):
+        import onnxruntime as ort
+        from transformers import DistilBertConfig
+
+        onnx_path = os.path.join(model_path, ONNX_MODEL_FILE)
+        if not os.path.exists(onnx_path):
+            raise FileNotFoundError(f"{onnx_path} not found; re-run train_intent_model.py to export it")
+
+        opts = ort.SessionOptions()
+        if num_threads > 0:
+            opts.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(onnx_path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+        config = DistilBertConfig.from_pretrained(model_path, local_files_only=True)
+        self.id2label = {int(k): v for k, v in config.id2label.items()}
+
+    def predict_proba(self, inputs: Dict[str, np.ndarray]) -> np.ndarray:
+        feed = {k: v.astype(np.int64) for k, v in inputs.items() if k in self._input_names}
+        logits = self.session.run(["logits"], feed)[0]
+        return _softmax(logits)
+
+
+BACKENDS = {
+    "torch": TorchBackend,
+    "quantized": QuantizedTorchBackend,
+    "onnx": OnnxBackend,
+}
+
+
+def check_parity(reference, candidate, tokenizer, samples: Optional[List[str]] = None) -> List[Tuple[str, str, str]]:
+    """Returns [(text, reference_label, candidate_label)] for every disagreement."""
+    samples = samples or PARITY_SAMPLES
+    inputs = dict(tokenizer(samples, return_tensors="np", truncation=True, padding=True))
+    ref_idx = reference.predict_proba(inputs).argmax(axis=1)
+    cand_idx = candidate.predict_proba(inputs).argmax(axis=1)
+    mismatches = []
+    for text, r, c in zip(samples, ref_idx, cand_idx):
+        r_label, c_label = reference.id2label[int(r)], candidate.id2label[int(c)]
+        if r_label != c_label:
+            mismatches.append((text, r_label, c_label))
+    return mismatches
+
+
+def load_backend(model_path: str, tokenizer, name: str = INTENT_BACKEND, num_threads: int = 0):
+    """Load the configured backend, falling back to fp32 torch if it can't be trusted."""
+    cls = BACKENDS.get(name)
+    if cls is None:
+        print(f"[WARN] Unknown INTENT_BACKEND '{name}', using torch")
+        cls = TorchBackend
+    if cls is TorchBackend:
+        return TorchBackend(model_path, num_threads)
+
+    try:
+        backend = cls(model_path, num_threads)
+    except Exception as e:
+        print(f"[WARN] Intent backend '{name}' unavailable ({e}); using torch")
+        return TorchBackend(model_path, num_threads)
+
+    if INTENT_PARITY_CHECK:
+        reference = TorchBackend(model_path, num_threads)
+        mismatches = check_parity(reference, backend, tokenizer)
+        if mismatches:
+            for text, r_label, c_label in mismatches:
+                print(f"[WARN] Parity mismatch '{text}': torch={r_label} {name}={c_label}")
+            print(f"[WARN] Intent backend '{name}' failed parity check; using torch")
+            return reference
+        del reference
+        print(f"[INFO] Intent backend '{name}' passed parity check ({len(PARITY_SAMPLES)} samples)")
+
+    return backend
+
+
+def export_onnx(model, tokenizer, output_dir: str, opset: int = 14) -> str:
+    """Export a trained classifier to <output_dir>/model.onnx (logits output, dynamic batch/seq)."""
+    import torch
+
+    class _LogitsOnly(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, input_ids, attention_mask):
+            return self.inner(input_ids=input_ids, attention_mask=attention_mask).logits
+
+    model = model.to("cpu").eval()
+    sample = tokenizer(["show me bosch drills"], return_tensors="pt", padding=True, truncation=True)
+    onnx_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            _LogitsOnly(model),
+            (sample["input_ids"], sample["attention_mask"]),
+            onnx_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"},
+            },
+            opset_version=opset,
+        )
+    return onnx_path
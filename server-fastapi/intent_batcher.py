@@ -0,0 +1,120 @@
+# intent_batcher.py
+# ================================================
+# Micro-batching scheduler for intent classification.
+# Concurrent callers are collected for a short window (or until the batch
+# is full), classified with one padded forward pass on a worker thread,
+# and each caller's future is resolved with its own (intent, confidence).
+# ================================================
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+# Knobs (env overridable)
+BATCH_WINDOW_MS = float(os.getenv("INTENT_BATCH_WINDOW_MS", "5"))
+BATCH_MAX_SIZE = int(os.getenv("INTENT_BATCH_MAX_SIZE", "16"))
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "0"))  # 0 = torch default
+
+ClassifyBatchFn = Callable[[List[str]], List[Tuple[str, float]]]
+
+
+class IntentBatcher:
+    """
+    Collects classify requests from many coroutines into padded batches.
+    The model runs off the event loop on a single inference thread, so the
+    loop keeps serving requests while a batch is in flight.
+    """
+
+    def __init__(
+        self,
+        classify_batch: ClassifyBatchFn,
+        window_ms: float = BATCH_WINDOW_MS,
+        max_batch: int = BATCH_MAX_SIZE,
+    ):
+        self._classify_batch = classify_batch
+        self.window = max(window_ms, 0.0) / 1000.0
+        self.max_batch = max(max_batch, 1)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="intent-infer")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # Simple counters for /nlu stats
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def classify(self, text: str) -> Tuple[str, float]:
+        self._ensure_worker()
+        fut = self._loop.create_future()
+        self._queue.put_nowait((text, fut))
+        return await fut
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.window
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            item = await self._get(timeout)
+            if item is None:
+                break
+            batch.append(item)
+        return batch
+
+    async def _get(self, timeout: float) -> Optional[Tuple[str, asyncio.Future]]:
+        """
+        Next queued request, or None after timeout. Not wait_for(get()):
+        before Python 3.12 its timeout can cancel a get() that already
+        dequeued an item, and that caller would never be answered.
+        """
+        getter = self._loop.create_task(self._queue.get())
+        try:
+            await asyncio.wait({getter}, timeout=timeout)
+            if not getter.done():
+                getter.cancel()
+                await asyncio.wait({getter})  # let the cancel land; the get may still win
+        except asyncio.CancelledError:
+            getter.cancel()
+            raise
+        return None if getter.cancelled() else getter.result()
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            live = [(t, f) for t, f in batch if not f.cancelled()]
+            if not live:
+                continue
+            texts = [t for t, _ in live]
+            try:
+                results = await self._loop.run_in_executor(self._executor, self._classify_batch, texts)
+            except Exception as e:
+                for _, fut in live:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(live)
+            for (_, fut), result in zip(live, results):
+                if not fut.done():
+                    fut.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "window_ms": self.window * 1000.0,
+            "max_batch": self.max_batch,
+        }
@@ -1,12 +1,23 @@
 # main.py
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException,Header
-from nlu_engine import NLU
+from fastapi.responses import JSONResponse
+from nlu_registry import get_nlu
 import requests, pysolr
 from fastapi.middleware.cors import CORSMiddleware
 from routes import orders
 from pydantic import BaseModel
 from logger import log_solr_request_response
-from attribute_loader import clear_cache, load_facet_values
+from attribute_loader import clear_cache, load_facet_values, load_order_facets
+from rule_compiler import reload_rules
+from phonetic_logger import top_unknown_terms
+from startup import warm_up, readiness
+from solr_client import close_solr_clients, collection_url, get_sync_session
+from db.mysql_async import close_pool, open_pool, pool_stats
+from product_cache import product_cache
+from product_loader import product_loader, enrichment_loader
+from search_cache import search_cache
 from solr_query_builder import search_solr
 import solr_query_builder
 print(f"[DEBUG] Imported solr_query_builder from: {solr_query_builder.__file__}")
@@ -17,6 +28,7 @@ from services.order_intent_router import handle_order_intent, ORDER_INTENTS
 from typing import Dict
 from fastapi import Request
 from services.order_service import get_orders_with_products
+from tasks.order_indexer import indexer_stats
 #from routes import products
 #from routes import products as products_router
 from routes import order_history_voice as order_history_voice_router
@@ -24,6 +36,7 @@ from routes import product_voice as product_voice_router
 from routes import order_voice
 from routes.product_voice_v2 import router as product_voice_v2_router
 from routes.product_detail import router as product_detail_router
+from routes.export import router as export_router
 from routes.opportunity_routes import router as opp_router
 from routes.opportunity_metadata import router as opportunity_metadata_router
 from routes.opportunity_autocomplete import router as opp_auto_router
@@ -37,17 +50,36 @@ def _client_key(req: Request) -> str:
     # Use client IP; if you have auth, you can switch to user id/claims later.
     return getattr(req.client, "host", "unknown")
 
-# verify connection to Redis before app startup
-try:
-    conn = celery_app.connection()
-    conn.ensure_connection(max_retries=3)
-    print("✅ Celery broker reachable.")
-except Exception as e:
-    print(f"❌ Celery broker unreachable: {e}")
+async def _background_startup():
+    await asyncio.gather(warm_up(), open_pool())
+
+
+def _log_startup_result(task: asyncio.Task):
+    # Nothing awaits the task; without this an exception would only surface
+    # as "Task exception was never retrieved" at garbage collection
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is not None:
+        print(f"[ERROR] Background startup failed: {type(exc).__name__}: {exc}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Model, facet vocabularies, Solr and the Celery broker warm in parallel
+    # (startup.py) in the background: uvicorn serves /health/live at once,
+    # /health/ready answers 503 until warm-up completes and every step
+    # passed; failures are reported there, not raised
+    warmup = asyncio.create_task(_background_startup())
+    warmup.add_done_callback(_log_startup_result)
+    yield
+    if not warmup.done():
+        warmup.cancel()
+    await close_solr_clients()
+    await close_pool()
 
 #app = FastAPI()
-app = FastAPI(title="EcomCRM")
-nlu = NLU()
+app = FastAPI(title="EcomCRM", lifespan=lifespan)
 
 app.include_router(orders.router, prefix="/api")     
 #app.include_router(products_router.router, prefix="/api")
@@ -56,6 +88,7 @@ app.include_router(order_history_voice_router.router, prefix="/api")
 app.include_router(order_voice.router, prefix="/api") 
 app.include_router(product_voice_v2_router)
 app.include_router(product_detail_router, prefix="/api")
+app.include_router(export_router, prefix="/api")
 app.include_router(opp_router, prefix="/api")
 app.include_router(opportunity_metadata_router, prefix="/api")
 app.include_router(opp_auto_router)
@@ -76,9 +109,8 @@ app.add_middleware(
 #SOLR_URL = "https://35.223.69.124:8983/solr/mproducts/select"
 SOLR_URL = "https://localhost:8983/solr/products/select"
 
-# Requests session ignoring SSL
-session = requests.Session()
-session.verify = False
+# Shared pooled Solr session (solr_client.py)
+session = get_sync_session()
 
 # Initialize Solr
 solr = pysolr.Solr(SOLR_URL, always_commit=True, timeout=10, session=session)
@@ -87,15 +119,24 @@ solr = pysolr.Solr(SOLR_URL, always_commit=True, timeout=10, session=session)
 def read_root():
     return {"message": "EcomCRM running!"}
 
+@app.get("/health/live")
+def health_live():
+    """Process is up and serving HTTP"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+def health_ready():
+    """Warm-up finished, no step failed and the NLU is loaded; includes the startup timing report"""
+    report = readiness()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
 @app.options("/check")
 async def options_handler():
     return Response(status_code=204)
 
 @app.get("/schema")
 def get_solr_schema():
-    session = requests.Session()
-    session.verify = False
-    resp = session.get("https://localhost:8983/solr/products/schema/fields").json()
+    resp = get_sync_session().get(collection_url("products", "schema/fields"), timeout=10).json()
     return [f["name"] for f in resp.get("fields", [])]
 
 
@@ -106,8 +147,9 @@ async def query_endpoint(payload: QueryRequest, request: Request):
     text_lower = text.lower()
 
     # --- run NLU ---
-    intent, confidence = nlu.classify_intent(text)  # your existing call
-    entities = nlu.extract_entities(text)           # now includes account_id/account_partial
+    nlu_result = await get_nlu().aanalyze(text)   # normalize/intent/entities computed once
+    intent, confidence = nlu_result.intent, nlu_result.confidence
+    entities = nlu_result.entities                 # now includes account_id/account_partial
 
     # Determine user type (current rule you gave):
     # superuser=true will tell and accountid will tell he is customer for now
@@ -201,7 +243,58 @@ def refresh_cache():
     """Clear and reload Solr attribute cache"""
     try:
         clear_cache()
+        # Listeners push the new vocabularies into the shared NLU
         fresh = load_facet_values(force_refresh=True)
+        load_order_facets(force_refresh=True)
         return {"status": "refreshed", "counts": {k: len(v) for k, v in fresh.items()}}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to refresh cache: {str(e)}")
+
+
+@app.post("/reload-phonetic-rules")
+def reload_phonetic_rules():
+    """Recompile phonetic/mishear rules (static tables + override file)"""
+    try:
+        engine = reload_rules()
+        return {"status": "reloaded", "rules": engine.rule_count, "stages": engine.stage_count,
+                "passes": engine.segment_count}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to reload phonetic rules: {str(e)}")
+
+
+@app.get("/nlu/stats")
+def nlu_stats():
+    """NLU cache hit rates, model/vocabulary versions and batcher counters"""
+    return get_nlu().cache_stats()
+
+
+@app.get("/nlu/unknown-terms")
+def nlu_unknown_terms(limit: int = 50):
+    """Most frequent terms the NLU did not recognize (candidates for new rules/facets)"""
+    return {"terms": top_unknown_terms(limit)}
+
+
+@app.get("/indexer/stats")
+def order_indexer_stats():
+    """Batching order indexer: throughput counters, queue depth, dead letters"""
+    try:
+        return indexer_stats()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Indexer metrics unavailable: {e}")
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Hit/miss, size and single-flight counters for the product and search caches"""
+    return {
+        "products": product_cache.stats(),
+        "product_loader": product_loader.stats(),
+        "enrichment_loader": enrichment_loader.stats(),
+        "search": search_cache.stats(),
+    }
+
+
+@app.get("/db/stats")
+def db_stats():
+    """Async MySQL pool: size, free connections, health-check pings, acquire timeouts"""
+    return pool_stats()
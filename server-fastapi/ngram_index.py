@@ -0,0 +1,54 @@
+# ngram_index.py
+# ================================================
+# Character-trigram inverted index over facet values.
+# Retrieval is vectorized with NumPy: postings for the query's trigrams are
+# concatenated, counted with np.unique, and turned into Dice scores in one
+# shot, so lookups cost O(postings touched) rather than O(vocabulary).
+# ================================================
+from typing import Dict, Iterable, List, Set
+
+import numpy as np
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    def __init__(self, values: Iterable[str]):
+        self.values: List[str] = list(values)
+        self.size = len(self.values)
+
+        postings: Dict[str, List[int]] = {}
+        gram_counts = np.zeros(self.size, dtype=np.int32)
+        for idx, value in enumerate(self.values):
+            grams = trigrams(value)
+            gram_counts[idx] = len(grams)
+            for g in grams:
+                postings.setdefault(g, []).append(idx)
+
+        self._postings: Dict[str, np.ndarray] = {
+            g: np.asarray(ids, dtype=np.int32) for g, ids in postings.items()
+        }
+        self._gram_counts = gram_counts
+
+    def top_k(self, text: str, k: int, min_dice: float = 0.0) -> List[int]:
+        """Value indexes with the highest trigram Dice similarity to text (best first)."""
+        grams = trigrams(text)
+        arrays = [self._postings[g] for g in grams if g in self._postings]
+        if not arrays:
+            return []
+
+        ids, overlap = np.unique(np.concatenate(arrays), return_counts=True)
+        dice = (2.0 * overlap) / (len(grams) + self._gram_counts[ids])
+
+        keep = dice >= min_dice
+        ids, dice = ids[keep], dice[keep]
+        if ids.size > k:
+            part = np.argpartition(-dice, k - 1)[:k]
+            ids, dice = ids[part], dice[part]
+
+        # Best score first; ties resolved by original value order
+        order = np.lexsort((ids, -dice))
+        return [int(i) for i in ids[order]]
@@ -1,21 +1,59 @@
 # nlu_engine.py
+import os
 import re
-from typing import Dict, Optional, Tuple
-from difflib import SequenceMatcher
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
 from phonetic_logger import log_unknown_terms
-import torch
-from transformers import DistilBertTokenizerFast, DistilBertForSequenceClassification
+from transformers import DistilBertTokenizerFast
 from attribute_loader import load_order_facets
 
-from attribute_loader import load_facet_values
+from attribute_loader import load_facet_values, register_refresh_listener, DEFAULT_COLLECTION
+from facet_matcher import FacetMatcher
+from intent_batcher import IntentBatcher, TORCH_NUM_THREADS
+from intent_backends import load_backend
+from nlu_cache import LRUTTLCache
+from phonetic_index import PhoneticIndex
 from phonetic_rules import (
-    PHONETIC_RULES,
-    PRODUCT_TYPE_NORMALIZATION,
-    VOICE_MISHEAR_CORRECTIONS,
     ACCOUNT_SPOKEN_DIGITS,
     ACCOUNT_PREFIX_PATTERNS,
-    _PHONETIC_MAP
 )
+from rule_compiler import get_rewrite_engine
+
+# Precompiled cleanup patterns used by normalize_text
+_FILLER_WORDS = re.compile(r"\b(the|a|an|please|kindly|show|get|give|list|display|find|all of|of)\b")
+_PLURAL_PRODUCTS = re.compile(r"\bproducts\b")
+_PLURAL_ORDERS = re.compile(r"\borders\b")
+_WHITESPACE = re.compile(r"\s+")
+_TOKEN = re.compile(r"\b[a-zA-Z0-9]+\b")
+
+
+@dataclass
+class NLUResult:
+    """
+    Output of one NLU.analyze() run. Every stage (normalize, tokenize,
+    account, entities, intent) is computed exactly once per utterance.
+    """
+    input: str
+    normalized: str = ""
+    tokens: List[str] = field(default_factory=list)
+    account_id: Optional[str] = None
+    account_partial: bool = False
+    entities: Dict = field(default_factory=dict)
+    intent: str = "unknown"
+    confidence: float = 0.0
+    timings: Dict[str, float] = field(default_factory=dict)  # ms per stage
+
+    def to_dict(self) -> Dict:
+        """Same shape NLU.infer() has always returned, plus stage timings."""
+        return {
+            "input": self.input,
+            "normalized": self.normalized,
+            "intent": self.intent,
+            "confidence": self.confidence,
+            "entities": self.entities,
+            "timings_ms": self.timings,
+        }
 
 
 class NLU:
@@ -25,50 +63,122 @@ class NLU:
         self.tokenizer = DistilBertTokenizerFast.from_pretrained(
             self.model_path, local_files_only=True
         )
-        self.model = DistilBertForSequenceClassification.from_pretrained(
-            self.model_path, local_files_only=True
-        )
-        self.model.eval()
+        # torch / quantized / onnx, chosen by INTENT_BACKEND (see intent_backends.py)
+        self.backend = load_backend(self.model_path, self.tokenizer, num_threads=TORCH_NUM_THREADS)
 
-        print("[DEBUG] Loaded intent labels:", self.model.config.id2label)
+        print(f"[DEBUG] Loaded intent labels ({self.backend.name}):", self.backend.id2label)
+
+        self.label_names = [self.backend.id2label[i] for i in sorted(self.backend.id2label)]
+
+        # Concurrent async callers share padded forward passes
+        self._batcher = IntentBatcher(self.classify_intent_batch)
+
+        # Memoized stages keyed on normalized text (see nlu_cache.py).
+        # Keys carry the model / vocabulary versions, and the caches are
+        # cleared whenever either changes.
+        self.model_version = self._compute_model_version()
+        self.vocab_version = 0
+        self._intent_cache = LRUTTLCache()
+        self._entity_cache = LRUTTLCache()
 
         # Load facet values for fuzzy entity recognition
-        self.facets = load_facet_values() or {}
-        
-        order_facets = load_order_facets()
-        self.facets.update(order_facets or {})
-        print("[DEBUG] order facets ->", list(self.facets.get("status", []))[:10])
+        self._product_facets = load_facet_values() or {}
+        self._order_facets = load_order_facets() or {}
+        self._rebuild_facet_index()
 
-        self.label_names = list(self.model.config.id2label.values())
-        
-    # ✅ Build a known vocabulary for learning filter
+        # Rebuild the matcher whenever attribute_loader reloads a collection
+        register_refresh_listener(self._on_facets_refreshed)
+
+    # --------------------------------------------------------
+    # Facet vocabulary + precompiled matcher
+    # --------------------------------------------------------
+    def _on_facets_refreshed(self, collection: str, facets: Dict):
+        if collection == DEFAULT_COLLECTION:
+            self._product_facets = facets or {}
+        elif collection == "orderHistory":
+            self._order_facets = facets or {}
+        else:
+            return
+        self._rebuild_facet_index()
+
+    def _rebuild_facet_index(self):
+        facets = dict(self._product_facets)
+        facets.update(self._order_facets)
+        print("[DEBUG] order facets ->", list(facets.get("status", []))[:10])
+
+        # ✅ Build a known vocabulary for learning filter
         facet_values = []
-        for values in self.facets.values():
+        for values in facets.values():
             facet_values.extend([str(v).lower() for v in values])
-        self.known_terms = set(facet_values + [
+        known_terms = set(facet_values + [
             # common brands, materials, colors, etc.
             "3m", "bosch", "dewalt", "makita", "godrej", "havells", "hitachi", "stanley", "kito", "ge",
             "steel", "plastic", "wood", "fibre",
             "red", "blue", "black", "white", "gray", "silver", "gold",
             "grinder", "drill", "brush", "tools", "broadloom", "vinyl", "ceramic", "granite"
         ])
+        matcher = FacetMatcher(facets)
+        phonetic = PhoneticIndex(facets)
+
+        # Swap in one step so concurrent requests never see a half-built index
+        self.facets, self.known_terms, self._matcher, self._phonetic = facets, known_terms, matcher, phonetic
+        self.vocab_version += 1
+        self._entity_cache.clear()
+
+    def _compute_model_version(self) -> str:
+        mtimes = []
+        for name in ("config.json", "model.safetensors", "pytorch_model.bin", "model.onnx"):
+            path = os.path.join(self.model_path, name)
+            if os.path.exists(path):
+                mtimes.append(f"{name}:{int(os.path.getmtime(path))}")
+        return f"{self.backend.name}|" + ",".join(mtimes)
+
+    def cache_stats(self) -> Dict:
+        return {
+            "model_version": self.model_version,
+            "vocab_version": self.vocab_version,
+            "intent_cache": self._intent_cache.stats(),
+            "entity_cache": self._entity_cache.stats(),
+            "phonetic_index": self._phonetic.stats(),
+            "batcher": self._batcher.stats(),
+        }
 
     # --------------------------------------------------------
-    # Intent classification (kept as-is; used by main.py)
+    # Intent classification
     # --------------------------------------------------------
-    def classify_intent(self, text: str):
+    def classify_intent_batch(self, texts: List[str]) -> List[Tuple[str, float]]:
+        """One padded forward pass for many utterances."""
+        if not texts:
+            return []
         try:
-            inputs = self.tokenizer(text, return_tensors="pt", truncation=True, padding=True)
-            with torch.no_grad():
-                logits = self.model(**inputs).logits
-                probs = torch.softmax(logits, dim=1)[0]
-                idx = torch.argmax(probs).item()
-                conf = float(probs[idx])
-            intent = self.label_names[idx]
-            return intent, conf
+            inputs = dict(self.tokenizer(texts, return_tensors="np", truncation=True, padding=True))
+            probs = self.backend.predict_proba(inputs)
+            idxs = probs.argmax(axis=1)
+            return [(self.label_names[int(i)], float(probs[row, i])) for row, i in enumerate(idxs)]
         except Exception as e:
             print(f"[WARN] Intent classification failed: {e}")
-            return "unknown", 0.0
+            return [("unknown", 0.0)] * len(texts)
+
+    def classify_intent(self, text: str):
+        key = (self.model_version, text)
+        cached = self._intent_cache.get(key)
+        if cached is not None:
+            return cached
+        result = self.classify_intent_batch([text])[0]
+        if result[0] != "unknown":
+            self._intent_cache.set(key, result)
+        return result
+
+    async def aclassify_intent(self, text: str) -> Tuple[str, float]:
+        """Non-blocking classify for async endpoints (micro-batched, see intent_batcher.py)."""
+        key = (self.model_version, text)
+        cached = self._intent_cache.get(key)
+        if cached is not None:
+            return cached
+        result = await self._batcher.classify(text)
+        if result[0] != "unknown":
+            self._intent_cache.set(key, result)
+        return result
 
     # --------------------------------------------------------
     # Text normalization (brands, product types, mishears)
@@ -80,44 +190,50 @@ class NLU:
         Normalize natural language text into a Solr-friendly string.
         Handles noise words, plurals, and phonetic / synonym normalization.
         """
+        return self._normalize(text)[0]
+
+    def _normalize(self, text: str) -> Tuple[str, List[str]]:
+        """normalize_text() plus the final word tokens (reused by the pipeline)."""
         normalized = text.lower().strip()
 
         # --- Remove filler or polite words ---
         # These don't affect meaning but confuse Solr matching
-        normalized = re.sub(r"\b(the|a|an|please|kindly|show|get|give|list|display|find|all of|of)\b", " ", normalized)
+        normalized = _FILLER_WORDS.sub(" ", normalized)
 
         # --- Normalize plurals ---
-        normalized = re.sub(r"\bproducts\b", "product", normalized)
-        normalized = re.sub(r"\borders\b", "order", normalized)
+        normalized = _PLURAL_PRODUCTS.sub("product", normalized)
+        normalized = _PLURAL_ORDERS.sub("order", normalized)
 
         # --- Collapse multiple spaces ---
-        normalized = re.sub(r"\s+", " ", normalized).strip()
+        normalized = _WHITESPACE.sub(" ", normalized).strip()
         
         # ✅ --- NEW: Self-learning unknown term logger (before normalization) ---
-        raw_tokens = re.findall(r"\b[a-zA-Z0-9]+\b", normalized)
+        raw_tokens = _TOKEN.findall(normalized)
         raw_unknowns = [t for t in raw_tokens if t not in self.known_terms and len(t) > 2]
         if raw_unknowns:
-            log_unknown_terms(raw_unknowns, list(self.known_terms))
+            log_unknown_terms(raw_unknowns)
 
         # --- Apply phonetic and mishear corrections ---
-        for pattern, repl in PHONETIC_RULES.items():
-            normalized = re.sub(pattern, repl, normalized)
-        for pattern, repl in PRODUCT_TYPE_NORMALIZATION.items():
-            normalized = re.sub(pattern, repl, normalized)
-        for pattern, repl in VOICE_MISHEAR_CORRECTIONS.items():
-            if pattern in normalized:
-                print(f"[DEBUG][VOICE_CORRECTION] Replacing '{pattern}' → '{repl}' in '{normalized}'")
-            normalized = re.sub(pattern, repl, normalized, flags=re.IGNORECASE)
-        for pattern, replacement in _PHONETIC_MAP.items():
-            normalized = re.sub(pattern, replacement, normalized, flags=re.IGNORECASE)
-            
+        # All phonetic_rules.py tables run as one precompiled scan (rule_compiler.py)
+        corrected = get_rewrite_engine().rewrite(normalized)
+        if corrected != normalized:
+            print(f"[DEBUG][VOICE_CORRECTION] '{normalized}' → '{corrected}'")
+        normalized = corrected
+
+        # --- Sound-alike lookup against the live facet vocabulary ---
+        # Static tables above win; this catches mishears they don't list yet
+        resolved = self._phonetic.resolve(normalized, self.known_terms)
+        if resolved != normalized:
+            print(f"[DEBUG][PHONETIC_INDEX] '{normalized}' → '{resolved}'")
+        normalized = resolved
+
         # ✅ --- NEW: Self-learning unknown term logger ---
-        tokens = re.findall(r"\b[a-zA-Z0-9]+\b", normalized)
+        tokens = _TOKEN.findall(normalized)
         unknowns = [t for t in tokens if t not in self.known_terms and len(t) > 2]
         if unknowns:
-            log_unknown_terms(unknowns, list(self.known_terms))
+            log_unknown_terms(unknowns)
             
-        return normalized
+        return normalized, tokens
 
 
     # --------------------------------------------------------
@@ -190,40 +306,45 @@ class NLU:
     # Entity extraction (merged + customer-safe account logic)
     # --------------------------------------------------------
     def extract_entities(self, text: str) -> Dict:
-        entities: Dict = {}
-            
         normalized = self.normalize_text(text)
-        lowered = normalized.lower()    
-        #lowered = text.lower()
-        ignore_fields = {"search_text", "_text_", "_version_", "id"}
+        account_id, is_partial = self._extract_account_id(text)
+        return self._build_entities(normalized.lower(), account_id, is_partial)
 
-        def fuzzy_ratio(a, b):
-            return SequenceMatcher(None, a.lower(), b.lower()).ratio()
+    def _build_entities(self, lowered: str, account_id: Optional[str], is_partial: bool) -> Dict:
+        entities: Dict = {}
 
         # 0) Account ID (customer-safe) — do FIRST so we always capture it
-        account_id, is_partial = self._extract_account_id(text)
         if account_id:
             entities["account_id"] = account_id
         elif is_partial:
             entities["account_partial"] = True  # router will ask the user to repeat
 
+        # 1-3) Facet / price / synonym entities (memoized on normalized text);
+        # an account id heard in the raw text is never replaced by a facet hit
+        vocab = self._vocab_entities(lowered)
+        if account_id:
+            vocab.pop("account_id", None)
+        entities.update(vocab)
+
+        # 4) Fallback search text (only if nothing else captured)
+        if not entities:
+            entities["search_text"] = lowered
+        print("[ENTITIES RAW]", entities)
+        return entities
+
+    def _vocab_entities(self, lowered: str) -> Dict:
+        """Entities that depend only on the normalized text and the facet vocabulary."""
+        key = (self.vocab_version, lowered)
+        cached = self._entity_cache.get(key)
+        if cached is not None:
+            return dict(cached)
+
+        entities: Dict = {}
+
         # 1) Fuzzy match against Solr facet values (brand/material/color/etc.)
-        for field, values in self.facets.items():
-            if field in ignore_fields:
-                continue
-            best_match = None
-            best_score = 0.0
-            for v in values:
-                v_clean = str(v).lower().strip()
-                score = fuzzy_ratio(lowered, v_clean)
-                if score > best_score:
-                    best_match, best_score = v, score
-                # literal contains check
-                if re.search(rf"\b{re.escape(v_clean)}\b", lowered):
-                    best_match, best_score = v, 1.0
-                    break
-            if best_score >= 0.8:
-                entities[field] = best_match
+        #    Literal hits come from one automaton scan; fuzzy hits are scored
+        #    only for length/char-compatible candidates (see facet_matcher.py).
+        entities.update(self._matcher.match(lowered))
 
         # 2) Price handling
         under = re.search(r"under\s+(\d+)", lowered)
@@ -250,12 +371,50 @@ class NLU:
             if syn in lowered and canonical in self.facets:
                 entities[canonical] = syn
 
-        # 4) Fallback search text (only if nothing else captured)
-        if not entities:
-            entities["search_text"] = lowered
-        print("[ENTITIES RAW]", entities)
+        self._entity_cache.set(key, dict(entities))
         return entities
 
+    # --------------------------------------------------------
+    # Staged pipeline: normalize → tokenize → account → entities → intent
+    # --------------------------------------------------------
+    def _run_stages(self, text: str) -> NLUResult:
+        result = NLUResult(input=text)
+
+        t0 = time.perf_counter()
+        result.normalized, result.tokens = self._normalize(text)
+        t1 = time.perf_counter()
+        # Account digits are read from the raw utterance (customer-safe)
+        result.account_id, result.account_partial = self._extract_account_id(text)
+        t2 = time.perf_counter()
+        result.entities = self._build_entities(
+            result.normalized.lower(), result.account_id, result.account_partial
+        )
+        t3 = time.perf_counter()
+
+        result.timings = {
+            "normalize": round((t1 - t0) * 1000, 3),
+            "account": round((t2 - t1) * 1000, 3),
+            "entities": round((t3 - t2) * 1000, 3),
+        }
+        return result
+
+    def analyze(self, text: str, with_intent: bool = True) -> NLUResult:
+        result = self._run_stages(text)
+        if with_intent:
+            t0 = time.perf_counter()
+            result.intent, result.confidence = self.classify_intent(result.normalized)
+            result.timings["intent"] = round((time.perf_counter() - t0) * 1000, 3)
+        return result
+
+    async def aanalyze(self, text: str, with_intent: bool = True) -> NLUResult:
+        """Async analyze(); the model call is micro-batched off the event loop."""
+        result = self._run_stages(text)
+        if with_intent:
+            t0 = time.perf_counter()
+            result.intent, result.confidence = await self.aclassify_intent(result.normalized)
+            result.timings["intent"] = round((time.perf_counter() - t0) * 1000, 3)
+        return result
+
     # --------------------------------------------------------
     # Optional combined pipeline (not used by your main.py, but handy)
     # --------------------------------------------------------
@@ -266,17 +425,16 @@ class NLU:
           2) classify intent,
           3) extract entities (incl. account ID).
         """
-        normalized = self.normalize_text(text)
-        intent, confidence = self.classify_intent(normalized)
-        entities = self.extract_entities(text)  # pass raw text so account logic works safely
+        result = self.analyze(text)
+        intent, confidence = result.intent, result.confidence
 
-        lowered = normalized.lower()
+        lowered = result.normalized.lower()
         if "all" in lowered and "order" in lowered:
             intent = "view_all_orders"
             confidence = max(confidence, 0.8)
             print(f"[DEBUG] Overridden intent to {intent} based on keyword match")
 
-        return {"intent": intent, "confidence": confidence, "entities": entities}
+        return {"intent": intent, "confidence": confidence, "entities": result.entities}
     
     # --------------------------------------------------------
     # Unified inference helper for voice endpoints
@@ -288,14 +446,8 @@ class NLU:
           - intent classification
           - entity extraction
         """
-        normalized = self.normalize_text(text)
-        intent, confidence = self.classify_intent(normalized)
-        entities = self.extract_entities(normalized)
-        return {
-            "input": text,
-            "normalized": normalized,
-            "intent": intent,
-            "confidence": confidence,
-            "entities": entities
-    }
+        return self.analyze(text).to_dict()
 
+    async def ainfer(self, text: str) -> Dict:
+        """Async variant of infer(); the model call is batched off the event loop."""
+        return (await self.aanalyze(text)).to_dict()
@@ -0,0 +1,27 @@
+# nlu_registry.py
+# ================================================
+# Process-wide NLU instance shared by main.py, routes and services.
+# Created lazily on first use (one tokenizer + model + facet load per
+# worker); facet refreshes reach it through attribute_loader listeners.
+# ================================================
+import threading
+from typing import Optional
+
+from nlu_engine import NLU
+
+_lock = threading.Lock()
+_instance: Optional[NLU] = None
+
+
+def get_nlu() -> NLU:
+    """Return the shared NLU, building it on first call (thread-safe)."""
+    global _instance
+    if _instance is None:
+        with _lock:
+            if _instance is None:
+                _instance = NLU()
+    return _instance
+
+
+def is_nlu_loaded() -> bool:
+    return _instance is not None
@@ -0,0 +1,201 @@
+# order_items.py
+# ================================================
+# Index-time denormalization of order lines.
+# Each orderHistory doc carries parallel multi-valued item_* arrays, one
+# entry per line: the line itself (item_product_id, item_quantity, ...)
+# and the product fields the UI renders (item_name, item_brand, ...).
+#   build_order_docs()  - writer side (tasks/order_indexer.py,
+#                         reindex_orders.py)
+#   read_items()        - reader side; no JSON parsing, no product join
+# Solr drops nulls inside multi-valued fields, and the default update
+# chain's remove-blank processor drops "" values as well; either would
+# shift every later entry. Missing values are therefore written as the
+# ITEM_BLANK sentinel ("-"), or as 0 for numeric fields with the position
+# recorded in a marker field (item_line_nulls / item_product_nulls, entries
+# "<field>:<index>") so a real 0 stays distinguishable; both read back as None.
+# ================================================
+import datetime
+import decimal
+from typing import Dict, List, Optional, Tuple
+
+from solr_client import solr_get_sync
+from solr_query import fl_for
+
+# Solr field -> product field
+ITEM_PRODUCT_FIELDS = {
+    "item_name": "name",
+    "item_brand": "brand",
+    "item_price": "price",
+    "item_material": "material",
+    "item_color": "color",
+    "item_weight": "weight",
+    "item_image_url": "image_url",
+}
+NUMERIC_ITEM_FIELDS = {"item_quantity", "item_unit_price", "item_total_price", "item_price"}
+ITEM_BLANK = "-"  # non-empty, so remove-blank keeps it
+LINE_NULLS_FIELD = "item_line_nulls"        # missing numerics of the line fields
+PRODUCT_NULLS_FIELD = "item_product_nulls"  # ... of the product fields (rewritten with them)
+
+# order_item column -> Solr field
+ITEM_LINE_FIELDS = {
+    "item_id": "item_id",
+    "product_id": "item_product_id",
+    "quantity": "item_quantity",
+    "unit_price": "item_unit_price",
+    "total_price": "item_total_price",
+}
+
+
+def _as_list(val) -> List:
+    if val is None:
+        return []
+    return val if isinstance(val, list) else [val]  # normalize_solr_doc flattens one-item arrays
+
+
+def _is_missing(val) -> bool:
+    return val is None or str(val).strip() == ""
+
+
+def _placeholder(field: str, val):
+    if isinstance(val, list):  # multi-valued product field: first value, as normalize_solr_doc would show
+        val = val[0] if val else None
+    if _is_missing(val):
+        return 0 if field in NUMERIC_ITEM_FIELDS else ITEM_BLANK
+    if field in NUMERIC_ITEM_FIELDS:
+        return float(val) if field != "item_quantity" else int(val)
+    return str(val)
+
+
+def _append(out: Dict[str, List], nulls: List[str], field: str, val):
+    if isinstance(val, list):
+        val = val[0] if val else None
+    if field in NUMERIC_ITEM_FIELDS and _is_missing(val):
+        nulls.append(f"{field}:{len(out[field])}")
+    out[field].append(_placeholder(field, val))
+
+
+def _unblank(val):
+    return None if val in (ITEM_BLANK, "") else val  # "" = docs indexed before ITEM_BLANK
+
+
+def product_fields(product_ids: List[str], products: Dict[str, dict]) -> Dict[str, List]:
+    """item_name/item_brand/... arrays (and their null markers) for the given line product ids."""
+    out: Dict[str, List] = {f: [] for f in ITEM_PRODUCT_FIELDS}
+    nulls: List[str] = []
+    for pid in product_ids:
+        product = products.get(str(pid).strip()) or {}
+        for field, src in ITEM_PRODUCT_FIELDS.items():
+            _append(out, nulls, field, product.get(src))
+    out[PRODUCT_NULLS_FIELD] = nulls  # always set, so an atomic "set" clears stale markers
+    return out
+
+
+def denormalize_items(items: List[dict], products: Dict[str, dict]) -> Dict[str, List]:
+    """Every item_* array for an order's lines (order_item rows) and their products."""
+    out: Dict[str, List] = {field: [] for field in ITEM_LINE_FIELDS.values()}
+    nulls: List[str] = []
+    for item in items:
+        for column, field in ITEM_LINE_FIELDS.items():
+            _append(out, nulls, field, item.get(column))
+    out[LINE_NULLS_FIELD] = nulls
+    out.update(product_fields([str(i.get("product_id") or "") for i in items], products))
+    return out
+
+
+def default_serializer(obj):
+    """json.dumps default= for MySQL rows (dates, decimals)."""
+    if isinstance(obj, (datetime.date, datetime.datetime)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    return str(obj)
+
+
+def fetch_products(product_ids: List[str], chunk_size: int = 100) -> Dict[str, dict]:
+    """{id: product} via real-time get, projected to the enrichment fields."""
+    ids = sorted({str(p).strip() for p in product_ids if p and p != ITEM_BLANK})
+    found: Dict[str, dict] = {}
+    for i in range(0, len(ids), chunk_size):
+        data = solr_get_sync(
+            "products",
+            {"ids": ",".join(ids[i:i + chunk_size]), "fl": fl_for("products", "enrichment"), "wt": "json"},
+            handler="get",
+        )
+        for doc in data.get("response", {}).get("docs", []):
+            found[str(doc.get("id"))] = doc
+    return found
+
+
+def build_order_docs(headers: List[dict], items: List[dict]) -> List[dict]:
+    """
+    orderHistory docs from order_header rows and their order_item rows
+    (any order), with one product lookup for the whole batch.
+    """
+    items_by_order: Dict[str, List[dict]] = {}
+    for item in items:
+        items_by_order.setdefault(str(item["order_id"]), []).append(item)
+
+    products = fetch_products([item.get("product_id") for item in items])
+
+    docs = []
+    for header in headers:
+        order_items = items_by_order.get(str(header["order_id"]), [])
+        docs.append({
+            **header,  # merge header columns directly
+            "id": str(header["order_id"]),  # uniqueKey; otherwise the update chain assigns a random uuid
+            "total_items": len(order_items),
+            "order_items_value": sum(float(i["total_price"] or 0) for i in order_items),
+            **denormalize_items(order_items, products),
+        })
+    return docs
+
+
+def is_denormalized(order: dict) -> bool:
+    return "item_name" in order
+
+
+def read_items(order: dict) -> Optional[Tuple[List[dict], List[dict]]]:
+    """
+    (items, product_details) straight from the item_* arrays, or None for
+    docs indexed before denormalization (callers fall back to the join).
+    Items keep the items_json keys (client OrderItem: item_id, product_id,
+    product_name, brand, quantity, unit_price, total_price); details keep
+    those of the legacy join in services/order_service.enrich_orders.
+    """
+    if not is_denormalized(order):
+        return None
+
+    arrays = {f: _as_list(order.get(f)) for f in list(ITEM_LINE_FIELDS.values()) + list(ITEM_PRODUCT_FIELDS)}
+    nulls = set(_as_list(order.get(LINE_NULLS_FIELD))) | set(_as_list(order.get(PRODUCT_NULLS_FIELD)))
+
+    def at(field: str, idx: int):
+        values = arrays[field]
+        if idx >= len(values) or f"{field}:{idx}" in nulls:
+            return None
+        return _unblank(values[idx])
+
+    items, details = [], []
+    for idx in range(len(arrays["item_product_id"])):
+        pid = at("item_product_id", idx)
+        name = at("item_name", idx)
+        items.append({
+            "item_id": at("item_id", idx),
+            "product_id": pid,
+            "product_name": name or None,
+            "brand": at("item_brand", idx) or None,
+            "quantity": at("item_quantity", idx),
+            "unit_price": at("item_unit_price", idx),
+            "total_price": at("item_total_price", idx),
+        })
+        if name:  # None = product unknown at index time
+            details.append({
+                "product_id": pid,
+                "name": name,
+                "brand": at("item_brand", idx) or None,
+                "price": at("item_price", idx),
+                "material": at("item_material", idx) or None,
+                "color": at("item_color", idx) or None,
+                "weight": at("item_weight", idx) or None,
+                "image_url": at("item_image_url", idx) or None,
+            })
+    return items, details
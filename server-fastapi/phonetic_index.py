@@ -0,0 +1,161 @@
+# phonetic_index.py
+# ================================================
+# Sound-alike index over facet values for voice mishear resolution.
+# Every facet token (and every multi-word value, joined) is keyed by a
+# simplified Metaphone code, so "bosh" / "maketa" / "god rage" resolve to
+# "bosch" / "makita" / "godrej" with one dict lookup instead of a
+# hand-written rule per brand. Rebuilt by NLU whenever facets refresh;
+# the static phonetic_rules.py tables still run first and act as overrides.
+# ================================================
+import os
+import re
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set
+
+from facet_matcher import COMMAND_WORDS
+
+# A candidate must also look like the heard token (guards key collisions)
+MIN_SIMILARITY = float(os.getenv("PHONETIC_MIN_SIMILARITY", "0.7"))
+MIN_TOKEN_LEN = 3
+
+_VOWELS = set("aeiouy")
+
+# Ordered rewrites applied before per-letter coding
+_DIGRAPHS = [
+    (re.compile(r"^(kn|gn|pn|wr)"), lambda m: m.group(1)[1]),
+    (re.compile(r"^x"), lambda m: "s"),
+    (re.compile(r"^wh"), lambda m: "w"),
+    (re.compile(r"tch|sch|sh|ch"), lambda m: "X"),
+    (re.compile(r"ph"), lambda m: "f"),
+    (re.compile(r"ck"), lambda m: "k"),
+    (re.compile(r"dg(?=[eiy])"), lambda m: "j"),
+    (re.compile(r"gh(?![aeiou])"), lambda m: ""),
+    (re.compile(r"c(?=[eiy])"), lambda m: "s"),
+    (re.compile(r"g(?=[eiy])"), lambda m: "j"),
+]
+
+_LETTER_CODES = {
+    "b": "B", "c": "K", "d": "T", "f": "F", "g": "K", "j": "J", "k": "K",
+    "l": "L", "m": "M", "n": "N", "p": "P", "q": "K", "r": "R", "s": "S",
+    "t": "T", "v": "F", "x": "KS", "z": "S", "X": "X",
+}
+
+
+@lru_cache(maxsize=65536)
+def phonetic_key(word: str) -> str:
+    """
+    Simplified Metaphone: merges letters that sound alike and drops
+    non-leading vowels, e.g. bosch/bosh -> BX, makita/maketa -> MKT,
+    godrej/godrage -> KTRJ. Returns "" for words that are not plain letters.
+    """
+    w = word.lower()
+    if not w.isalpha():
+        return ""
+    for pattern, repl in _DIGRAPHS:
+        w = pattern.sub(repl, w)
+
+    out: List[str] = []
+    for i, ch in enumerate(w):
+        if ch in _VOWELS:
+            if i == 0:
+                out.append("A")
+            continue
+        if ch in ("h", "w"):
+            # Only sounded when leading into a vowel
+            nxt = w[i + 1] if i + 1 < len(w) else ""
+            if i == 0 and nxt in _VOWELS:
+                out.append(ch.upper())
+            continue
+        code = _LETTER_CODES.get(ch, "")
+        if code and (not out or out[-1] != code):
+            out.append(code)
+    return "".join(out)
+
+
+class PhoneticIndex:
+    """
+    key -> canonical lowercase term. Keys shared by several different
+    terms are marked ambiguous and never used, so a lookup either has one
+    clear answer or none.
+    """
+
+    def __init__(self, facets: Dict[str, Iterable]):
+        buckets: Dict[str, Set[str]] = {}
+        for values in facets.values():
+            for value in values:
+                text = str(value).lower().strip()
+                words = text.split()
+                if not words:
+                    continue
+                for w in words:
+                    self._add(buckets, w, w)
+                if len(words) > 1:
+                    self._add(buckets, "".join(words), text)
+
+        self._index: Dict[str, str] = {}
+        self.ambiguous = 0
+        for key, terms in buckets.items():
+            if len(terms) == 1:
+                self._index[key] = next(iter(terms))
+            else:
+                self.ambiguous += 1
+        self.resolved = 0
+
+    @staticmethod
+    def _add(buckets: Dict[str, Set[str]], spelling: str, term: str) -> None:
+        if len(spelling) < MIN_TOKEN_LEN:
+            return
+        key = phonetic_key(spelling)
+        if len(key) >= 2:
+            buckets.setdefault(key, set()).add(term)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def lookup(self, heard: str) -> Optional[str]:
+        """Canonical term that sounds like `heard` (may be joined words), or None."""
+        if len(heard) < MIN_TOKEN_LEN:
+            return None
+        term = self._index.get(phonetic_key(heard))
+        if term is None or term.replace(" ", "") == heard:
+            return None
+        if SequenceMatcher(None, heard, term.replace(" ", "")).ratio() < MIN_SIMILARITY:
+            return None
+        return term
+
+    def resolve(self, text: str, known_terms: Set[str]) -> str:
+        """
+        Rewrite unknown words in an already-normalized utterance. Adjacent
+        unknown pairs are tried joined first ("god rage" -> "godrej"), then
+        single words. Known vocabulary and command words are left alone.
+        """
+        words = text.split()
+
+        def candidate(w: str) -> bool:
+            return w.isalpha() and w not in known_terms and w not in COMMAND_WORDS
+
+        out: List[str] = []
+        i = 0
+        while i < len(words):
+            w = words[i]
+            if not candidate(w):
+                out.append(w)
+                i += 1
+                continue
+            if i + 1 < len(words) and candidate(words[i + 1]):
+                term = self.lookup(w + words[i + 1])
+                if term:
+                    out.append(term)
+                    self.resolved += 1
+                    i += 2
+                    continue
+            term = self.lookup(w)
+            if term:
+                self.resolved += 1
+            out.append(term or w)
+            i += 1
+        return " ".join(out)
+
+    def stats(self) -> Dict:
+        return {"keys": len(self._index), "ambiguous": self.ambiguous, "resolved": self.resolved}
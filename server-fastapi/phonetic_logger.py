@@ -1,43 +1,233 @@
 # phonetic_logger.py
+# ================================================
+# Self-learning log of terms the NLU did not recognize.
+# Calls only bump in-memory counters; a daemon thread flushes the deltas
+# every PHONETIC_LOG_FLUSH_SECONDS as append-only NDJSON lines, and once
+# the journal grows past PHONETIC_LOG_COMPACT_BYTES it is folded into a
+# JSON snapshot. File writes take an fcntl lock where available, so
+# several workers can share the same files safely.
+#
+#   phonetic_learning_log.ndjson   {"term", "count", "first_seen", "last_seen", "samples"} per line
+#   phonetic_learning_log.json     {term: {"count", "first_seen", "last_seen", "samples"}}
+# ================================================
+import atexit
 import json
 import os
 import re
-from datetime import datetime
-from typing import List
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
 
-LOG_FILE = "phonetic_learning_log.json"
+try:
+    import fcntl
+except ImportError:  # Windows: single-writer only
+    fcntl = None
 
-def _load_log() -> dict:
-    if os.path.exists(LOG_FILE):
+LOG_FILE = os.getenv("PHONETIC_LOG_FILE", "phonetic_learning_log.ndjson")
+SNAPSHOT_FILE = os.getenv("PHONETIC_LOG_SNAPSHOT", "phonetic_learning_log.json")
+LOCK_FILE = LOG_FILE + ".lock"
+FLUSH_SECONDS = float(os.getenv("PHONETIC_LOG_FLUSH_SECONDS", "10"))
+COMPACT_BYTES = int(os.getenv("PHONETIC_LOG_COMPACT_BYTES", str(5 * 1024 * 1024)))
+MAX_SAMPLES = int(os.getenv("PHONETIC_LOG_MAX_SAMPLES", "5"))
+
+_CLEAN = re.compile(r"[^a-z0-9\s]")
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
+
+
+def _merge(into: Dict[str, dict], term: str, entry: dict) -> None:
+    cur = into.get(term)
+    if cur is None:
+        into[term] = {
+            "count": int(entry.get("count", 0)),
+            "first_seen": entry.get("first_seen"),
+            "last_seen": entry.get("last_seen"),
+            "samples": list(entry.get("samples", []))[:MAX_SAMPLES],
+        }
+        return
+    cur["count"] += int(entry.get("count", 0))
+    if entry.get("first_seen") and (not cur["first_seen"] or entry["first_seen"] < cur["first_seen"]):
+        cur["first_seen"] = entry["first_seen"]
+    if entry.get("last_seen") and (not cur["last_seen"] or entry["last_seen"] > cur["last_seen"]):
+        cur["last_seen"] = entry["last_seen"]
+    for s in entry.get("samples", []):
+        if len(cur["samples"]) >= MAX_SAMPLES:
+            break
+        if s not in cur["samples"]:
+            cur["samples"].append(s)
+
+
+class _FileLock:
+    """Exclusive advisory lock shared by every process using LOG_FILE."""
+
+    def __enter__(self):
+        self._fh = open(LOCK_FILE, "a")
+        if fcntl:
+            fcntl.flock(self._fh, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self._fh, fcntl.LOCK_UN)
+        self._fh.close()
+
+
+class UnknownTermAggregator:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[str, dict] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # --------------------------------------------------------
+    # Hot path: in-memory only
+    # --------------------------------------------------------
+    def record(self, raw_terms: Iterable[str]) -> None:
+        now = _now()
+        with self._lock:
+            for t in raw_terms:
+                t_clean = _CLEAN.sub("", t.lower()).strip()
+                if len(t_clean) < 2:
+                    continue
+                entry = self._pending.get(t_clean)
+                if entry is None:
+                    self._pending[t_clean] = {"count": 1, "first_seen": now, "last_seen": now, "samples": [t]}
+                    continue
+                entry["count"] += 1
+                entry["last_seen"] = now
+                if len(entry["samples"]) < MAX_SAMPLES and t not in entry["samples"]:
+                    entry["samples"].append(t)
+        self._ensure_flusher()
+
+    def _ensure_flusher(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="phonetic-log-flush", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(FLUSH_SECONDS):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[WARN] Unknown-term log flush failed: {e}")
+
+    # --------------------------------------------------------
+    # Persistence
+    # --------------------------------------------------------
+    def flush(self) -> int:
+        """Append pending deltas to the journal; compact if it grew too large."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        lines = "".join(
+            json.dumps({"term": term, **entry}, ensure_ascii=False) + "\n"
+            for term, entry in pending.items()
+        )
+        with _FileLock():
+            with open(LOG_FILE, "a", encoding="utf-8") as f:
+                f.write(lines)
+            if os.path.getsize(LOG_FILE) > COMPACT_BYTES:
+                self._compact_locked()
+        return len(pending)
+
+    def compact(self) -> None:
+        with _FileLock():
+            self._compact_locked()
+
+    def _compact_locked(self) -> None:
+        data = _read_persisted()
+        tmp = SNAPSHOT_FILE + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, SNAPSHOT_FILE)
+        open(LOG_FILE, "w").close()
+        print(f"[INFO] Compacted unknown-term log ({len(data)} terms)")
+
+    def stop(self) -> None:
+        self._stop.set()
         try:
-            with open(LOG_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            return {}
-    return {}
+            self.flush()
+        except Exception as e:
+            print(f"[WARN] Final unknown-term log flush failed: {e}")
+
+    # --------------------------------------------------------
+    # Query
+    # --------------------------------------------------------
+    def top(self, n: int = 50) -> List[dict]:
+        data = _read_persisted()
+        with self._lock:
+            for term, entry in self._pending.items():
+                _merge(data, term, entry)
+        ranked = sorted(data.items(), key=lambda kv: (-kv[1]["count"], kv[0]))[:n]
+        return [{"term": term, **entry} for term, entry in ranked]
+
+
+def _read_persisted() -> Dict[str, dict]:
+    """Snapshot merged with every journal line written since the last compaction."""
+    data: Dict[str, dict] = {}
+    if os.path.exists(SNAPSHOT_FILE):
+        try:
+            with open(SNAPSHOT_FILE, "r", encoding="utf-8") as f:
+                snapshot = json.load(f) or {}
+        except (OSError, ValueError):
+            snapshot = {}
+        for term, entry in snapshot.items():
+            if isinstance(entry, list):
+                # Legacy format: one {"timestamp", "original"} record per sighting
+                stamps = [e.get("timestamp") for e in entry if e.get("timestamp")]
+                entry = {
+                    "count": len(entry),
+                    "first_seen": min(stamps) if stamps else None,
+                    "last_seen": max(stamps) if stamps else None,
+                    "samples": list(dict.fromkeys(e.get("original") for e in entry if e.get("original"))),
+                }
+            _merge(data, term, entry)
+
+    if os.path.exists(LOG_FILE):
+        with open(LOG_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn line from a crashed writer
+                term = entry.pop("term", None)
+                if term:
+                    _merge(data, term, entry)
+    return data
 
-def _save_log(data: dict):
-    with open(LOG_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
 
-def log_unknown_terms(raw_terms: List[str], known_terms: List[str]):
+_aggregator = UnknownTermAggregator()
+atexit.register(_aggregator.stop)
+
+
+def log_unknown_terms(raw_terms: List[str], known_terms: Optional[Iterable[str]] = None):
     """
-    Logs any tokens not recognized in the known vocabulary.
-    Uses a human-readable UTC timestamp.
+    Counts tokens not recognized in the known vocabulary (no file I/O here).
+    Callers normally pre-filter; known_terms is still honoured if passed.
     """
-    data = _load_log()
-    known_set = set(t.lower() for t in known_terms)
-
-    for t in raw_terms:
-        t_clean = re.sub(r"[^a-z0-9\s]", "", t.lower()).strip()
-        if not t_clean or len(t_clean) < 2:
-            continue
-        if t_clean not in known_set:
-            entry = data.get(t_clean, [])
-            entry.append({
-                "timestamp": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC"),
-                "original": t
-            })
-            data[t_clean] = entry
-
-    _save_log(data)
+    if known_terms is not None:
+        known_set = known_terms if isinstance(known_terms, (set, frozenset)) else {t.lower() for t in known_terms}
+        raw_terms = [t for t in raw_terms if t.lower() not in known_set]
+    if raw_terms:
+        _aggregator.record(raw_terms)
+
+
+def top_unknown_terms(n: int = 50) -> List[dict]:
+    """Most frequent unknown terms across all workers (persisted + this process's pending)."""
+    return _aggregator.top(n)
+
+
+def flush_unknown_terms() -> int:
+    return _aggregator.flush()
+
+
+def compact_unknown_terms() -> None:
+    _aggregator.compact()
@@ -0,0 +1,216 @@
+# product_cache.py
+# ================================================
+# Bounded product-document cache used by order enrichment.
+#   - LRU with TTL, capped by entry count and by approximate bytes
+#   - single-flight: concurrent requests for the same ids share one load
+#   - stale-while-revalidate: entries past TTL (but within the stale
+#     window) are served immediately while one background refresh runs
+#   - ids Solr doesn't know are cached as misses so they aren't re-queried
+# Loaders are async fn(ids) -> {id: doc}; see services/solr_service.py.
+# ================================================
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, List, Set
+
+PRODUCT_CACHE_SIZE = int(os.getenv("PRODUCT_CACHE_SIZE", "50000"))
+PRODUCT_CACHE_TTL = float(os.getenv("PRODUCT_CACHE_TTL", "600"))            # fresh for (s)
+PRODUCT_CACHE_STALE_TTL = float(os.getenv("PRODUCT_CACHE_STALE_TTL", "3600"))  # servable for (s)
+PRODUCT_CACHE_MAX_BYTES = int(os.getenv("PRODUCT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+Loader = Callable[[List[str]], Awaitable[Dict[str, dict]]]
+
+_NOT_FOUND = object()  # negative-cache marker
+
+
+def _approx_size(doc) -> int:
+    if doc is _NOT_FOUND:
+        return 64
+    try:
+        return len(json.dumps(doc, default=str)) + 64
+    except (TypeError, ValueError):
+        return 1024
+
+
+class ProductCache:
+    def __init__(
+        self,
+        maxsize: int = PRODUCT_CACHE_SIZE,
+        ttl: float = PRODUCT_CACHE_TTL,
+        stale_ttl: float = PRODUCT_CACHE_STALE_TTL,
+        max_bytes: int = PRODUCT_CACHE_MAX_BYTES,
+    ):
+        self.maxsize = max(maxsize, 1)
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # id -> (doc, stored_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refreshing: Set[asyncio.Task] = set()  # strong refs to background refreshes
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.loads = 0
+        self.load_errors = 0
+        self.evictions = 0
+
+    # --------------------------------------------------------
+    # Storage
+    # --------------------------------------------------------
+    def _lookup(self, pid: str, now: float):
+        """(doc, is_stale) or None. Expired entries are dropped."""
+        with self._lock:
+            item = self._data.get(pid)
+            if item is None:
+                return None
+            doc, stored_at, size = item
+            age = now - stored_at
+            if age > self.stale_ttl:
+                del self._data[pid]
+                self._bytes -= size
+                return None
+            self._data.move_to_end(pid)
+            return doc, age > self.ttl
+
+    def _store(self, pid: str, doc) -> None:
+        size = _approx_size(doc)
+        with self._lock:
+            old = self._data.pop(pid, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._data[pid] = (doc, time.monotonic(), size)
+            self._bytes += size
+            while self._data and (len(self._data) > self.maxsize or self._bytes > self.max_bytes):
+                _, (_, _, evicted) = self._data.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def invalidate(self, pids: List[str]) -> None:
+        with self._lock:
+            for pid in pids:
+                item = self._data.pop(str(pid), None)
+                if item is not None:
+                    self._bytes -= item[2]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    # --------------------------------------------------------
+    # Loading
+    # --------------------------------------------------------
+    def _begin(self, pids: List[str]) -> Dict[str, asyncio.Future]:
+        """Register single-flight futures for pids (before any await)."""
+        loop = asyncio.get_running_loop()
+        futures = {pid: loop.create_future() for pid in pids}
+        self._inflight.update(futures)
+        return futures
+
+    async def _run_load(self, futures: Dict[str, asyncio.Future], loader: Loader) -> None:
+        """One loader call for all pids; results go to the cache and the futures."""
+        self.loads += 1
+        try:
+            fetched = await loader(list(futures))
+        except Exception as e:
+            self.load_errors += 1
+            for fut in futures.values():
+                if not fut.done():
+                    fut.set_exception(e)
+                    fut.exception()  # consumed here; coalesced waiters still re-raise
+            raise
+        finally:
+            for pid, fut in futures.items():
+                if self._inflight.get(pid) is fut:
+                    del self._inflight[pid]
+
+        for pid, fut in futures.items():
+            doc = fetched.get(pid, _NOT_FOUND)
+            self._store(pid, doc)
+            if not fut.done():
+                fut.set_result(doc)
+
+    async def _refresh(self, futures: Dict[str, asyncio.Future], loader: Loader) -> None:
+        try:
+            await self._run_load(futures, loader)
+        except Exception as e:
+            print(f"[WARN] Background product refresh failed for {len(futures)} ids: {e}")
+
+    async def get_many(self, pids: List[str], loader: Loader) -> Dict[str, dict]:
+        """{id: doc} for every id the loader knows; unknown ids are omitted."""
+        now = time.monotonic()
+        out: Dict[str, dict] = {}
+        to_load: List[str] = []
+        to_refresh: List[str] = []
+        waiting: Dict[str, asyncio.Future] = {}
+
+        for pid in dict.fromkeys(pids):
+            found = self._lookup(pid, now)
+            if found is not None:
+                doc, stale = found
+                if stale:
+                    self.stale_hits += 1
+                    if pid not in self._inflight:
+                        to_refresh.append(pid)
+                else:
+                    self.hits += 1
+                if doc is not _NOT_FOUND:
+                    out[pid] = doc
+                continue
+
+            self.misses += 1
+            fut = self._inflight.get(pid)
+            if fut is not None:
+                self.coalesced += 1
+                waiting[pid] = fut
+            else:
+                to_load.append(pid)
+
+        if to_refresh:
+            task = asyncio.ensure_future(self._refresh(self._begin(to_refresh), loader))
+            self._refreshing.add(task)
+            task.add_done_callback(self._refreshing.discard)
+
+        if to_load:
+            futures = self._begin(to_load)
+            waiting.update(futures)
+            await self._run_load(futures, loader)
+
+        for pid, fut in waiting.items():
+            doc = await fut
+            if doc is not _NOT_FOUND:
+                out[pid] = doc
+        return out
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            "coalesced": self.coalesced,
+            "loads": self.loads,
+            "load_errors": self.load_errors,
+            "evictions": self.evictions,
+            "inflight": len(self._inflight),
+        }
+
+
+product_cache = ProductCache()
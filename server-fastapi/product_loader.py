@@ -0,0 +1,103 @@
+# product_loader.py
+# ================================================
+# DataLoader-style batcher for product lookups by id.
+# Every load()/load_many() made during one event-loop tick - across all
+# concurrent requests - is merged into a single batch and fetched from
+# Solr's real-time get handler (/get?ids=...), which skips query parsing
+# and returns docs that are indexed but not yet committed. Large batches
+# are split into chunks that are fetched concurrently. Each loader
+# projects to one fl profile (see solr_query.FL_PROFILES).
+# ================================================
+import asyncio
+import os
+from typing import Dict, List, Optional
+
+from solr_client import solr_get
+from solr_query import fl_for
+
+PRODUCT_LOADER_CHUNK = int(os.getenv("PRODUCT_LOADER_CHUNK", "100"))
+
+
+class ProductLoader:
+    def __init__(self, collection: str = "products", profile: str = "detail", chunk_size: int = PRODUCT_LOADER_CHUNK):
+        self.collection = collection
+        self.profile = profile
+        self.fl = fl_for(collection, profile)
+        self.chunk_size = max(chunk_size, 1)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._scheduled = False
+
+        # Simple counters for /cache/stats
+        self.batches = 0
+        self.requests = 0
+        self.ids = 0
+
+    def _queue(self, pid: str) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._pending, self._scheduled = loop, {}, False
+
+        fut = self._pending.get(pid)
+        if fut is None:
+            fut = self._pending[pid] = loop.create_future()
+        if not self._scheduled:
+            # Dispatch once everything queued during this tick is in
+            self._scheduled = True
+            loop.call_soon(self._dispatch)
+        return fut
+
+    def _dispatch(self) -> None:
+        batch, self._pending, self._scheduled = self._pending, {}, False
+        if batch:
+            self._loop.create_task(self._fetch(batch))
+
+    async def _fetch_chunk(self, ids: List[str]) -> List[dict]:
+        params = {"ids": ",".join(ids), "wt": "json"}
+        if self.fl:
+            params["fl"] = self.fl
+        data = await solr_get(self.collection, params, handler="get")
+        return data.get("response", {}).get("docs", [])
+
+    async def _fetch(self, batch: Dict[str, asyncio.Future]) -> None:
+        ids = list(batch)
+        chunks = [ids[i:i + self.chunk_size] for i in range(0, len(ids), self.chunk_size)]
+        self.batches += 1
+        self.requests += len(chunks)
+        self.ids += len(ids)
+        try:
+            results = await asyncio.gather(*(self._fetch_chunk(c) for c in chunks))
+        except Exception as e:
+            for fut in batch.values():
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        found = {str(doc.get("id")): doc for docs in results for doc in docs}
+        for pid, fut in batch.items():
+            if not fut.done():
+                fut.set_result(found.get(pid))
+
+    async def load(self, pid: str) -> Optional[dict]:
+        """Raw stored product doc, or None if the id is unknown."""
+        return await self._queue(str(pid).strip())
+
+    async def load_many(self, pids: List[str]) -> Dict[str, dict]:
+        """{id: doc} for the ids that exist."""
+        keys = list(dict.fromkeys(str(p).strip() for p in pids if p))
+        docs = await asyncio.gather(*(self._queue(k) for k in keys))
+        return {k: d for k, d in zip(keys, docs) if d is not None}
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "solr_requests": self.requests,
+            "ids": self.ids,
+            "avg_batch_size": round(self.ids / self.batches, 2) if self.batches else 0.0,
+            "chunk_size": self.chunk_size,
+            "profile": self.profile,
+        }
+
+
+product_loader = ProductLoader()                            # product pages, /products/details
+enrichment_loader = ProductLoader(profile="enrichment")     # order line items (via product_cache)
@@ -0,0 +1,315 @@
+# reindex_orders.py
+# ================================================
+# Full rebuild of orderHistory from MySQL, e.g. after a schema change.
+#   1. create a fresh collection  <alias>_<timestamp>  (same configset,
+#      shards and replicas as the live one)
+#   2. split order_header into primary-key ranges; worker processes read
+#      their ranges with keyset pagination (WHERE order_id > last ...
+#      ORDER BY order_id LIMIT n) and bulk-load docs built by
+#      order_items.build_order_docs (no per-batch commits)
+#   3. one hard commit, then compare the doc count with MySQL; a failed
+#      or incomplete build is deleted
+#   4. CREATEALIAS <alias> -> new collection: an atomic swap, so queries
+#      never see a half-built index
+#   5. re-index orders changed while the load ran, drop old builds
+#
+#   python reindex_orders.py --workers 4 --batch-size 1000
+#
+# The app addresses orderHistory by name, so it follows the alias. While
+# orderHistory is still a plain collection Solr can't create an alias with
+# that name; the first run needs --replace-collection, which deletes the
+# old collection just before creating the alias (a gap of a second or so).
+# ================================================
+import argparse
+import datetime
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from db.mysql_client import get_connection
+from order_items import build_order_docs, default_serializer
+from solr_client import SOLR_BASE, collection_url, get_sync_session, solr_get_sync
+
+REINDEX_ALIAS = os.getenv("REINDEX_ALIAS", "orderHistory")
+REINDEX_WORKERS = int(os.getenv("REINDEX_WORKERS", str(max(os.cpu_count() or 2, 2))))
+REINDEX_BATCH_SIZE = int(os.getenv("REINDEX_BATCH_SIZE", "1000"))
+PARTITIONS_PER_WORKER = 4  # smaller ranges keep workers evenly loaded
+
+Range = Tuple[Optional[str], Optional[str]]  # [lo, hi) on order_id; None = open
+
+
+# --------------------------------------------------------
+# Solr Collections API
+# --------------------------------------------------------
+def collections_api(action: str, **params) -> Dict:
+    resp = get_sync_session().get(
+        f"{SOLR_BASE}/admin/collections",
+        params={"action": action, "wt": "json", **params},
+        timeout=300,
+    )
+    data = resp.json() if resp.content else {}
+    if resp.status_code != 200 or data.get("error"):
+        raise RuntimeError(f"{action} failed ({resp.status_code}): {data.get('error') or resp.text[:300]}")
+    return data
+
+
+def cluster_state() -> Tuple[Dict, Dict]:
+    """(collections, aliases) from CLUSTERSTATUS."""
+    cluster = collections_api("CLUSTERSTATUS").get("cluster", {})
+    return cluster.get("collections", {}) or {}, cluster.get("aliases", {}) or {}
+
+
+def collection_layout(collection: str) -> Dict:
+    """configset, shard count and replicas per shard of an existing collection."""
+    state = cluster_state()[0].get(collection, {})
+    shards = state.get("shards", {}) or {}
+    replicas = max((len(s.get("replicas", {}) or {}) for s in shards.values()), default=0)
+    return {
+        "configset": state.get("configName"),
+        "shards": len(shards) or None,
+        "replicas": replicas or int(state.get("replicationFactor") or 0) or None,
+    }
+
+
+def live_collection(alias: str) -> Tuple[Optional[str], bool]:
+    """(collection currently serving `alias`, whether that name is a real collection)."""
+    collections, aliases = cluster_state()
+    if alias in aliases:
+        return aliases[alias].split(",")[0], False
+    if alias in collections:
+        return alias, True
+    return None, False
+
+
+# --------------------------------------------------------
+# MySQL partitions
+# --------------------------------------------------------
+def pk_ranges(parts: int) -> Tuple[List[Range], int]:
+    """Split order_header into ~equal order_id ranges (works for any sortable PK)."""
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM order_header")
+        total = cursor.fetchone()[0]
+        bounds = []
+        for k in range(1, parts):
+            cursor.execute(
+                "SELECT order_id FROM order_header ORDER BY order_id LIMIT 1 OFFSET %s",
+                (total * k // parts,),
+            )
+            row = cursor.fetchone()
+            if row and (not bounds or row[0] != bounds[-1]):
+                bounds.append(row[0])
+        cursor.close()
+    finally:
+        conn.close()
+    edges = [None] + bounds + [None]
+    return list(zip(edges[:-1], edges[1:])), total
+
+
+def _read_range(cursor, rng: Range, batch_size: int):
+    """Keyset pagination over one range: yields lists of header rows."""
+    lo, hi = rng
+    last = None
+    while True:
+        where, args = [], []
+        if last is not None:
+            where.append("order_id > %s")
+            args.append(last)
+        elif lo is not None:
+            where.append("order_id >= %s")
+            args.append(lo)
+        if hi is not None:
+            where.append("order_id < %s")
+            args.append(hi)
+        sql = "SELECT * FROM order_header"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        cursor.execute(sql + " ORDER BY order_id LIMIT %s", (*args, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < batch_size:
+            return
+        last = rows[-1]["order_id"]
+
+
+def _load_items(cursor, order_ids: List) -> List[dict]:
+    placeholders = ", ".join(["%s"] * len(order_ids))
+    cursor.execute(f"SELECT * FROM order_item WHERE order_id IN ({placeholders})", order_ids)
+    return cursor.fetchall()
+
+
+def post_docs(collection: str, docs: List[dict], commit_within: Optional[int] = None) -> None:
+    url = collection_url(collection, "update")
+    if commit_within:
+        url += f"?commitWithin={commit_within}"
+    resp = get_sync_session().post(
+        url,
+        data=json.dumps(docs, default=default_serializer),
+        headers={"Content-Type": "application/json"},
+        timeout=300,
+    )
+    if resp.status_code != 200:
+        raise RuntimeError(f"Solr update failed ({resp.status_code}): {resp.text[:300]}")
+
+
+# --------------------------------------------------------
+# Worker process
+# --------------------------------------------------------
+def index_range(job: Tuple[str, Range, int]) -> Tuple[Range, int, float]:
+    """Load one PK range into the target collection; returns (range, docs, seconds)."""
+    collection, rng, batch_size = job
+    started = time.perf_counter()
+    indexed = 0
+    conn = get_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        for headers in _read_range(cursor, rng, batch_size):
+            items = _load_items(cursor, [h["order_id"] for h in headers])
+            post_docs(collection, build_order_docs(headers, items))  # no commit: one at the end
+            indexed += len(headers)
+        cursor.close()
+    finally:
+        conn.close()
+    return rng, indexed, time.perf_counter() - started
+
+
+# --------------------------------------------------------
+# Orchestration
+# --------------------------------------------------------
+def catch_up(collection: str, since: datetime.datetime, batch_size: int) -> int:
+    """Re-index orders updated while the load ran (needs order_header.updated_at)."""
+    conn = get_connection()
+    indexed = 0
+    try:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute("SELECT order_id FROM order_header WHERE updated_at >= %s", (since,))
+        except Exception as e:
+            print(f"[WARN] Catch-up skipped ({e})")
+            return 0
+        ids = [r["order_id"] for r in cursor.fetchall()]
+        for i in range(0, len(ids), batch_size):
+            chunk = ids[i:i + batch_size]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(f"SELECT * FROM order_header WHERE order_id IN ({placeholders})", chunk)
+            headers = cursor.fetchall()
+            post_docs(collection, build_order_docs(headers, _load_items(cursor, chunk)), commit_within=2000)
+            indexed += len(headers)
+        cursor.close()
+    finally:
+        conn.close()
+    return indexed
+
+
+def drop_old_builds(alias: str, keep: int, current: str) -> None:
+    collections, aliases = cluster_state()
+    in_use = {c for target in aliases.values() for c in target.split(",")}
+    builds = sorted(c for c in collections if c.startswith(f"{alias}_") and c != current and c not in in_use)
+    for name in builds[:max(len(builds) - keep, 0)]:
+        print(f"[INFO] Deleting old build {name}")
+        collections_api("DELETE", name=name)
+
+
+def load_target(target: str, args) -> bool:
+    """Parallel load, commit and count check; False if the build is incomplete."""
+    started = time.perf_counter()
+    ranges, total = pk_ranges(args.workers * PARTITIONS_PER_WORKER)
+    print(f"[INFO] {total} orders in {len(ranges)} ranges, {args.workers} workers, batch {args.batch_size}")
+
+    done = 0
+    jobs = [(target, rng, args.batch_size) for rng in ranges]
+    # spawn: workers must not inherit the parent's HTTP / MySQL sockets
+    with mp.get_context("spawn").Pool(args.workers) as pool:
+        for rng, n, seconds in pool.imap_unordered(index_range, jobs):
+            done += n
+            elapsed = time.perf_counter() - started
+            print(f"[INFO] range {rng}: {n} docs in {seconds:.1f}s | "
+                  f"{done}/{total} ({done / elapsed:.0f} docs/s)")
+
+    print(f"[INFO] Committing {target}...")
+    get_sync_session().get(collection_url(target, "update"), params={"commit": "true", "wt": "json"},
+                           timeout=600).raise_for_status()
+
+    found = solr_get_sync(target, {"q": "*:*", "rows": 0, "wt": "json"}).get("response", {}).get("numFound", 0)
+    elapsed = time.perf_counter() - started
+    print(f"[INFO] Loaded {found} docs in {elapsed:.1f}s ({found / elapsed if elapsed else 0:.0f} docs/s)")
+    if found < total and not args.force:
+        print(f"[ERROR] {target} has {found} docs but MySQL has {total}; alias NOT switched "
+              f"(use --force to switch anyway)")
+        return False
+    return True
+
+
+def reindex(args) -> int:
+    alias = args.alias
+    live, is_collection = live_collection(alias)
+    if is_collection and not args.replace_collection:
+        print(f"[ERROR] '{alias}' is a collection, not an alias. Re-run with --replace-collection to "
+              f"migrate it to an alias (it is deleted right before the alias is created).")
+        return 2
+
+    layout = collection_layout(live) if live else {}
+    configset = args.configset or layout.get("configset")
+    shards = args.shards or layout.get("shards")
+    replicas = args.replicas or layout.get("replicas")
+    if not (configset and shards and replicas):
+        print("[ERROR] No live collection to copy the layout from; pass --configset, --shards and --replicas")
+        return 2
+
+    target = f"{alias}_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}"
+    print(f"[INFO] Creating {target} (configset={configset}, shards={shards}, replicas={replicas})")
+    collections_api("CREATE", name=target, numShards=shards, replicationFactor=replicas,
+                    **{"collection.configName": configset})
+
+    started_at = datetime.datetime.now()
+    try:
+        ok = load_target(target, args)
+    except BaseException:
+        print(f"[ERROR] Load failed; deleting half-built {target}")
+        try:
+            collections_api("DELETE", name=target)
+        except Exception as e:
+            print(f"[WARN] Could not delete {target}: {e}")
+        raise
+    if not ok:
+        print(f"[INFO] Deleting incomplete {target}")
+        collections_api("DELETE", name=target)
+        return 1
+
+    if is_collection:
+        print(f"[WARN] Deleting collection '{alias}' to replace it with an alias")
+        collections_api("DELETE", name=alias)
+    collections_api("CREATEALIAS", name=alias, collections=target)
+    print(f"[INFO] Alias {alias} -> {target} (was {live})")
+
+    caught_up = catch_up(alias, started_at, args.batch_size)
+    if caught_up:
+        print(f"[INFO] Re-indexed {caught_up} orders changed during the load")
+
+    drop_old_builds(alias, args.keep, target)
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Rebuild orderHistory from MySQL and swap it in via an alias")
+    parser.add_argument("--alias", default=REINDEX_ALIAS)
+    parser.add_argument("--workers", type=int, default=REINDEX_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=REINDEX_BATCH_SIZE)
+    parser.add_argument("--shards", type=int, default=None, help="default: same as the live collection")
+    parser.add_argument("--replicas", type=int, default=None, help="default: same as the live collection")
+    parser.add_argument("--configset", default=None, help="default: configset of the live collection")
+    parser.add_argument("--keep", type=int, default=1, help="previous builds to keep for rollback")
+    parser.add_argument("--force", action="store_true", help="switch the alias even if counts differ")
+    parser.add_argument("--replace-collection", action="store_true",
+                        help="first run only: replace the plain collection named --alias with an alias")
+    return reindex(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
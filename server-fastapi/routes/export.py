@@ -0,0 +1,72 @@
+# routes/export.py
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from services.export_service import export_orders, export_products, EXPORT_FORMATS
+
+router = APIRouter(prefix="/export", tags=["Export"])
+
+
+def _streaming(body, fmt: str, name: str) -> StreamingResponse:
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
+
+
+def _check_format(fmt: str) -> str:
+    fmt = (fmt or "").lower()
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {sorted(EXPORT_FORMATS)}")
+    return fmt
+
+
+# --------------------------
+# Orders (enriched with product_details)
+# --------------------------
+@router.get("/orders")
+async def export_order_history(
+    account_id: Optional[str] = Query(None, description="Account ID for normal user"),
+    super_user: bool = Query(False, description="If true, exports all orders"),
+    status: Optional[str] = Query(None),
+    payment_status: Optional[str] = Query(None),
+    format: str = Query("ndjson", description="ndjson | csv"),
+):
+    """
+    Stream every matching order:
+    - /api/export/orders?account_id=ACC1002&format=csv
+    - /api/export/orders?super_user=true
+    """
+    fmt = _check_format(format)
+    if not super_user and not account_id:
+        raise HTTPException(status_code=400, detail="Provide either account_id or super_user=true")
+
+    filters = {"status": status, "payment_status": payment_status}
+    try:
+        body = export_orders(account_id=None if super_user else account_id, fmt=fmt, filters=filters)
+    except ValueError as e:  # malformed filter
+        raise HTTPException(status_code=400, detail=str(e))
+    return _streaming(body, fmt, f"orders_{'all' if super_user else account_id}")
+
+
+# --------------------------
+# Products (catalog)
+# --------------------------
+@router.get("/products")
+async def export_catalog(
+    q: Optional[str] = Query(None, description="Free-text search; empty exports the whole catalog"),
+    brand: Optional[str] = Query(None),
+    material: Optional[str] = Query(None),
+    color: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    price: Optional[str] = Query(None, description="e.g., [0 TO 500]"),
+    format: str = Query("ndjson", description="ndjson | csv"),
+):
+    fmt = _check_format(format)
+    filters = {"brand": brand, "material": material, "color": color, "category": category, "price": price}
+    try:
+        body = export_products(q=q, fmt=fmt, filters=filters)
+    except ValueError as e:  # malformed filter, e.g. price
+        raise HTTPException(status_code=400, detail=str(e))
+    return _streaming(body, fmt, "products")
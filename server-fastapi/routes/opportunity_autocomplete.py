@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import APIRouter, Query
 from services.opportunity_autocomplete_service import search_accounts, search_contacts
 
@@ -10,8 +11,8 @@ async def autocomplete(q: str = Query(..., min_length=1)):
     More types (owners, campaigns) can be added later.
     """
 
-    accounts = await search_accounts(q)
-    contacts = await search_contacts(q)
+    # two pooled connections, queried concurrently
+    accounts, contacts = await asyncio.gather(search_accounts(q), search_contacts(q))
 
     return {
         "query": q,
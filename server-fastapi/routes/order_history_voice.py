@@ -2,10 +2,9 @@
 from fastapi import APIRouter, HTTPException, Header, Request, Query, Body
 from typing import Optional, Dict, Any
 from services.order_service import get_orders_with_products
-from nlu_engine import NLU
+from nlu_registry import get_nlu
 
 router = APIRouter(prefix="/orderhistory", tags=["Order History (Voice)"])
-_nlu = NLU()
 
 # -------------------------------------------------------
 # 1️⃣ Helper: Generate voice-friendly speech summary
@@ -31,6 +30,7 @@ async def order_history_query(
     super_user_q: bool = Query(False, description="Super user flag (GET fallback)"),
     page_q: int = Query(1, ge=1, description="Page number (GET fallback)"),
     page_size_q: int = Query(20, ge=1, le=100, description="Page size (GET fallback)"),
+    cursor_q: Optional[str] = Query(None, alias="cursor", description="nextCursor from the previous page"),
 ):
     """
     Handles both voice-based (POST) and API (GET) order history queries.
@@ -38,6 +38,7 @@ async def order_history_query(
     - Voice: {"query": "show my orders", "account_id": "ACC1027", "super_user": true}
     - Angular/UI filters: {"filters": {"status": ["Delivered"], "price": ["[500 TO 999999]"]}}
     - Simple GET requests: /orderhistory/query?super_user=true&page=1&pageSize=20
+    - Deep paging: pass the response's nextCursor back as "cursor"
     """
 
     # ----------------------------------------------
@@ -48,13 +49,15 @@ async def order_history_query(
     super_user_flag = (x_super_user or "").lower() == "true" or bool((payload or {}).get("super_user", False) if payload else super_user_q)
     page = int((payload or {}).get("page", page_q))
     pageSize = int((payload or {}).get("pageSize", page_size_q))
+    cursor = (payload or {}).get("cursor", cursor_q)
     filters = (payload or {}).get("filters", {}) if payload else {}
 
     # ----------------------------------------------
     # 2️⃣ Handle voice-based query intent (if any)
     # ----------------------------------------------
     if text:
-        entities = _nlu.extract_entities(text)
+        # Only entities are needed here, so skip the intent model
+        entities = (await get_nlu().aanalyze(text, with_intent=False)).entities
         if not super_user_flag and not account_id:
             if "account_id" in entities:
                 account_id = entities["account_id"]
@@ -84,6 +87,7 @@ async def order_history_query(
             is_super_user=super_user_flag,
             page=page,
             pageSize=pageSize,
+            cursor=cursor,
         )
 
         if result.get("numFound", 0) == 0:
@@ -100,5 +104,7 @@ async def order_history_query(
 
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,10 +1,9 @@
 # routes/order_voice.py
 from fastapi import APIRouter, Body, HTTPException
-from nlu_engine import NLU
+from nlu_registry import get_nlu
 from services.solr_voice_order_service import fetch_solr_orders_voice
 
 router = APIRouter(prefix="/orders", tags=["Orders (Voice)"])
-_nlu = NLU()
 
 
 def sanitize_entities(entities: dict) -> dict:
@@ -35,6 +34,7 @@ async def order_voice(payload: dict = Body(...)):
     text = (payload or {}).get("query", "")
     page = int((payload or {}).get("page", 1))
     pageSize = int((payload or {}).get("pageSize", 20))
+    cursor = (payload or {}).get("cursor")
 
     print(f"################## 1 : {text}")
 
@@ -42,7 +42,7 @@ async def order_voice(payload: dict = Body(...)):
         raise HTTPException(status_code=400, detail="Query text required")
 
     # Step 1: Run NLU
-    result = _nlu.infer(text)
+    result = (await get_nlu().aanalyze(text)).to_dict()
     intent = result.get("intent", "unknown")
     raw_entities = result.get("entities", {})
     
@@ -73,12 +73,16 @@ async def order_voice(payload: dict = Body(...)):
     print(f"################## 3 (final fq): {filters}")
 
     # Step 5: Query Solr
-    solr_result = await fetch_solr_orders_voice(
-        query=q,
-        page=page,
-        pageSize=pageSize,
-        filters=filters
-    )
+    try:
+        solr_result = await fetch_solr_orders_voice(
+            query=q,
+            page=page,
+            pageSize=pageSize,
+            filters=filters,
+            cursor=cursor
+        )
+    except ValueError as e:  # malformed cursor
+        raise HTTPException(status_code=400, detail=str(e))
 
     # Step 6: Handle no results
     if solr_result.get("numFound", 0) == 0:
@@ -1,10 +1,11 @@
 # routes/orders.py
+import asyncio
 from fastapi import APIRouter, HTTPException, Query,Body
 from typing import List, Optional, Dict, Any
 from model.order_history import OrderHistory
 from services.order_service import get_orders_with_products
 from tasks.order_indexer import index_order_in_solr
-import mysql.connector
+from db.mysql_async import execute
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
@@ -18,12 +19,14 @@ async def get_order_history(
     account_id: Optional[str] = Query(None, description="Account ID for normal user"),
     super_user: bool = Query(False, description="If true, fetches all orders"),
     page: int = Query(1, ge=1, description="Page number (1-based)"),
-    pageSize: int = Query(20, ge=1, le=100, description="Items per page (max 100)")
+    pageSize: int = Query(20, ge=1, le=100, description="Items per page (max 100)"),
+    cursor: Optional[str] = Query(None, description="nextCursor from the previous page (deep paging)")
 ):
     """
     Unified GET + POST endpoint:
     - GET → /api/orders/history?account_id=ACC1002&super_user=false&page=1&pageSize=20
     - POST → { "superUser": true, "page": 1, "pageSize": 20 }
+    - Deep paging: pass the response's nextCursor back as `cursor`
     """
 
     # 🧩 Merge POST payload with query params
@@ -33,13 +36,14 @@ async def get_order_history(
         super_user = payload.get("super_user", payload.get("superUser", super_user))
         page = int(payload.get("page", page))
         pageSize = int(payload.get("pageSize", pageSize))
+        cursor = payload.get("cursor", cursor)
 
     try:
         # 🔹 Choose between super-user and normal account view
         if super_user:
-            result = await get_orders_with_products(account_id=None, is_super_user=True, page=page, pageSize=pageSize)
+            result = await get_orders_with_products(account_id=None, is_super_user=True, page=page, pageSize=pageSize, cursor=cursor)
         elif account_id:
-            result = await get_orders_with_products(account_id=account_id, is_super_user=False, page=page, pageSize=pageSize)
+            result = await get_orders_with_products(account_id=account_id, is_super_user=False, page=page, pageSize=pageSize, cursor=cursor)
         else:
             raise HTTPException(status_code=400, detail="Provide either account_id or super_user=true")
 
@@ -48,6 +52,10 @@ async def get_order_history(
 
         return result
 
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -56,23 +64,15 @@ async def get_order_history(
 # 2️⃣  Create order
 # --------------------------
 @router.post("/orders")
-def create_order(order: dict):
+async def create_order(order: dict):
     """
-    Insert order into MySQL, then trigger Solr indexing.
+    Insert order into MySQL (async pool), then trigger Solr indexing.
     """
-    conn = mysql.connector.connect(
-        host="localhost",
-        user="sa",
-        password="nimda",
-        database="openvoice360"
-    )
-    cursor = conn.cursor()
-    cursor.execute(
+    await execute(
         "INSERT INTO order_header (order_id, account_id, order_date, status, total_amount, currency) VALUES (%s, %s, %s, %s, %s, %s)",
         (order["order_id"], order["account_id"], order["order_date"], order["status"], order["total_amount"], order["currency"])
     )
-    conn.commit()
-    conn.close()
 
-    index_order_in_solr.delay(order["order_id"])
+    # .delay() talks to the Redis broker synchronously
+    await asyncio.to_thread(index_order_in_solr.delay, order["order_id"])
     return {"message": "Order created and indexing triggered."}
@@ -0,0 +1,14 @@
+# routes/payload.py
+from typing import Optional
+
+FALSE_VALUES = {"false", "0", "no", "off", ""}
+
+
+def payload_flag(payload: Optional[dict], key: str, default: bool = True) -> bool:
+    """Boolean from a JSON body: true/false, 1/0 and their string forms ("false" is False)."""
+    value = (payload or {}).get(key)
+    if value is None:
+        return default
+    if isinstance(value, str):
+        return value.strip().lower() not in FALSE_VALUES
+    return bool(value)
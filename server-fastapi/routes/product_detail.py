@@ -1,13 +1,19 @@
 #routes/product_detail.py
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from services.product_detail_service import fetch_product_by_id
+from typing import List
+from services.product_detail_service import fetch_product_by_id, fetch_products_by_ids
 
 router = APIRouter(prefix="/products", tags=["Product Detail"])
 
+MAX_BULK_IDS = 500
+
 class ProductDetailRequest(BaseModel):
     product_id: str
 
+class ProductDetailsBulkRequest(BaseModel):
+    product_ids: List[str]
+
 @router.post("/detail")
 async def product_detail(req: ProductDetailRequest):
     product_id = req.product_id.strip()
@@ -25,3 +31,21 @@ async def product_detail(req: ProductDetailRequest):
         "product_id": product_id,
         "product": product
     }
+
+
+@router.post("/details")
+async def product_details_bulk(req: ProductDetailsBulkRequest):
+    product_ids = list(dict.fromkeys(pid.strip() for pid in req.product_ids if pid and pid.strip()))
+
+    if not product_ids:
+        raise HTTPException(status_code=400, detail="product_ids is required")
+    if len(product_ids) > MAX_BULK_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_IDS} product_ids per request")
+
+    products = await fetch_products_by_ids(product_ids)
+
+    return {
+        "intent": "product_details",
+        "products": products,
+        "missing": [pid for pid in product_ids if pid not in products]
+    }
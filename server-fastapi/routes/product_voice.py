@@ -1,13 +1,13 @@
 # routes/product_voice.py
 from fastapi import APIRouter, HTTPException
+from routes.payload import payload_flag
 from typing import Dict, Any
 from services.product_service import search_products_natural
 from services.product_filter_parser import normalize_filters_from_frontend
-from nlu_engine import NLU
+from nlu_registry import get_nlu
 import re
 
 router = APIRouter(prefix="/products", tags=["Products (Voice)"])
-_nlu = NLU()
 
 
 def _entities_to_strings(entities: dict) -> list:
@@ -45,15 +45,19 @@ async def products_query(payload: dict):
     page = int((payload or {}).get("page", 1))
     pageSize = int((payload or {}).get("pageSize", 20))
     sort = (payload or {}).get("sort")
+    include_facets = payload_flag(payload, "includeFacets", True)
+    cursor = (payload or {}).get("cursor")
 
+    nlu = get_nlu()
     try:
-        # 1️⃣ Run NLU preprocessing + intent model
-        normalized = _nlu.normalize_text(text)
-        intent, conf = _nlu.classify_intent(normalized)
-        entities = _nlu.extract_entities(normalized)
+        # 1️⃣ Run NLU preprocessing + intent model (single pass, see NLU.aanalyze)
+        nlu_result = await nlu.aanalyze(text)
+        normalized = nlu_result.normalized
+        intent, conf = nlu_result.intent, nlu_result.confidence
+        entities = nlu_result.entities
         lower_text = text.lower().strip()
 
-        print(f"[INTENT MODEL] → {intent} ({conf:.2f})  Entities: {entities}")
+        print(f"[INTENT MODEL] → {intent} ({conf:.2f})  Entities: {entities}  Timings: {nlu_result.timings}")
 
         solr_query = "*:*"
         facet_filters: Dict[str, Any] = {}
@@ -74,6 +78,8 @@ async def products_query(payload: dict):
                 pageSize=pageSize,
                 sort=sort,
                 filters=clean_filters,
+                include_facets=include_facets,
+                cursor=cursor,
             )
 
             if result.get("numFound", 0) == 0:
@@ -92,6 +98,7 @@ async def products_query(payload: dict):
                 "page": result.get("page"),
                 "pageSize": result.get("pageSize"),
                 "totalPages": result.get("totalPages"),
+                "nextCursor": result.get("nextCursor"),
             }
 
         # 3️⃣ Handle “browse all products” / “back to products”
@@ -160,6 +167,8 @@ async def products_query(payload: dict):
             pageSize=pageSize,
             sort=sort,
             filters=facet_filters,
+            include_facets=include_facets,
+            cursor=cursor,
         )
 
         if result.get("numFound", 0) == 0:
@@ -178,9 +187,12 @@ async def products_query(payload: dict):
             "page": result.get("page"),
             "pageSize": result.get("pageSize"),
             "totalPages": result.get("totalPages"),
+            "nextCursor": result.get("nextCursor"),
         }
 
     except HTTPException:
         raise
+    except ValueError as e:  # malformed cursor
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
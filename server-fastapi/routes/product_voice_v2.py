@@ -1,11 +1,11 @@
 # routes/product_voice_v2.py
 from fastapi import APIRouter, Body, HTTPException
-from nlu_engine import NLU
+from routes.payload import payload_flag
+from nlu_registry import get_nlu
 from services.product_service import search_products_natural
 import re
 
 router = APIRouter(prefix="/products", tags=["Products (Voice)"])
-_nlu = NLU()
 
 @router.post("/voice")
 async def product_voice(payload: dict = Body(...)):
@@ -17,12 +17,14 @@ async def product_voice(payload: dict = Body(...)):
     text = (payload or {}).get("query", "").strip()
     page = int((payload or {}).get("page", 1))
     pageSize = int((payload or {}).get("pageSize", 20))
+    include_facets = payload_flag(payload, "includeFacets", True)
+    cursor = (payload or {}).get("cursor")
 
     if not text:
         raise HTTPException(status_code=400, detail="Query text required")
 
     # --- Run NLU ---
-    result = _nlu.infer(text)
+    result = (await get_nlu().aanalyze(text)).to_dict()
     intent = result["intent"]
     entities = result["entities"]
     print(f"[INTENT MODEL] → {intent}  Entities: {entities}")
@@ -57,6 +59,8 @@ async def product_voice(payload: dict = Body(...)):
         page=page,
         pageSize=pageSize,
         filters=filters,
+        include_facets=include_facets,
+        cursor=cursor,
     )
 
     num_found = solr_result.get("numFound", 0)
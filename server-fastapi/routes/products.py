@@ -1,5 +1,6 @@
 # routes/products.py
 from fastapi import APIRouter, Query, HTTPException
+from routes.payload import payload_flag
 from typing import Optional, Dict
 from services.product_service import search_products_structured, search_products_natural
 
@@ -17,6 +18,8 @@ async def products_search(
     page: int = Query(1, ge=1),
     pageSize: int = Query(20, ge=1, le=100),
     sort: Optional[str] = Query(None, description="price_asc|price_desc|name_asc|name_desc|brand_asc"),
+    includeFacets: bool = Query(True, description="false skips facet counts (e.g. when only paging)"),
+    cursor: Optional[str] = Query(None, description="nextCursor from the previous page (deep paging)"),
 ):
     filters: Dict[str, str] = {}
     if brand: filters["brand"] = brand
@@ -26,12 +29,14 @@ async def products_search(
     if price: filters["price"] = price
 
     try:
-        result = await search_products_structured(q, filters, page, pageSize, sort)
+        result = await search_products_structured(q, filters, page, pageSize, sort, include_facets=includeFacets, cursor=cursor)
         if result.get("numFound", 0) == 0:
             raise HTTPException(status_code=404, detail="No products found")
         return result
     except HTTPException:
         raise
+    except ValueError as e:  # malformed cursor
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -39,22 +44,27 @@ async def products_search(
 @router.post("/query")
 async def products_query(payload: dict):
     """
-    Body: { "query": "natural language sentence", "page": 1, "pageSize": 20, "sort": "price_asc" }
+    Body: { "query": "natural language sentence", "page": 1, "pageSize": 20, "sort": "price_asc",
+            "includeFacets": true }
     """
     text = (payload or {}).get("query", "") or ""
     page = int((payload or {}).get("page", 1))
     pageSize = int((payload or {}).get("pageSize", 20))
     sort = (payload or {}).get("sort")
+    include_facets = payload_flag(payload, "includeFacets", True)
+    cursor = (payload or {}).get("cursor")
 
     if not text.strip():
         raise HTTPException(status_code=400, detail="query is required")
 
     try:
-        result = await search_products_natural(text, page=page, pageSize=pageSize, sort=sort)
+        result = await search_products_natural(text, page=page, pageSize=pageSize, sort=sort, include_facets=include_facets, cursor=cursor)
         if result.get("numFound", 0) == 0:
             raise HTTPException(status_code=404, detail="No products found")
         return result
     except HTTPException:
         raise
+    except ValueError as e:  # malformed cursor
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,310 @@
+# rule_compiler.py
+# ================================================
+# Compiles the phonetic_rules.py rewrite tables for NLU.normalize_text.
+# Output is identical to applying every rule with re.sub in table order,
+# but rules that cannot interact share one alternation and one re.sub:
+# a typical table costs a handful of passes instead of one per rule.
+# ================================================
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import phonetic_rules
+
+# Optional JSON file with rule overrides, e.g.
+#   {"VOICE_MISHEAR_CORRECTIONS": {"bosh": "bosch"}, "PHONETIC_MAP": {"\\bgod\\s*raj\\b": "godrej"}}
+# Entries are merged over the static tables and picked up without a restart.
+RULES_FILE = os.getenv("PHONETIC_RULES_FILE", "phonetic_rules_override.json")
+RELOAD_CHECK_SECONDS = float(os.getenv("PHONETIC_RULES_RELOAD_SECONDS", "5"))
+
+# Stage order == precedence (same order NLU.normalize_text always applied them)
+#   (table name, is_regex, ignore_case)
+STAGES = [
+    ("PHONETIC_RULES", True, False),
+    ("PRODUCT_TYPE_NORMALIZATION", True, False),
+    ("VOICE_MISHEAR_CORRECTIONS", False, True),   # plain phrases, matched on word boundaries
+    ("PHONETIC_MAP", True, True),
+]
+
+_STATIC_TABLES = {
+    "PHONETIC_RULES": phonetic_rules.PHONETIC_RULES,
+    "PRODUCT_TYPE_NORMALIZATION": phonetic_rules.PRODUCT_TYPE_NORMALIZATION,
+    "VOICE_MISHEAR_CORRECTIONS": phonetic_rules.VOICE_MISHEAR_CORRECTIONS,
+    "PHONETIC_MAP": phonetic_rules._PHONETIC_MAP,
+}
+
+
+Rule = Tuple[str, str, bool]  # (pattern, replacement, ignore_case)
+
+_BACKREF = re.compile(r"\\\d|\(\?P=")
+_TOKENS = re.compile(r"\w+|[^\w\s]")
+_WORD = re.compile(r"\w")
+_MAX_FORMS = 64
+
+
+def _stage_filter(rules: List[Rule]) -> Optional[re.Pattern]:
+    """One alternation matching wherever any rule of the stage matches (None = can't combine)."""
+    if any(_BACKREF.search(p) for p, _, _ in rules):
+        return None  # group numbers shift inside a combined pattern
+    parts = [f"(?i:{p})" if ic else f"(?:{p})" for p, _, ic in rules]
+    try:
+        return re.compile("|".join(parts))
+    except re.error:
+        return None  # e.g. duplicate group names or global inline flags
+
+
+def _tokens(text: str) -> Tuple[str, ...]:
+    return tuple(_TOKENS.findall(text.lower()))
+
+
+def _word_forms(pattern: str) -> Optional[Set[Tuple[str, ...]]]:
+    """
+    Token sequences a word-bounded phrase pattern can match, e.g.
+    \\b3m\\s*r\\b -> {("3mr",), ("3m", "r")}. Only literal characters
+    (optionally "?"), escaped punctuation and \\s, \\s*, \\s+ between
+    \\b...\\b are understood; anything else returns None.
+    """
+    if not (pattern.startswith(r"\b") and pattern.endswith(r"\b")):
+        return None
+    body = pattern[2:-2]
+    forms = {""}
+    i = 0
+    while i < len(body):
+        if body.startswith(r"\s", i):
+            i += 2
+            glue = i < len(body) and body[i] in "*?"
+            if i < len(body) and body[i] in "*+?":
+                i += 1
+            forms = {f + " " for f in forms} | (forms if glue else set())
+            continue
+        if body[i] == "\\":
+            if i + 1 >= len(body) or body[i + 1].isalnum():
+                return None  # \w, \d, backreferences, ...
+            ch, i = body[i + 1], i + 2
+        elif body[i] in ".^$*+?{}[]|()":
+            return None
+        else:
+            ch, i = body[i], i + 1
+        optional = i < len(body) and body[i] == "?"
+        if optional:
+            i += 1
+        forms = {f + ch for f in forms} | (forms if optional else set())
+        if len(forms) > _MAX_FORMS:
+            return None
+    # every variant must start and end on a word character, or \b means something else
+    if not all(f and _WORD.match(f[0]) and _WORD.match(f[-1]) for f in forms):
+        return None
+    return {_tokens(f) for f in forms}
+
+
+def _contains(outer: Tuple[str, ...], inner: Tuple[str, ...]) -> bool:
+    n = len(inner)
+    return any(outer[i:i + n] == inner for i in range(len(outer) - n + 1))
+
+
+def _overlaps(x: Tuple[str, ...], y: Tuple[str, ...]) -> bool:
+    """Could matches of the two token sequences share a character?"""
+    if _contains(x, y) or _contains(y, x):
+        return True
+    return any(x[-k:] == y[:k] or y[-k:] == x[:k] for k in range(1, min(len(x), len(y))))
+
+
+class _Combinable:
+    __slots__ = ("rule", "forms", "touched")
+
+    def __init__(self, rule: Rule, forms: Set[Tuple[str, ...]]):
+        self.rule = rule
+        self.forms = forms
+        self.touched = forms | {_tokens(rule[1])}  # what it matches, and what it leaves behind
+
+
+def _combinable(rule: Rule) -> Optional[_Combinable]:
+    """
+    A rule that can share a single-pass alternation: a word-bounded phrase
+    whose literal replacement also starts and ends on a word character, so
+    rewriting it never changes a neighbour's \\b.
+    """
+    pattern, repl, _ = rule
+    if not repl or "\\" in repl or not (_WORD.match(repl[0]) and _WORD.match(repl[-1])):
+        return None
+    forms = _word_forms(pattern)
+    return _Combinable(rule, forms) if forms else None
+
+
+def _independent(earlier: _Combinable, later: _Combinable) -> bool:
+    """
+    True if applying `earlier` then `later` equals one pass over both: the
+    later rule can overlap neither the earlier one's matches (which would
+    pick a different winner) nor its replacements (which would feed it).
+    """
+    return not any(_overlaps(a, b) for a in earlier.touched for b in later.forms)
+
+
+class _Segment:
+    """
+    Consecutive rules applied in one re.sub. Combined rules share the
+    leading and trailing \\b of one non-capturing alternation; the
+    replacement is looked up by the matched tokens (no two rules of a
+    segment can match the same text, see _independent).
+    """
+
+    def __init__(self, rule: Optional[Rule] = None, combined: Optional[List[_Combinable]] = None):
+        if combined is None or len(combined) == 1:
+            pattern, repl, ic = rule or combined[0].rule
+            self.pattern = re.compile(pattern, re.IGNORECASE if ic else 0)
+            self.repl = repl
+            self.size = 1
+            return
+        parts = [f"(?i:{c.rule[0][2:-2]})" if c.rule[2] else f"(?:{c.rule[0][2:-2]})" for c in combined]
+        self.pattern = re.compile(r"\b(?:" + "|".join(parts) + r")\b")
+        replacements = {form: c.rule[1] for c in combined for form in c.forms}
+        singles = [(re.compile(p, re.IGNORECASE if ic else 0), repl) for p, repl, ic in (c.rule for c in combined)]
+
+        def repl(m: re.Match) -> str:
+            found = replacements.get(_tokens(m.group(0)))
+            if found is None:  # case folding that str.lower() doesn't mirror
+                found = next(r for single, r in singles if single.fullmatch(m.group(0)))
+            return found
+
+        self.repl = repl
+        self.size = len(combined)
+
+    def sub(self, text: str) -> str:
+        return self.pattern.sub(self.repl, text)
+
+
+def _segments(rules: List[Rule]) -> List[_Segment]:
+    """
+    Split a stage into runs of mutually independent rules (table order
+    kept). Rules that are not simple phrases, or that overlap / feed a
+    later rule, start a new run, so those still apply one after another.
+    """
+    segments: List[_Segment] = []
+    run: List[_Combinable] = []
+    for rule in rules:
+        item = _combinable(rule)
+        if item is not None and all(_independent(prev, item) for prev in run):
+            run.append(item)
+            continue
+        if run:
+            segments.append(_Segment(combined=run))
+        if item is None:
+            segments.append(_Segment(rule))
+            run = []
+        else:
+            run = [item]
+    if run:
+        segments.append(_Segment(combined=run))
+    return segments
+
+
+class RewriteEngine:
+    """
+    Ordered rewrite rules with the exact semantics of the old sequential
+    re.sub chain.
+
+    Each stage is split into segments of rules that cannot interact (see
+    _segments); a segment is one alternation applied with a single re.sub,
+    the replacement looked up from the matched text. A stage with
+    several segments is scanned once with its combined filter first and
+    skipped when nothing in it can fire.
+    """
+
+    def __init__(self, stages: List[List[Rule]]):
+        self.rule_count = sum(len(rules) for rules in stages)
+        self._stages: List[Tuple[Optional[re.Pattern], List[_Segment]]] = []
+        for rules in stages:
+            if not rules:
+                continue
+            segments = _segments(rules)
+            stage_filter = _stage_filter(rules) if len(segments) > 1 else None
+            self._stages.append((stage_filter, segments))
+
+    @property
+    def stage_count(self) -> int:
+        return len(self._stages)
+
+    @property
+    def segment_count(self) -> int:
+        return sum(len(segments) for _, segments in self._stages)
+
+    def rewrite(self, text: str) -> str:
+        for stage_filter, segments in self._stages:
+            if stage_filter is not None and not stage_filter.search(text):
+                continue
+            for segment in segments:
+                text = segment.sub(text)
+        return text
+
+
+def load_tables(path: Optional[str] = RULES_FILE) -> Dict[str, Dict[str, str]]:
+    """Static tables from phonetic_rules.py, with file overrides merged on top."""
+    tables = {name: dict(table) for name, table in _STATIC_TABLES.items()}
+    if path and os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                overrides = json.load(f)
+            for name, table in (overrides or {}).items():
+                name = name.lstrip("_").upper()
+                if name in tables and isinstance(table, dict):
+                    tables[name].update({str(k): str(v) for k, v in table.items()})
+        except (OSError, ValueError) as e:
+            print(f"[WARN] Could not load phonetic rule overrides from {path}: {e}")
+    return tables
+
+
+def compile_rules(tables: Dict[str, Dict[str, str]]) -> RewriteEngine:
+    stages: List[List[Rule]] = []
+    for name, is_regex, ignore_case in STAGES:
+        stage = []
+        for key, repl in tables.get(name, {}).items():
+            pattern = key if is_regex else rf"\b{re.escape(key)}\b"
+            stage.append((pattern, repl, ignore_case))
+        stages.append(stage)
+    return RewriteEngine(stages)
+
+
+# --------------------------------------------------------
+# Process-wide engine with mtime-based hot reload
+# --------------------------------------------------------
+_lock = threading.Lock()
+_engine: Optional[RewriteEngine] = None
+_engine_mtime: Optional[float] = None
+_last_check = 0.0
+
+
+def _file_mtime(path: Optional[str]) -> Optional[float]:
+    try:
+        return os.path.getmtime(path) if path else None
+    except OSError:
+        return None
+
+
+def get_rewrite_engine() -> RewriteEngine:
+    """Returns the compiled engine, recompiling if the override file changed."""
+    global _engine, _engine_mtime, _last_check
+
+    now = time.time()
+    if _engine is not None and now - _last_check < RELOAD_CHECK_SECONDS:
+        return _engine
+
+    with _lock:
+        _last_check = now
+        mtime = _file_mtime(RULES_FILE)
+        if _engine is None or mtime != _engine_mtime:
+            _engine = compile_rules(load_tables(RULES_FILE))
+            _engine_mtime = mtime
+            print(f"[INFO] Compiled {_engine.rule_count} phonetic rules into "
+                  f"{_engine.segment_count} passes ({_engine.stage_count} stages)")
+        return _engine
+
+
+def reload_rules() -> RewriteEngine:
+    """Force a recompile (e.g. from an admin endpoint)."""
+    global _engine
+    with _lock:
+        _engine = None
+    return get_rewrite_engine()
@@ -0,0 +1,182 @@
+# search_cache.py
+# ================================================
+# Result cache for Solr searches (solr_query.execute(..., cache=True)).
+#   key    = collection + index version + SolrQuery.cache_key()
+#            (sorted fq, q, sort, start/rows, facet set, ...)
+#   value  = JSON-encoded SolrResult, TTL-bounded
+# The index version is read with one distributed query over every shard:
+# numFound plus the highest visible _version_. Any commit on any shard -
+# e.g. a new order indexed by Celery - changes it (adds/updates raise the
+# max _version_, deletes lower numFound), and replicas of a shard agree
+# on it, unlike a per-core admin/luke version. The change retires every
+# cached page for that collection; old entries simply age out.
+#
+# Backends (SEARCH_CACHE_BACKEND):
+#   memory - per-process LRU (default)
+#   redis  - shared across uvicorn workers; reuses the Celery Redis
+#   off    - disabled
+# ================================================
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Optional
+
+from nlu_cache import LRUTTLCache
+from solr_client import solr_get
+
+SEARCH_CACHE_BACKEND = os.getenv("SEARCH_CACHE_BACKEND", "memory").lower()
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "60"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1000"))
+SEARCH_CACHE_REDIS_URL = os.getenv("SEARCH_CACHE_REDIS_URL", "redis://localhost:6379/0")
+SEARCH_CACHE_PREFIX = os.getenv("SEARCH_CACHE_PREFIX", "ecomcrm:search:")
+VERSION_CHECK_SECONDS = float(os.getenv("SEARCH_CACHE_VERSION_CHECK_SECONDS", "5"))
+
+
+class MemoryBackend:
+    name = "memory"
+
+    def __init__(self, maxsize: int = SEARCH_CACHE_SIZE, ttl: float = SEARCH_CACHE_TTL):
+        self._cache = LRUTTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        self._cache.set(key, value)
+
+    async def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict:
+        return self._cache.stats()
+
+
+class RedisBackend:
+    name = "redis"
+
+    def __init__(self, url: str = SEARCH_CACHE_REDIS_URL, prefix: str = SEARCH_CACHE_PREFIX):
+        import redis.asyncio as aioredis
+
+        self._redis = aioredis.Redis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[str]:
+        raw = await self._redis.get(self.prefix + key)
+        return raw.decode("utf-8") if raw is not None else None
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        await self._redis.set(self.prefix + key, value, ex=max(int(ttl), 1))
+
+    async def clear(self) -> None:
+        async for k in self._redis.scan_iter(match=self.prefix + "*", count=500):
+            await self._redis.delete(k)
+
+    def stats(self) -> Dict:
+        return {"url": SEARCH_CACHE_REDIS_URL, "prefix": self.prefix}
+
+
+def _make_backend(name: str):
+    if name == "off":
+        return None
+    if name == "redis":
+        try:
+            return RedisBackend()
+        except Exception as e:
+            print(f"[WARN] Redis search cache unavailable ({e}); using in-process cache")
+    elif name != "memory":
+        print(f"[WARN] Unknown SEARCH_CACHE_BACKEND '{name}', using memory")
+    return MemoryBackend()
+
+
+class SearchCache:
+    def __init__(self, backend, ttl: float = SEARCH_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._versions: Dict[str, tuple] = {}  # collection -> (version, checked_at)
+
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    async def index_version(self, collection: str) -> Optional[str]:
+        """Collection-wide index version (all shards), re-read at most every few seconds."""
+        cached = self._versions.get(collection)
+        now = time.monotonic()
+        if cached and now - cached[1] < VERSION_CHECK_SECONDS:
+            return cached[0]
+        try:
+            data = await solr_get(
+                collection,
+                {"q": "*:*", "rows": 1, "fl": "_version_", "sort": "_version_ desc", "wt": "json"},
+                timeout=2,
+            )
+            response = data.get("response", {})
+            docs = response.get("docs") or [{}]
+            version = f"{response.get('numFound', 0)}-{docs[0].get('_version_', 0)}"
+        except Exception as e:
+            print(f"[WARN] Could not read index version for '{collection}': {e}")
+            version = None
+        self._versions[collection] = (version, now)
+        return version
+
+    def invalidate(self, collection: Optional[str] = None) -> None:
+        """Force the next lookup to re-read the index version (after our own writes)."""
+        if collection is None:
+            self._versions.clear()
+        else:
+            self._versions.pop(collection, None)
+
+    async def key_for(self, collection: str, query_key: str) -> Optional[str]:
+        version = await self.index_version(collection)
+        if version is None:
+            return None  # can't tell if cached pages are current
+        digest = hashlib.sha1(query_key.encode("utf-8")).hexdigest()
+        return f"{collection}:{version}:{digest}"
+
+    async def get(self, key: str) -> Optional[Dict]:
+        try:
+            raw = await self.backend.get(key)
+        except Exception as e:
+            self.errors += 1
+            print(f"[WARN] Search cache read failed: {e}")
+            return None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    async def set(self, key: str, value: Dict) -> None:
+        try:
+            await self.backend.set(key, json.dumps(value, default=str), self.ttl)
+        except Exception as e:
+            self.errors += 1
+            print(f"[WARN] Search cache write failed: {e}")
+
+    async def clear(self) -> None:
+        if self.enabled:
+            await self.backend.clear()
+        self.invalidate()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name if self.enabled else "off",
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "bypassed": self.bypassed,
+            "errors": self.errors,
+            "index_versions": {c: v for c, (v, _) in self._versions.items()},
+            "backend_stats": self.backend.stats() if self.enabled else {},
+        }
+
+
+search_cache = SearchCache(_make_backend(SEARCH_CACHE_BACKEND))
@@ -0,0 +1,139 @@
+# services/export_service.py
+# ================================================
+# Streaming exports of orders / products for reconciliation.
+#   - reads Solr with a cursorMark loop (sort on the unique key), one
+#     batch in memory at a time; the next batch is only fetched when the
+#     client has consumed the previous one (StreamingResponse backpressure)
+#   - orders are enriched per batch with one bulk product lookup
+#   - output is NDJSON (one doc per line) or CSV (header + one row per doc)
+# Solr's /export handler needs docValues on every field; items_json and
+# notes are text fields, so the cursor loop is used for both collections.
+# ================================================
+import csv
+import io
+import json
+import os
+from typing import AsyncIterator, Dict, List, Optional
+
+from solr_query import SolrQuery, execute, phrase, numeric_range, FL_PROFILES, PRODUCT_QF, UNIQUE_KEY
+from services.order_service import enrich_orders
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# CSV columns; list fields are joined with "|", nested values JSON-encoded
+ORDER_CSV_COLUMNS = FL_PROFILES["orderHistory"]["export"] + ["product_details"]
+PRODUCT_CSV_COLUMNS = FL_PROFILES["products"]["export"]
+
+
+async def iter_solr_batches(
+    collection: str,
+    q: str = "*:*",
+    fq: Optional[List[str]] = None,
+    profile: str = "export",
+    batch_size: int = EXPORT_BATCH_SIZE,
+    **query_args,
+) -> AsyncIterator[List[dict]]:
+    """Yield every matching doc in batches, walking a cursorMark to the end."""
+    mark = "*"
+    while True:
+        query = SolrQuery(
+            collection=collection,
+            q=q,
+            fq=fq or [],
+            page_size=batch_size,
+            max_page_size=batch_size,
+            sort=f"{UNIQUE_KEY} asc",
+            cursor=mark,
+            profile=profile,
+            **query_args,
+        )
+        result = await execute(query, normalize=False)  # keep multi-valued fields as lists
+        if result.docs:
+            yield result.docs
+        if not result.next_cursor or result.next_cursor == mark:
+            return
+        mark = result.next_cursor
+
+
+# -----------------------------
+# Serialisation
+# -----------------------------
+def _csv_value(val) -> str:
+    if val is None:
+        return ""
+    if isinstance(val, list) and all(not isinstance(v, (dict, list)) for v in val):
+        return "|".join(str(v) for v in val)
+    if isinstance(val, (dict, list)):
+        return json.dumps(val, default=str)
+    return str(val)
+
+
+def _ndjson_chunk(docs: List[dict]) -> bytes:
+    return "".join(json.dumps(d, default=str) + "\n" for d in docs).encode("utf-8")
+
+
+def _csv_chunk(docs: List[dict], columns: List[str], header: bool) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(columns)
+    for d in docs:
+        writer.writerow([_csv_value(d.get(c)) for c in columns])
+    return buf.getvalue().encode("utf-8")
+
+
+async def _stream(batches: AsyncIterator[List[dict]], fmt: str, columns: List[str]) -> AsyncIterator[bytes]:
+    header = True
+    exported = 0
+    async for docs in batches:
+        if fmt == "csv":
+            yield _csv_chunk(docs, columns, header)
+            header = False
+        else:
+            yield _ndjson_chunk(docs)
+        exported += len(docs)
+    if header and fmt == "csv":
+        yield _csv_chunk([], columns, header=True)  # empty result: header only
+    print(f"[INFO] Export finished: {exported} docs ({fmt})")
+
+
+def _filter_queries(filters: Optional[Dict[str, str]]) -> List[str]:
+    """fq list from user filters; ValueError for a malformed range."""
+    fq = []
+    for k, v in (filters or {}).items():
+        if not v:
+            continue
+        # Ranges like [0 TO 500] are validated, plain values quoted and escaped
+        fq.append(f"{k}:{numeric_range(v)}" if str(v).lstrip().startswith(("[", "{")) else f"{k}:{phrase(v)}")
+    return fq
+
+
+# -----------------------------
+# Orders
+# -----------------------------
+async def _enriched_order_batches(q: str, fq: List[str]) -> AsyncIterator[List[dict]]:
+    async for docs in iter_solr_batches("orderHistory", q, fq):
+        yield await enrich_orders(docs)
+
+
+def export_orders(account_id: Optional[str] = None, fmt: str = "ndjson",
+                  filters: Optional[Dict[str, str]] = None) -> AsyncIterator[bytes]:
+    """All orders (optionally for one account) with product_details, streamed as fmt."""
+    fq = _filter_queries(filters)
+    if account_id:
+        fq.append(f"account_id:{phrase(account_id)}")
+    return _stream(_enriched_order_batches("*:*", fq), fmt, ORDER_CSV_COLUMNS)
+
+
+# -----------------------------
+# Products
+# -----------------------------
+def export_products(q: Optional[str] = None, fmt: str = "ndjson",
+                    filters: Optional[Dict[str, str]] = None) -> AsyncIterator[bytes]:
+    """The catalog (or the docs matching q / filters), streamed as fmt."""
+    fq = _filter_queries(filters)
+    text = (q or "").strip()
+    query_args = {"def_type": "edismax", "qf": PRODUCT_QF, "q_op": "OR"} if text and text != "*:*" else {}
+    batches = iter_solr_batches("products", text or "*:*", fq, **query_args)
+    return _stream(batches, fmt, PRODUCT_CSV_COLUMNS)
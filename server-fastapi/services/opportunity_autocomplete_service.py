@@ -1,6 +1,6 @@
 # services/opportunity_autocomplete_service.py
 import re
-from db.mysql_client import get_connection
+from db.mysql_async import fetch_all
 
 SPOKEN_NUMS = {
     "zero": "0", "one": "1", "two": "2", "three": "3", "four": "4",
@@ -94,13 +94,7 @@ async def search_accounts(query: str):
         LIMIT 10
     """
 
-    conn = get_connection()
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute(sql, (f"%{q_norm}%", f"%{query}%"))
-            return cursor.fetchall()
-    finally:
-        conn.close()
+    return await fetch_all(sql, (f"%{q_norm}%", f"%{query}%"))
 
 
 
@@ -116,10 +110,4 @@ async def search_contacts(query: str):
     """
     #like = f"%{query}%"
 
-    conn = get_connection()
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute(sql, (f"%{q_norm}%", f"%{query}%"))
-            return cursor.fetchall()
-    finally:
-        conn.close()
+    return await fetch_all(sql, (f"%{q_norm}%", f"%{query}%"))
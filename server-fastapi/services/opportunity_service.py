@@ -1,8 +1,6 @@
 # services/opportunity_service.py
-import mysql.connector
-from mysql.connector import Error
 from model.opportunity import OpportunityCreate
-from db.mysql_client import get_connection
+from db.mysql_async import MySQLError, execute, fetch_all
 
 #def get_connection():
 #    return mysql.connector.connect(
@@ -17,9 +15,6 @@ async def create_opportunity(data: OpportunityCreate):
     Insert an opportunity row using only Pydantic model (no SQLAlchemy)
     """
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-
         sql = """
         INSERT INTO opportunities (
             opportunity_name, account_id, primary_contact_id, owner_id,
@@ -41,41 +36,20 @@ async def create_opportunity(data: OpportunityCreate):
         )
         """
 
-
-        cursor.execute(sql, data.dict())
-        conn.commit()
-        new_id = cursor.lastrowid
+        new_id = await execute(sql, data.dict())
 
         return {"status": "success", "opportunity_id": new_id}
 
-    except Error as e:
+    except MySQLError as e:
         print("MySQL Error:", e)
         return {"status": "error", "message": str(e)}
 
-    finally:
-        try:
-            cursor.close()
-            conn.close()
-        except:
-            pass
-
 
 async def list_opportunities():
     try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-
-        cursor.execute("SELECT * FROM opportunities ORDER BY created_at ASC")
-        rows = cursor.fetchall()
+        rows = await fetch_all("SELECT * FROM opportunities ORDER BY created_at ASC", as_dict=True)
 
         return {"count": len(rows), "results": rows}
 
-    except Error as e:
+    except MySQLError as e:
         return {"status": "error", "message": str(e)}
-
-    finally:
-        try:
-            cursor.close()
-            conn.close()
-        except:
-            pass
@@ -2,13 +2,117 @@
 import asyncio
 import json
 from typing import List, Dict, Optional
-from services.solr_service import fetch_solr_with_facets, fetch_products_bulk
+from services.solr_service import fetch_solr_with_facets, fetch_products_bulk, fetch_items_json
+from order_items import _as_list, read_items
+
+
+def parse_order_items(order: Dict) -> List[Dict]:
+    """
+    Line items of a Solr order doc (hybrid parsing):
+    items_json when present, else the parallel item_* arrays.
+    """
+    items = []
+
+    items_json_str = order.get("items_json")
+    if items_json_str:
+        try:
+            items = json.loads(items_json_str) if isinstance(items_json_str, str) else items_json_str
+            if isinstance(items, str):
+                items = json.loads(items)
+        except Exception:
+            items = []
+
+    # Fallback to array-based items
+    if not items:
+        prod_ids = _as_list(order.get("item_product_id"))
+        quantities = _as_list(order.get("item_quantity"))
+        unit_prices = _as_list(order.get("item_unit_price"))
+        for idx, pid in enumerate(prod_ids):
+            item = {
+                "product_id": pid,
+                "quantity": quantities[idx] if idx < len(quantities) else None,
+                "unit_price": unit_prices[idx] if idx < len(unit_prices) else None
+            }
+            items.append(item)
+
+    return items
+
+
+async def enrich_orders(orders: List[Dict]) -> List[Dict]:
+    """
+    Add `items` and `product_details` to each order doc (in place).
+    Orders indexed with denormalized item_* fields are shaped directly
+    (order_items.read_items); for older docs all product ids of the batch
+    are fetched in one bulk, cached lookup.
+    """
+    legacy = []
+    for order in orders:
+        shaped = read_items(order)
+        if shaped is None:
+            legacy.append(order)
+        else:
+            order["items"], order["product_details"] = shaped
+    if not legacy:
+        return orders
+
+    # items_json is not in the "list" projection: fetch it for these docs only
+    missing = [o["id"] for o in legacy if "items_json" not in o and o.get("id")]
+    if missing:
+        blobs = await fetch_items_json(missing)
+        for order in legacy:
+            if order.get("id") in blobs:
+                order["items_json"] = blobs[order["id"]]
+
+    # Extract Product IDs
+    product_ids = set()
+    for order in legacy:
+        order["items"] = parse_order_items(order)
+        for it in order["items"]:
+            pid = it.get("product_id")
+            if pid:
+                product_ids.add(str(pid).strip())
+
+    # Bulk Fetch Product Info (cached)
+    products_map = await fetch_products_bulk(list(product_ids))
+
+    # Enrich Orders with Product Details
+    for order in legacy:
+        enriched_details = []
+
+        for item in order.get("items", []):
+            pid = str(item.get("product_id")).strip()
+            product = products_map.get(pid)
+
+            if not product:
+                # Try product_detail_id fallback
+                pdetail = item.get("product_detail_id")
+                if pdetail and "-" in pdetail:
+                    base_pid = pdetail.split("-")[0]
+                    product = products_map.get(base_pid)
+
+            if product:
+                enriched_details.append({
+                    "product_id": pid,
+                    "name": product.get("name"),
+                    "brand": product.get("brand"),
+                    "price": product.get("price"),
+                    "material": product.get("material"),
+                    "color": product.get("color"),
+                    "weight": product.get("weight"),
+                    "image_url": product.get("image_url")
+                })
+
+        order["product_details"] = enriched_details
+
+    return orders
+
 
 async def get_orders_with_products(
     account_id: Optional[str],
     is_super_user: bool = False,
     page: int = 1,
-    pageSize: int = 20
+    pageSize: int = 20,
+    cursor: Optional[str] = None
 ) -> Dict:
     """
     Fetch orders from Solr (optionally filtered by account_id) with pagination and enrichment.
@@ -17,6 +121,8 @@ async def get_orders_with_products(
       - orders: list of enriched orders for the page
       - facets: facet counts (only on page 1)
       - page, pageSize, totalPages
+      - nextCursor: opaque token for the next page (cursorMark paging);
+        pass it back as `cursor` instead of a deep page number
     """
 
     # -------------------------------
@@ -36,88 +142,24 @@ async def get_orders_with_products(
         "orderHistory",
         query,
         page=page,
-        pageSize=pageSize
+        pageSize=pageSize,
+        cursor=cursor
     )
 
+    page = solr_result.get("page", page)
+    next_cursor = solr_result.get("nextCursor")
     orders = solr_result.get("orders", [])
     num_found = solr_result.get("numFound", len(orders))
     facets = solr_result.get("facets", {})
 
     if not orders:
-        return {"numFound": 0, "orders": [], "facets": facets, "page": page, "pageSize": pageSize, "totalPages": 0}
+        return {"numFound": 0, "orders": [], "facets": facets, "page": page, "pageSize": pageSize, "totalPages": 0,
+                "nextCursor": None}
 
     # -------------------------------
-    # 3️⃣ Extract Product IDs (Hybrid parsing)
+    # 3️⃣–5️⃣ Parse items, bulk-fetch products (cached), enrich
     # -------------------------------
-    product_ids = set()
-
-    for order in orders:
-        items = []
-
-        items_json_str = order.get("items_json")
-        if items_json_str:
-            try:
-                items = json.loads(items_json_str) if isinstance(items_json_str, str) else items_json_str
-                if isinstance(items, str):
-                    items = json.loads(items)
-            except Exception:
-                items = []
-
-        # Fallback to array-based items
-        if not items:
-            prod_ids = order.get("item_product_id", [])
-            quantities = order.get("item_quantity", [])
-            unit_prices = order.get("item_unit_price", [])
-            for idx, pid in enumerate(prod_ids):
-                item = {
-                    "product_id": pid,
-                    "quantity": quantities[idx] if idx < len(quantities) else None,
-                    "unit_price": unit_prices[idx] if idx < len(unit_prices) else None
-                }
-                items.append(item)
-
-        order["items"] = items
-
-        for it in items:
-            pid = it.get("product_id")
-            if pid:
-                product_ids.add(str(pid).strip())
-
-    # -------------------------------
-    # 4️⃣ Bulk Fetch Product Info (cached)
-    # -------------------------------
-    products_map = await fetch_products_bulk(list(product_ids))
-
-    # -------------------------------
-    # 5️⃣ Enrich Orders with Product Details
-    # -------------------------------
-    for order in orders:
-        enriched_details = []
-
-        for item in order.get("items", []):
-            pid = str(item.get("product_id")).strip()
-            product = products_map.get(pid)
-
-            if not product:
-                # Try product_detail_id fallback
-                pdetail = item.get("product_detail_id")
-                if pdetail and "-" in pdetail:
-                    base_pid = pdetail.split("-")[0]
-                    product = products_map.get(base_pid)
-
-            if product:
-                enriched_details.append({
-                    "product_id": pid,
-                    "name": product.get("name"),
-                    "brand": product.get("brand"),
-                    "price": product.get("price"),
-                    "material": product.get("material"),
-                    "color": product.get("color"),
-                    "weight": product.get("weight"),
-                    "image_url": product.get("image_url")
-                })
-
-        order["product_details"] = enriched_details
+    await enrich_orders(orders)
 
     # -------------------------------
     # 6️⃣ Build Pagination Metadata
@@ -130,5 +172,6 @@ async def get_orders_with_products(
         "facets": facets,
         "page": page,
         "pageSize": pageSize,
-        "totalPages": totalPages
+        "totalPages": totalPages,
+        "nextCursor": next_cursor
     }
@@ -1,25 +1,18 @@
 #services/product_detail_service.py
 
-import httpx
+from typing import Dict, List
 
-SOLR_BASE = "https://localhost:8983/solr/products/select"
-SOLR_AUTH = ("solr", "SolrRocks")
+from product_loader import product_loader
 
 async def fetch_product_by_id(product_id: str):
     """
     Fetch a single product from Solr by exact ID.
-    No fuzzy logic, no facets, no filters.
+    No fuzzy logic, no facets, no filters. Uses real-time get, batched
+    with any other product lookups made in the same event-loop tick.
     """
-    params = {
-        "q": f'id:"{product_id}"',
-        "rows": 1,
-        "wt": "json"
-    }
+    return await product_loader.load(product_id)
 
-    async with httpx.AsyncClient(verify=False) as client:
-        resp = await client.get(SOLR_BASE, params=params, auth=SOLR_AUTH)
-        resp.raise_for_status()
-        data = resp.json()
 
-    docs = data.get("response", {}).get("docs", [])
-    return docs[0] if docs else None
+async def fetch_products_by_ids(product_ids: List[str]) -> Dict[str, dict]:
+    """Bulk variant of fetch_product_by_id: {product_id: product} for ids that exist."""
+    return await product_loader.load_many(product_ids)
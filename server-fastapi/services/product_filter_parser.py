@@ -1,7 +1,7 @@
 # product_filter_parser.py
 import re
-from typing import Dict, Any, List
-from attribute_loader import load_facet_values
+from typing import Dict, Any, List, Optional
+from attribute_loader import load_facet_values, register_refresh_listener, DEFAULT_COLLECTION
 
 # We only care about these for products
 KNOWN_FACETS = {"brand", "material", "color", "category"}
@@ -27,19 +27,39 @@ def _flatten(filters: Dict[str, Any]) -> Dict[str, List[str]]:
     return out
 
 
-# Build facet value index once (uses your cached attribute_loader)
-_facet_cache = load_facet_values() or {}
-_facet_index: Dict[str, Dict[str, str]] = {}
+# Facet value index, built on first use from the cached attribute_loader
+# vocabulary and rebuilt whenever the products facets are reloaded
+_facet_index: Optional[Dict[str, Dict[str, str]]] = None
 
-for field, values in (_facet_cache or {}).items():
-    field_l = field.lower()
-    if field_l in KNOWN_FACETS:
-        _facet_index[field_l] = {}
-        for v in values:
-            s = str(v).strip()
-            if not s:
-                continue
-            _facet_index[field_l][s.upper()] = s  # "BOSCH" -> "Bosch"
+
+def _build_facet_index(facets: Dict[str, List]) -> Dict[str, Dict[str, str]]:
+    index: Dict[str, Dict[str, str]] = {}
+    for field, values in (facets or {}).items():
+        field_l = field.lower()
+        if field_l in KNOWN_FACETS:
+            index[field_l] = {}
+            for v in values:
+                s = str(v).strip()
+                if not s:
+                    continue
+                index[field_l][s.upper()] = s  # "BOSCH" -> "Bosch"
+    return index
+
+
+def _get_facet_index() -> Dict[str, Dict[str, str]]:
+    global _facet_index
+    if _facet_index is None:
+        _facet_index = _build_facet_index(load_facet_values() or {})
+    return _facet_index
+
+
+def _on_facets_refreshed(collection: str, facets: Dict):
+    global _facet_index
+    if collection == DEFAULT_COLLECTION:
+        _facet_index = _build_facet_index(facets)
+
+
+register_refresh_listener(_on_facets_refreshed)
 
 
 def _normalize_value(field: str, raw: str) -> str:
@@ -53,14 +73,15 @@ def _normalize_value(field: str, raw: str) -> str:
         return raw
 
     up = raw.upper()
+    facet_index = _get_facet_index()
 
     # Exact facet match
-    if field in _facet_index:
-        if up in _facet_index[field]:
-            return _facet_index[field][up]
+    if field in facet_index:
+        if up in facet_index[field]:
+            return facet_index[field][up]
 
         # Loose contains match (e.g. 'POWER TOOLS' vs 'POWER TOOLS ')
-        for key, canonical in _facet_index[field].items():
+        for key, canonical in facet_index[field].items():
             if up in key or key in up:
                 return canonical
 
@@ -1,12 +1,9 @@
 # services/product_service.py
 from typing import Dict, Optional
-#from services.solr_service import search_products_with_facets
+from services.solr_service import search_products_with_facets
 from services.product_solr_service import search_products_fuzzy
-from nlu_engine import NLU
 import re
 
-_nlu = NLU()  # reuse shared model instance
-
 # -------------------------------------------------------------
 # Helper: map extracted NLU entities → Solr filters
 # -------------------------------------------------------------
@@ -32,6 +29,8 @@ async def search_products_structured(
     page: int,
     pageSize: int,
     sort: Optional[str],
+    include_facets: bool = True,
+    cursor: Optional[str] = None,
 ) -> Dict:
     return await search_products_with_facets(
         query_text=q,
@@ -39,6 +38,8 @@ async def search_products_structured(
         page=page,
         pageSize=pageSize,
         sort=sort,
+        include_facets=include_facets,
+        cursor=cursor,
     )
 
 
@@ -51,12 +52,16 @@ async def search_products_natural(
     pageSize: int = 20,
     sort: Optional[str] = None,
     filters: Optional[Dict[str, str]] = None,
+    include_facets: bool = True,
+    cursor: Optional[str] = None,
 ) -> Dict:
     """
     Voice/NL entrypoint for products.
     Supports:
       - query_text: direct Solr query string (e.g., search_text:"angle grinder")
       - filters: facet filters like brand/material/color/category/price
+      - include_facets: False skips facet counting (e.g. infinite scroll)
+      - cursor: nextCursor token from the previous page (deep paging)
     """
     filters = filters or {}
 
@@ -80,6 +85,8 @@ async def search_products_natural(
         page=page,
         pageSize=pageSize,
         sort=sort,
+        include_facets=include_facets,
+        cursor=cursor,
     )
 
 
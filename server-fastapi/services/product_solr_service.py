@@ -1,14 +1,11 @@
 # services/product_solr_service.py
-import httpx
 from typing import Dict, Any, Optional, List
 import re
 
-SOLR_BASE = "https://localhost:8983/solr"
-SOLR_AUTH = ("solr", "SolrRocks")
-VERIFY_SSL = False
-
-# Facet fields for products
-PRODUCT_FACETS = ["brand", "material", "color", "category"]
+from solr_query import (
+    SolrQuery, execute_with_facets, cursor_paging, next_cursor_token,
+    PRODUCT_QF, PRODUCT_FACETS, PRICE_FACET_QUERIES,
+)
 
 
 async def search_products_fuzzy(
@@ -17,30 +14,20 @@ async def search_products_fuzzy(
     page: int = 1,
     pageSize: int = 20,
     sort: Optional[str] = None,
+    include_facets: bool = True,
+    cursor: Optional[str] = None,
 ):
     """
     Product-only Solr search.
     Uses fuzzy matching: fq=search_text:"VALUE"
+    Facet counts are fetched concurrently and cached per filter set
+    (skipped if include_facets=False). cursor is the nextCursor token of a
+    previous page (cursorMark paging).
     Does NOT affect order UIs.
     """
 
     filters = filters or {}
-
-    url = f"{SOLR_BASE}/products/select"
-
-    start = (page - 1) * pageSize
-
-    params = {
-        "wt": "json",
-        "start": start,
-        "rows": pageSize,
-        "defType": "edismax",
-        "qf": "name^5 brand^4 category^3 material^2 color^2 description^1 search_text^1",
-        "facet": "true",
-        "facet.mincount": 1,
-        "q.op": "OR",
-        "q": query_text if query_text.strip() else "*:*"
-    }
+    mark, page = cursor_paging(page, cursor)
 
     # -----------------------------
     # 🔥 Build fuzzy filter queries
@@ -73,45 +60,29 @@ async def search_products_fuzzy(
         # Fallback literal filter
         fqs.append(f'{key}:"{val}"')
 
-    if fqs:
-        params["fq"] = fqs
-
-    # Add facet fields
-    for f in PRODUCT_FACETS:
-        params.setdefault("facet.field", []).append(f)
-
-    # Price buckets
-    price_ranges = [
-        "[0 TO 25]", "[25 TO 50]", "[50 TO 100]",
-        "[100 TO 250]", "[250 TO 500]", "[500 TO 1000]",
-        "[1000 TO 999999]"
-    ]
-    for r in price_ranges:
-        params.setdefault("facet.query", []).append(f"price:{r}")
-
-    print("[SOLR-FUZZY] URL:", url)
-    print("[SOLR-FUZZY] Params:", params)
-
-    async with httpx.AsyncClient(verify=VERIFY_SSL) as client:
-        resp = await client.get(url, params=params, auth=SOLR_AUTH)
-        resp.raise_for_status()
-        data = resp.json()
-
-    docs = data.get("response", {}).get("docs", [])
-    num_found = data.get("response", {}).get("numFound", len(docs))
-
-    # Facets
-    raw_facets = data.get("facet_counts", {}).get("facet_fields", {})
-    facets = {
-        f: [{"name": raw_facets[f][i], "count": raw_facets[f][i+1]} for i in range(0, len(raw_facets[f]), 2)]
-        for f in raw_facets
-    }
+    query = SolrQuery(
+        collection="products",
+        q=query_text,
+        fq=fqs,
+        page=page,
+        page_size=pageSize,
+        cursor=mark,
+        def_type="edismax",
+        qf=PRODUCT_QF,
+        q_op="OR",
+        profile="list",
+        facet_fields=PRODUCT_FACETS,
+        facet_queries=PRICE_FACET_QUERIES,
+    )
+    # Docs are returned as stored (no single-value flattening), as before
+    result = await execute_with_facets(query, normalize=False, cache=True, include_facets=include_facets)
 
     return {
-        "numFound": num_found,
-        "products": docs,
-        "facets": facets,
-        "page": page,
-        "pageSize": pageSize,
-        "totalPages": (num_found + pageSize - 1) // pageSize
+        "numFound": result.num_found,
+        "products": result.docs,
+        "facets": result.facets,
+        "page": query.page,
+        "pageSize": query.page_size,
+        "totalPages": result.total_pages,
+        "nextCursor": next_cursor_token(query, result),
     }
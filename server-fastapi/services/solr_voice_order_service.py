@@ -1,21 +1,9 @@
 # services/solr_voice_order_service.py
-import httpx
 from typing import List, Dict, Optional
-from services.solr_service import SOLR_BASE, SOLR_AUTH, VERIFY_SSL
-
-def normalize_solr_doc(doc: dict) -> dict:
-    """
-    Normalize Solr doc into a consistent flat dict.
-    - Flattens single-value arrays.
-    - Ensures all values are JSON-safe.
-    """
-    normalized = {}
-    for k, v in doc.items():
-        if isinstance(v, list) and len(v) == 1:
-            normalized[k] = v[0]
-        else:
-            normalized[k] = v
-    return normalized
+from solr_query import (
+    SolrQuery, execute_with_facets, cursor_paging, next_cursor_token,
+    ORDER_FACETS, ORDER_SORT,
+)
 
 
 async def fetch_solr_orders_voice(
@@ -23,43 +11,22 @@ async def fetch_solr_orders_voice(
     page: int = 1,
     pageSize: int = 20,
     filters: Optional[Dict[str, List[str]]] = None,
-    facet_fields: Optional[List[str]] = None
+    facet_fields: Optional[List[str]] = None,
+    include_facets: bool = True,
+    cursor: Optional[str] = None,
 ) -> Dict:
     """
     Dedicated to voice-driven order search and filtering.
     Safe and independent from existing solr_service.py functions.
+    cursor: nextCursor token from a previous response (cursorMark paging).
     """
 
-    facet_fields = facet_fields or [
-        "account_id", "status", "payment_status", "warehouse_status", "currency"
-    ]
-
-    if page < 1:
-        page = 1
-    if pageSize < 1:
-        pageSize = 20
-    if pageSize > 100:
-        pageSize = 100
-
-    start = (page - 1) * pageSize
-    url = f"{SOLR_BASE}/orderHistory/select"
-
-    params = {
-        "q": query,
-        "start": start,
-        "rows": pageSize,
-        "wt": "json",
-        "facet": "true" if page == 1 else "false",
-        "facet.mincount": 1
-    }
-
-    if page == 1:
-        for f in facet_fields:
-            params.setdefault("facet.field", []).append(f)
+    facet_fields = facet_fields or ORDER_FACETS
+    mark, page = cursor_paging(page, cursor)
 
     # ✅ Only this method supports dynamic fq filters
+    fq_list = []
     if filters:
-        fq_list = []
         for k, vlist in filters.items():
             if not vlist:
                 continue
@@ -72,43 +39,27 @@ async def fetch_solr_orders_voice(
                 else:
                     parts.append(sval)
             fq_list.append(f"{k}:({ ' OR '.join(parts) })")
-        if fq_list:
-            params["fq"] = fq_list
-
-            
-    # 🔍 Debug log (matches product query format)
-    print("\n[SOLR] Query URL:", url)
-    print("[SOLR] Params:", params, "\n")
-
-    async with httpx.AsyncClient(verify=VERIFY_SSL) as client:
-        resp = await client.get(url, params=params, auth=SOLR_AUTH)
-        resp.raise_for_status()
-        data = resp.json()
-
-    response = data.get("response", {})
-    docs = response.get("docs", [])
-    num_found = response.get("numFound", len(docs))
-
-    facets = {}
-    if page == 1:
-        raw_facets = data.get("facet_counts", {}).get("facet_fields", {})
-        facets = {
-            k: [
-                {"name": arr[i], "count": arr[i + 1]}
-                for i in range(0, len(arr), 2)
-            ]
-            for k, arr in raw_facets.items()
-        }
 
-    orders = [normalize_solr_doc(d) for d in docs]
-    
-    total_pages = (num_found + pageSize - 1) // pageSize if pageSize > 0 else 1
+    query_obj = SolrQuery(
+        collection="orderHistory",
+        q=query,
+        fq=fq_list,
+        page=page,
+        page_size=pageSize,
+        sort=ORDER_SORT,
+        cursor=mark,
+        profile="list",
+        facet_fields=facet_fields,
+    )
+    # Facets only for page 1
+    result = await execute_with_facets(query_obj, cache=True, include_facets=include_facets and page <= 1)
 
     return {
-        "numFound": num_found,
-        "orders": orders,
-        "facets": facets,
-        "page": page,
-        "pageSize": pageSize,
-        "totalPages": total_pages 
+        "numFound": result.num_found,
+        "orders": result.docs,
+        "facets": result.facets,
+        "page": query_obj.page,
+        "pageSize": query_obj.page_size,
+        "totalPages": result.total_pages,
+        "nextCursor": next_cursor_token(query_obj, result),
     }
@@ -0,0 +1,151 @@
+# solr_client.py
+# ================================================
+# Application-scoped Solr HTTP clients.
+#   async: one pooled httpx.AsyncClient (keep-alive, optional HTTP/2)
+#          for the FastAPI services; closed from the main.py lifespan.
+#   sync:  one requests.Session with a sized connection pool for
+#          attribute_loader, solr_query_builder, pysolr and Celery tasks.
+# Both reuse TLS connections to Solr instead of handshaking per query.
+# ================================================
+import asyncio
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+SOLR_BASE = os.getenv("SOLR_BASE_URL", "https://localhost:8983/solr").rstrip("/")
+SOLR_AUTH = (os.getenv("SOLR_USER", "solr"), os.getenv("SOLR_PASS", "SolrRocks"))
+VERIFY_SSL = os.getenv("SOLR_VERIFY_SSL", "false").lower() == "true"
+
+# Pool / protocol knobs
+SOLR_HTTP2 = os.getenv("SOLR_HTTP2", "false").lower() == "true"  # needs the h2 package
+SOLR_MAX_CONNECTIONS = int(os.getenv("SOLR_MAX_CONNECTIONS", "100"))
+SOLR_MAX_KEEPALIVE = int(os.getenv("SOLR_MAX_KEEPALIVE", "20"))
+SOLR_KEEPALIVE_EXPIRY = float(os.getenv("SOLR_KEEPALIVE_EXPIRY", "30"))
+SOLR_CONNECT_TIMEOUT = float(os.getenv("SOLR_CONNECT_TIMEOUT", "5"))
+SOLR_TIMEOUT = float(os.getenv("SOLR_TIMEOUT", "10"))
+
+# Per-collection read timeouts, e.g. SOLR_COLLECTION_TIMEOUTS='{"orderHistory": 20}'
+try:
+    COLLECTION_TIMEOUTS: Dict[str, float] = {
+        k: float(v) for k, v in json.loads(os.getenv("SOLR_COLLECTION_TIMEOUTS", "{}")).items()
+    }
+except (ValueError, AttributeError) as e:
+    print(f"[WARN] Ignoring invalid SOLR_COLLECTION_TIMEOUTS: {e}")
+    COLLECTION_TIMEOUTS = {}
+
+
+def collection_url(collection: str, handler: str = "select") -> str:
+    return f"{SOLR_BASE}/{collection}/{handler}"
+
+
+def collection_timeout(collection: str) -> float:
+    return COLLECTION_TIMEOUTS.get(collection, SOLR_TIMEOUT)
+
+
+# --------------------------------------------------------
+# Async client (FastAPI services)
+# --------------------------------------------------------
+_async_client: Optional[httpx.AsyncClient] = None
+_async_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _http2_available() -> bool:
+    if not SOLR_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        print("[WARN] SOLR_HTTP2=true but the h2 package is not installed; using HTTP/1.1")
+        return False
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Shared pooled client for the running event loop (created on first use)."""
+    global _async_client, _async_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client.is_closed or _async_loop is not loop:
+        _async_client = httpx.AsyncClient(
+            auth=SOLR_AUTH,
+            verify=VERIFY_SSL,
+            http2=_http2_available(),
+            limits=httpx.Limits(
+                max_connections=SOLR_MAX_CONNECTIONS,
+                max_keepalive_connections=SOLR_MAX_KEEPALIVE,
+                keepalive_expiry=SOLR_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(SOLR_TIMEOUT, connect=SOLR_CONNECT_TIMEOUT),
+        )
+        _async_loop = loop
+    return _async_client
+
+
+async def solr_get(
+    collection: str,
+    params: Any,
+    handler: str = "select",
+    timeout: Optional[float] = None,
+) -> Dict:
+    """GET /solr/<collection>/<handler> through the shared client; returns decoded JSON."""
+    client = get_async_client()
+    resp = await client.get(
+        collection_url(collection, handler),
+        params=params,
+        timeout=httpx.Timeout(timeout or collection_timeout(collection), connect=SOLR_CONNECT_TIMEOUT),
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+async def close_solr_clients() -> None:
+    """Called on application shutdown."""
+    global _async_client, _sync_session
+    if _async_client is not None and not _async_client.is_closed:
+        await _async_client.aclose()
+    _async_client = None
+    with _sync_lock:
+        if _sync_session is not None:
+            _sync_session.close()
+        _sync_session = None
+
+
+# --------------------------------------------------------
+# Sync session (threads, Celery workers, pysolr)
+# --------------------------------------------------------
+_sync_session: Optional[requests.Session] = None
+_sync_lock = threading.Lock()
+
+
+def get_sync_session() -> requests.Session:
+    global _sync_session
+    if _sync_session is None:
+        with _sync_lock:
+            if _sync_session is None:
+                session = requests.Session()
+                session.auth = SOLR_AUTH
+                session.verify = VERIFY_SSL
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=SOLR_MAX_KEEPALIVE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _sync_session = session
+    return _sync_session
+
+
+def solr_get_sync(
+    collection: str,
+    params: Any,
+    handler: str = "select",
+    timeout: Optional[float] = None,
+) -> Dict:
+    resp = get_sync_session().get(
+        collection_url(collection, handler),
+        params=params,
+        timeout=(SOLR_CONNECT_TIMEOUT, timeout or collection_timeout(collection)),
+    )
+    resp.raise_for_status()
+    return resp.json()
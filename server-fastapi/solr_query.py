@@ -0,0 +1,376 @@
+# solr_query.py
+# ================================================
+# One query object for every Solr `select` the app sends.
+#   SolrQuery      - typed description of a search (paging guards built in)
+#   fl_for()       - named field-list projections (list/detail/...)
+#   phrase() / numeric_range()
+#                  - safe fq values from user input
+#   encode_cursor() / decode_cursor() / next_cursor_token()
+#                  - opaque cursorMark tokens for deep paging
+#   to_params()    - canonical parameter encoding; cache_key() is the
+#                    order-insensitive form of it
+#   decode()       - shared response decoding (docs, facets, paging)
+#   execute()      - the single async execution path (solr_client pool,
+#                    optional result cache)
+#   execute_with_facets()
+#                  - docs and facet counts as two concurrent selects; the
+#                    facet half is cached per filter set
+#   execute_sync() - same, for thread / Celery callers
+# Services build a SolrQuery and read a SolrResult; caching, tracing and
+# tuning hook in here once instead of in each service.
+# ================================================
+import asyncio
+import base64
+import json
+import re
+import time
+from dataclasses import asdict, dataclass, field, replace
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from solr_client import solr_get, solr_get_sync
+from search_cache import search_cache
+
+MAX_PAGE_SIZE = 100
+DEFAULT_PAGE_SIZE = 20
+UNIQUE_KEY = "id"  # uniqueKey of both collections; cursorMark sorts must end on it
+
+# Relevance profile shared by the product searches
+PRODUCT_QF = "name^5 brand^4 category^3 material^2 color^2 description^1 search_text^1"
+PRODUCT_FACETS = ["brand", "material", "color", "category"]
+ORDER_FACETS = ["account_id", "status", "payment_status", "warehouse_status", "currency"]
+ORDER_SORT = f"{UNIQUE_KEY} asc"  # stable, so offset and cursor pages line up
+
+PRICE_BUCKETS = [
+    "[0 TO 25]", "[25 TO 50]", "[50 TO 100]", "[100 TO 250]",
+    "[250 TO 500]", "[500 TO 1000]", "[1000 TO 999999]",
+]
+PRICE_FACET_QUERIES = [f"price:{b}" for b in PRICE_BUCKETS]
+
+# --------------------------------------------------------
+# Field-list projections: only the stored fields a caller renders
+# --------------------------------------------------------
+_PRODUCT_LIST = ["id", "name", "brand", "category", "material", "color", "price", "image_url", "description"]
+_ORDER_LIST = [
+    "id", "order_id", "account_id", "order_date", "status", "payment_status", "warehouse_status",
+    "currency", "total_amount", "item_id", "item_product_id", "item_quantity", "item_unit_price",
+    "item_total_price", "item_name", "item_brand", "item_price", "item_material", "item_color", "item_weight",
+    "item_image_url", "item_line_nulls", "item_product_nulls",
+]
+_ORDER_DETAIL = _ORDER_LIST + [
+    "items_json",  # legacy docs only; lists fetch it on demand (services/order_service.enrich_orders)
+    "notes", "expected_delivery", "actual_delivery", "created_at", "updated_at", "discount_applied",
+    "tax_amount", "shipping_fee", "total_items", "total_quantity", "avg_unit_price", "total_value",
+]
+
+FL_PROFILES: Dict[str, Dict[str, List[str]]] = {
+    "products": {
+        "list": _PRODUCT_LIST,                                 # result grids
+        "detail": _PRODUCT_LIST + ["dimensions", "weight"],   # product page
+        "enrichment": ["id", "name", "brand", "price", "material", "color", "weight", "image_url"],
+        "export": _PRODUCT_LIST + ["dimensions", "weight"],
+    },
+    "orderHistory": {
+        "list": _ORDER_LIST,
+        "detail": _ORDER_DETAIL,
+        "export": [f for f in _ORDER_DETAIL if f != "items_json"],  # items come from the item_* arrays
+    },
+}
+
+
+def with_tiebreak(sort: Optional[str]) -> str:
+    """sort with the unique key appended, as cursorMark requires (default order is relevance)."""
+    clauses = [c.strip() for c in (sort or "").split(",") if c.strip()] or ["score desc"]
+    if not any(c.split()[0] == UNIQUE_KEY for c in clauses):
+        clauses.append(f"{UNIQUE_KEY} asc")
+    return ",".join(clauses)
+
+
+def fl_for(collection: str, profile: Optional[str]) -> Optional[str]:
+    """fl value for a named profile; None (all stored fields) if the collection has no such profile."""
+    fields = FL_PROFILES.get(collection, {}).get(profile) if profile else None
+    return ",".join(fields) if fields else None
+
+
+_NUMERIC_RANGE = re.compile(r"[\[{]\s*(\*|-?\d+(?:\.\d+)?)\s+TO\s+(\*|-?\d+(?:\.\d+)?)\s*[\]}]")
+
+
+def phrase(value: Any) -> str:
+    """value as a quoted phrase; backslashes and quotes escaped so it cannot close the phrase early."""
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+
+def numeric_range(value: str) -> str:
+    """A [lo TO hi] / {lo TO hi} range of numbers or *; ValueError for anything else."""
+    text = str(value).strip()
+    if not _NUMERIC_RANGE.fullmatch(text):
+        raise ValueError(f"Invalid range: {value!r}")
+    return text
+
+
+def normalize_solr_doc(doc: dict) -> dict:
+    """Flatten single-item lists for readability."""
+    clean_doc = {}
+    for key, val in doc.items():
+        if isinstance(val, list) and len(val) == 1:
+            clean_doc[key] = val[0]
+        else:
+            clean_doc[key] = val
+    return clean_doc
+
+
+@dataclass
+class SolrQuery:
+    collection: str
+    q: str = "*:*"
+    fq: List[str] = field(default_factory=list)
+    page: int = 1
+    page_size: int = DEFAULT_PAGE_SIZE
+    sort: Optional[str] = None
+    def_type: Optional[str] = None
+    qf: Optional[str] = None
+    q_op: Optional[str] = None
+    df: Optional[str] = None
+    fl: Optional[str] = None
+    facet_fields: List[str] = field(default_factory=list)
+    facet_queries: List[str] = field(default_factory=list)
+    facet_mincount: int = 1
+    profile: Optional[str] = None  # FL_PROFILES name; sets fl unless fl is given
+    cursor: Optional[str] = None   # raw cursorMark ("*" = first page); replaces start
+    max_page_size: int = MAX_PAGE_SIZE  # raised only by bulk readers (export)
+    facets_only: bool = False  # rows=0: counts without docs
+    extra: Dict[str, Any] = field(default_factory=dict)  # anything not modelled above
+
+    def __post_init__(self):
+        # Pagination guards (previously copied into every service)
+        self.q = (self.q or "").strip() or "*:*"
+        if self.fl is None:
+            self.fl = fl_for(self.collection, self.profile)
+        if self.page < 1:
+            self.page = 1
+        if self.page_size < 1:
+            self.page_size = DEFAULT_PAGE_SIZE
+        if self.page_size > self.max_page_size:
+            self.page_size = self.max_page_size
+
+    @property
+    def start(self) -> int:
+        return (self.page - 1) * self.page_size
+
+    @property
+    def has_facets(self) -> bool:
+        return bool(self.facet_fields or self.facet_queries)
+
+    def to_params(self, sort_values: bool = False) -> List[Tuple[str, str]]:
+        """
+        Canonical (key, value) list: keys sorted, None dropped, repeated values
+        de-duplicated. Repeated values keep caller order (Solr echoes facet
+        fields in request order) unless sort_values is set, as for cache keys.
+        """
+        params: Dict[str, Any] = {
+            "q": self.q,
+            "start": 0 if self.facets_only else (None if self.cursor else self.start),
+            "rows": 0 if self.facets_only else self.page_size,
+            "wt": "json",
+            "fq": self.fq,
+            "sort": with_tiebreak(self.sort) if self.cursor else self.sort,
+            "cursorMark": self.cursor,
+            "defType": self.def_type,
+            "qf": self.qf,
+            "q.op": self.q_op,
+            "df": self.df,
+            "fl": self.fl,
+        }
+        if self.has_facets:
+            params["facet"] = "true"
+            params["facet.mincount"] = self.facet_mincount
+            params["facet.field"] = self.facet_fields
+            params["facet.query"] = self.facet_queries
+        params.update(self.extra)
+
+        out: List[Tuple[str, str]] = []
+        for key in sorted(params):
+            val = params[key]
+            if val is None:
+                continue
+            if isinstance(val, (list, tuple, set)):
+                values = list(dict.fromkeys(str(v) for v in val if v is not None))
+                out.extend((key, v) for v in (sorted(values) if sort_values else values))
+            else:
+                out.append((key, str(val)))
+        return out
+
+    def cache_key(self) -> str:
+        return f"{self.collection}?{urlencode(self.to_params(sort_values=True))}"
+
+    def docs_query(self) -> "SolrQuery":
+        """This page of docs, without facet counting."""
+        return replace(self, facet_fields=[], facet_queries=[])
+
+    def facet_query(self) -> "SolrQuery":
+        """
+        Facet counts for this filter set (q + fq) only: no docs, and page,
+        sort and fl dropped so every page / sort order shares one cache key.
+        """
+        return replace(
+            self, page=1, page_size=DEFAULT_PAGE_SIZE, sort=None, fl=None, profile=None, cursor=None, facets_only=True
+        )
+
+
+@dataclass
+class SolrResult:
+    num_found: int
+    docs: List[dict]
+    facets: Dict[str, List[dict]]        # field -> [{"name", "count"}]
+    facet_queries: Dict[str, int]        # raw facet.query counts
+    page: int
+    page_size: int
+    qtime_ms: Optional[int] = None
+    next_cursor: Optional[str] = None    # raw nextCursorMark (cursor queries only)
+
+    @property
+    def total_pages(self) -> int:
+        return (self.num_found + self.page_size - 1) // self.page_size if self.page_size > 0 else 1
+
+    def price_buckets(self) -> List[dict]:
+        """Price facet.query counts as [{"range", "count"}] in bucket order."""
+        return [
+            {"range": b, "count": self.facet_queries[f"price:{b}"]}
+            for b in PRICE_BUCKETS
+            if f"price:{b}" in self.facet_queries
+        ]
+
+
+def decode(query: SolrQuery, data: Dict, normalize: bool = True) -> SolrResult:
+    resp = data.get("response", {})
+    docs = resp.get("docs", [])
+    if normalize:
+        docs = [normalize_solr_doc(d) for d in docs]
+
+    counts = data.get("facet_counts", {})
+    facets = {
+        f: [{"name": arr[i], "count": arr[i + 1]} for i in range(0, len(arr), 2)]
+        for f, arr in (counts.get("facet_fields") or {}).items()
+    }
+
+    return SolrResult(
+        num_found=resp.get("numFound", len(docs)),
+        docs=docs,
+        facets=facets,
+        facet_queries=dict(counts.get("facet_queries") or {}),
+        page=query.page,
+        page_size=query.page_size,
+        qtime_ms=data.get("responseHeader", {}).get("QTime"),
+        next_cursor=data.get("nextCursorMark"),
+    )
+
+
+# --------------------------------------------------------
+# Cursor tokens
+# --------------------------------------------------------
+def encode_cursor(mark: str, page: int) -> str:
+    """Opaque client token: the Solr cursorMark plus the page number it leads to."""
+    raw = json.dumps({"m": mark, "p": page}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[str, int]:
+    """(cursorMark, page) from encode_cursor(); ValueError if the token is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+        return str(data["m"]), max(int(data["p"]), 1)
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"Invalid cursor: {token!r}") from e
+
+
+def next_cursor_token(query: SolrQuery, result: SolrResult) -> Optional[str]:
+    """Token for the page after this one, or None on the last page / non-cursor queries."""
+    if not query.cursor or not result.next_cursor or result.next_cursor == query.cursor:
+        return None
+    if query.page * query.page_size >= result.num_found:
+        return None
+    return encode_cursor(result.next_cursor, query.page + 1)
+
+
+def cursor_paging(page: int, cursor: Optional[str]) -> Tuple[Optional[str], int]:
+    """
+    (cursorMark, page) for a request. A client token wins; page 1 starts a
+    cursor ("*"); deeper pages requested by number fall back to start offsets.
+    """
+    if cursor:
+        return decode_cursor(cursor)
+    return ("*" if page <= 1 else None), page
+
+
+def _trace(query: SolrQuery, params: List[Tuple[str, str]], started: float, result: SolrResult) -> None:
+    elapsed = (time.perf_counter() - started) * 1000
+    print(
+        f"[SOLR] {query.collection} numFound={result.num_found} "
+        f"qtime={result.qtime_ms}ms total={elapsed:.1f}ms params={params}"
+    )
+
+
+async def execute(query: SolrQuery, normalize: bool = True, cache: bool = False) -> SolrResult:
+    """
+    Run a select. With cache=True the decoded result is served from / stored
+    in the search cache, keyed on the canonical query and the collection's
+    index version (see search_cache.py).
+    """
+    params = query.to_params()
+    started = time.perf_counter()
+
+    key = None
+    if cache and search_cache.enabled:
+        key = await search_cache.key_for(query.collection, f"{int(normalize)}|{query.cache_key()}")
+        if key is None:
+            search_cache.bypassed += 1
+        else:
+            cached = await search_cache.get(key)
+            if cached is not None:
+                result = SolrResult(**cached)
+                print(f"[SOLR] {query.collection} cache hit numFound={result.num_found} "
+                      f"total={(time.perf_counter() - started) * 1000:.1f}ms")
+                return result
+
+    data = await solr_get(query.collection, params)
+    result = decode(query, data, normalize)
+    _trace(query, params, started, result)
+    if key is not None:
+        await search_cache.set(key, asdict(result))
+    return result
+
+
+async def execute_with_facets(
+    query: SolrQuery,
+    normalize: bool = True,
+    cache: bool = False,
+    include_facets: bool = True,
+) -> SolrResult:
+    """
+    Like execute(), but facet counts come from a separate rows=0 select that
+    runs concurrently with the docs select. Facet counts only change with the
+    filter set, so that select is always cached: paging or re-sorting the same
+    search re-fetches docs only. include_facets=False skips it entirely.
+    """
+    docs_query = query.docs_query()
+    if not (include_facets and query.has_facets):
+        return await execute(docs_query, normalize, cache)
+
+    result, counts = await asyncio.gather(
+        execute(docs_query, normalize, cache),
+        execute(query.facet_query(), cache=True),
+    )
+    result.facets = counts.facets
+    result.facet_queries = counts.facet_queries
+    return result
+
+
+def execute_sync(query: SolrQuery, normalize: bool = True) -> SolrResult:
+    params = query.to_params()
+    started = time.perf_counter()
+    data = solr_get_sync(query.collection, params)
+    result = decode(query, data, normalize)
+    _trace(query, params, started, result)
+    return result
@@ -1,6 +1,6 @@
 # solr_query_builder.py
 import os
-import requests
+from solr_query import SolrQuery, execute_sync
 from query_handlers import (
     search_all, search_by_brand, search_by_category, search_by_color,
     search_by_price, search_by_material, fallback
@@ -49,47 +49,28 @@ def build_solr_query(text, intent, entities):
 #    data = resp.json()
 #    return data.get("response", {}).get("docs", [])
 
-def search_solr(text, intent, entities, rows=20, include_facets=True):
-    params = build_solr_query(text, intent, entities)
-    params["rows"] = rows
-    params["wt"] = "json"
-    params["df"] = "search_text"
-    
-    if include_facets:
-        params["facet"] = "true"
-        for f in DEFAULT_FACET_FIELDS:
-            params.setdefault("facet.field", []).append(f)
-        params["facet.mincount"] = 1   # hide zero-count facets
-
-    solr_url = f"https://{SOLR_HOST}:8983/solr/{SOLR_COLLECTION}/select"
-    session = requests.Session()
-    session.auth = (SOLR_USER, SOLR_PASS)
-    session.verify = False
-
-    print(f"[DEBUG] 🔍 Connecting to: {solr_url}")
-    flat_params = []
-    for k, v in params.items():
-        if isinstance(v, list):
-            for item in v:
-                flat_params.append((k, item))
-        else:
-            flat_params.append((k, v))
+def to_solr_query(params, rows=20, include_facets=True) -> SolrQuery:
+    """Wrap query_handlers params in the shared SolrQuery (see solr_query.py)."""
+    extra = {k: v for k, v in params.items() if k not in {"q", "fq", "defType", "qf", "df", "fl", "rows", "wt"}}
+    return SolrQuery(
+        collection=SOLR_COLLECTION,
+        q=params.get("q"),
+        fl=params.get("fl"),
+        fq=list(params.get("fq") or []),
+        page_size=rows,
+        def_type=params.get("defType"),
+        qf=params.get("qf"),
+        df=params.get("df", "search_text"),
+        profile="list",
+        facet_fields=DEFAULT_FACET_FIELDS if include_facets else [],
+        extra=extra,
+    )
 
-    resp = session.get(solr_url, params=flat_params)
-    resp.raise_for_status()
-
-    data = resp.json()
-    docs = data.get("response", {}).get("docs", [])
-
-    # 🔹 Extract facets safely
-    facets = {}
-    if include_facets:
-        raw_facets = data.get("facet_counts", {}).get("facet_fields", {})
-        for k, arr in raw_facets.items():
-            facets[k] = [{"name": arr[i], "count": arr[i + 1]} for i in range(0, len(arr), 2)]
 
+def search_solr(text, intent, entities, rows=20, include_facets=True):
+    params = build_solr_query(text, intent, entities)
+    result = execute_sync(to_solr_query(params, rows, include_facets), normalize=False)
     return {
-        "docs": docs,
-        "facets": facets
+        "docs": result.docs,
+        "facets": result.facets
     }
-
@@ -0,0 +1,133 @@
+# startup.py
+# ================================================
+# Application warm-up run from the FastAPI lifespan (see main.py).
+# Nothing here runs at import time: the intent model, facet vocabularies,
+# the Solr connection and the Celery broker check are warmed in parallel
+# worker threads, each with its own timeout, and the outcome is kept in
+# STARTUP_REPORT for /health/ready. A slow or failed step is reported
+# instead of crashing the worker and keeps the app not-ready; readiness
+# re-runs failed steps (at most every STARTUP_RECHECK_SECONDS) until they pass.
+# ================================================
+import asyncio
+import os
+import threading
+import time
+from typing import Callable, Dict
+
+from attribute_loader import load_facet_values, load_order_facets, DEFAULT_COLLECTION
+from nlu_registry import get_nlu, is_nlu_loaded
+from solr_client import solr_get_sync
+
+STEP_TIMEOUT_SECONDS = float(os.getenv("STARTUP_STEP_TIMEOUT_SECONDS", "60"))
+WARM_NLU = os.getenv("STARTUP_WARM_NLU", "true").lower() == "true"
+STARTUP_RECHECK_SECONDS = float(os.getenv("STARTUP_RECHECK_SECONDS", "15"))
+
+STARTUP_REPORT: Dict = {"started": False, "complete": False, "total_ms": None, "steps": {}}
+_recheck_lock = threading.Lock()
+_last_recheck = 0.0
+
+
+def _ping_solr():
+    # Opens the first pooled connection as well as checking Solr is up
+    return solr_get_sync(DEFAULT_COLLECTION, {"wt": "json"}, handler="admin/ping", timeout=5).get("status")
+
+
+def _check_celery():
+    from celery_app import celery_app
+
+    conn = celery_app.connection()
+    try:
+        conn.ensure_connection(max_retries=3)
+    finally:
+        conn.release()
+    return "reachable"
+
+
+def _warm_nlu():
+    nlu = get_nlu()
+    nlu.classify_intent("show me products")  # first forward pass allocates kernels
+    return nlu.backend.name
+
+
+def _load_product_facets():
+    return f"{len(load_facet_values() or {})} fields"
+
+
+def _load_order_facets():
+    return f"{len(load_order_facets() or {})} fields"
+
+
+WARMUP_STEPS: Dict[str, Callable] = {
+    "solr": _ping_solr,
+    "celery": _check_celery,
+    "product_facets": _load_product_facets,
+    "order_facets": _load_order_facets,
+}
+if WARM_NLU:
+    WARMUP_STEPS["nlu"] = _warm_nlu
+
+
+async def _run_step(name: str, fn: Callable) -> None:
+    t0 = time.perf_counter()
+    step = {"ok": False, "ms": None, "detail": None}
+    STARTUP_REPORT["steps"][name] = step
+    try:
+        step["detail"] = await asyncio.wait_for(asyncio.to_thread(fn), STEP_TIMEOUT_SECONDS)
+        step["ok"] = True
+    except asyncio.TimeoutError:
+        # The thread keeps running; e.g. the NLU still becomes ready later
+        step["detail"] = f"timed out after {STEP_TIMEOUT_SECONDS:.0f}s"
+    except Exception as e:
+        step["detail"] = f"{type(e).__name__}: {e}"
+    step["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    status = "✅" if step["ok"] else "❌"
+    print(f"[INFO] Startup {status} {name} in {step['ms']} ms ({step['detail']})")
+
+
+async def warm_up() -> Dict:
+    """Run every warm-up step concurrently and return the timing report."""
+    STARTUP_REPORT.update(started=True, complete=False, steps={})
+    t0 = time.perf_counter()
+    await asyncio.gather(*(_run_step(name, fn) for name, fn in WARMUP_STEPS.items()))
+    STARTUP_REPORT["total_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    STARTUP_REPORT["complete"] = True
+    print(f"[INFO] Startup warm-up finished in {STARTUP_REPORT['total_ms']} ms")
+    return STARTUP_REPORT
+
+
+def _failed_steps():
+    failed = [name for name, step in STARTUP_REPORT["steps"].items() if not step["ok"]]
+    if "nlu" in failed and is_nlu_loaded():
+        failed.remove("nlu")  # timed out at startup, finished loading since
+    return failed
+
+
+def _recheck(failed) -> None:
+    """Re-run failed steps in this thread, throttled; concurrent probes don't pile up."""
+    global _last_recheck
+    if time.monotonic() - _last_recheck < STARTUP_RECHECK_SECONDS or not _recheck_lock.acquire(blocking=False):
+        return
+    try:
+        _last_recheck = time.monotonic()
+        for name in failed:
+            step = STARTUP_REPORT["steps"][name]
+            try:
+                step["detail"] = WARMUP_STEPS[name]()
+                step["ok"] = True
+                print(f"[INFO] Startup step {name} recovered ({step['detail']})")
+            except Exception as e:
+                step["detail"] = f"{type(e).__name__}: {e}"
+    finally:
+        _recheck_lock.release()
+
+
+def readiness() -> Dict:
+    """Ready once warm-up has finished, every step passed and the NLU can serve requests."""
+    failed = []
+    if STARTUP_REPORT["complete"]:
+        failed = _failed_steps()
+        if failed:
+            _recheck(failed)
+            failed = _failed_steps()
+    ready = STARTUP_REPORT["complete"] and not failed and (is_nlu_loaded() or not WARM_NLU)
+    return {"ready": ready, "nlu_loaded": is_nlu_loaded(), "failed_steps": failed, **STARTUP_REPORT}
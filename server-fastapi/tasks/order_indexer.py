@@ -1,17 +1,188 @@
 # tasks/order_indexer.py
 from celery_app import celery_app
-import mysql.connector
-import requests, json, datetime, decimal
+import hashlib
+import json, os, time
+from typing import Dict, List
+from db.mysql_client import get_pooled_connection
+from solr_client import collection_url, get_sync_session
+from solr_query import SolrQuery, execute_sync, UNIQUE_KEY
+from order_items import build_order_docs, default_serializer, fetch_products, product_fields
+
+REDIS_URL = os.getenv("INDEXER_REDIS_URL", "redis://localhost:6379/0")
+
+# Batching indexer knobs
+INDEX_BATCH_SIZE = int(os.getenv("INDEX_BATCH_SIZE", "200"))          # flush at this many pending ids
+INDEX_BATCH_WINDOW = float(os.getenv("INDEX_BATCH_WINDOW", "2"))      # ... or after this many seconds
+INDEX_MAX_ATTEMPTS = int(os.getenv("INDEX_MAX_ATTEMPTS", "5"))
+INDEX_RETRY_DELAY = float(os.getenv("INDEX_RETRY_DELAY", "30"))
+INDEX_PENDING_KEY = "ecomcrm:index:pending"
+INDEX_SCHEDULED_KEY = "ecomcrm:index:flush_scheduled"
+INDEX_ATTEMPTS_KEY = "ecomcrm:index:attempts"
+INDEX_DEAD_KEY = "ecomcrm:index:dead_letter"
+INDEX_METRICS_KEY = "ecomcrm:index:metrics"
+
+PRODUCT_HASH_KEY = os.getenv("PRODUCT_HASH_KEY", "ecomcrm:product_hashes")
+REDENORMALIZE_BATCH = int(os.getenv("REDENORMALIZE_BATCH", "200"))
 
 # ----------------------
-# JSON Safe Serializer
+# Solr helpers
 # ----------------------
-def default_serializer(obj):
-    if isinstance(obj, (datetime.date, datetime.datetime)):
-        return obj.isoformat()
-    if isinstance(obj, decimal.Decimal):
-        return float(obj)
-    return str(obj)
+def post_to_solr(docs: List[dict], collection: str = "orderHistory"):
+    solr_url = collection_url(collection, "update") + "?commitWithin=2000"
+    return get_sync_session().post(
+        solr_url,
+        data=json.dumps(docs, default=default_serializer),
+        headers={"Content-Type": "application/json"},
+    )
+
+# ----------------------
+# Batching indexer
+# ----------------------
+# index_order_in_solr(order_id) only records the id in a Redis set and
+# schedules a flush; flush_order_index() drains up to INDEX_BATCH_SIZE ids
+# at a time: two IN (...) queries on a pooled MySQL connection, one
+# product lookup, one bulk JSON update. Re-indexing an id overwrites the
+# same Solr doc, so duplicates and retries are harmless.
+_redis_client = None
+
+def _redis():
+    global _redis_client
+    if _redis_client is None:
+        import redis
+        _redis_client = redis.Redis.from_url(REDIS_URL)
+    return _redis_client
+
+
+def _metric(**counts):
+    try:
+        pipe = _redis().pipeline()
+        for name, n in counts.items():
+            pipe.hincrbyfloat(INDEX_METRICS_KEY, name, n)
+        pipe.execute()
+    except Exception as e:
+        print(f"[Celery] ⚠️ Could not record indexer metrics: {e}")
+
+
+def indexer_stats() -> Dict:
+    """Counters, queue depth and dead letters for /indexer/stats."""
+    r = _redis()
+    raw = {k.decode(): float(v) for k, v in r.hgetall(INDEX_METRICS_KEY).items()}
+    seconds = raw.get("seconds", 0.0)
+    return {
+        **raw,
+        "docs_per_second": round(raw.get("docs", 0.0) / seconds, 2) if seconds else 0.0,
+        "pending": r.scard(INDEX_PENDING_KEY),
+        "dead_letter": r.scard(INDEX_DEAD_KEY),
+        "batch_size": INDEX_BATCH_SIZE,
+        "window_seconds": INDEX_BATCH_WINDOW,
+    }
+
+
+def _load_orders(order_ids: List[str]) -> List[dict]:
+    """Solr docs for the ids found in MySQL (headers + items, two IN queries)."""
+    placeholders = ", ".join(["%s"] * len(order_ids))
+    conn = get_pooled_connection()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(f"SELECT * FROM order_header WHERE order_id IN ({placeholders})", order_ids)
+        headers = cursor.fetchall()
+        cursor.execute(f"SELECT * FROM order_item WHERE order_id IN ({placeholders})", order_ids)
+        items = cursor.fetchall()
+        cursor.close()
+    finally:
+        conn.close()  # back to the pool
+
+    return build_order_docs(headers, items)
+
+
+def _retry_or_dead_letter(order_ids: List[str], reason: str):
+    """Per-id retry: re-queue ids below INDEX_MAX_ATTEMPTS, dead-letter the rest."""
+    r = _redis()
+    pipe = r.pipeline()
+    for oid in order_ids:
+        pipe.hincrby(INDEX_ATTEMPTS_KEY, oid, 1)
+    attempts = pipe.execute()
+
+    retry = [oid for oid, n in zip(order_ids, attempts) if n < INDEX_MAX_ATTEMPTS]
+    dead = [oid for oid, n in zip(order_ids, attempts) if n >= INDEX_MAX_ATTEMPTS]
+    if retry:
+        # Delayed, so a flush that is still draining doesn't pick them up again at once
+        requeue_orders.apply_async((retry,), countdown=INDEX_RETRY_DELAY)
+    if dead:
+        r.sadd(INDEX_DEAD_KEY, *dead)
+        r.hdel(INDEX_ATTEMPTS_KEY, *dead)
+        print(f"[Celery] ☠️ Dead-lettered {len(dead)} orders after {INDEX_MAX_ATTEMPTS} attempts: {dead[:10]} ({reason})")
+    _metric(retried=len(retry), dead_lettered=len(dead))
+
+
+def index_orders_bulk(order_ids: List[str]) -> Dict:
+    """Index a batch of orders; returns {indexed, missing, failed} id lists."""
+    started = time.perf_counter()
+    order_ids = list(dict.fromkeys(str(o) for o in order_ids))
+    docs = _load_orders(order_ids)
+    found = {str(d["order_id"]) for d in docs}
+    missing = [oid for oid in order_ids if oid not in found]
+    if missing:
+        print(f"[Celery] ⚠️ No order found for IDs {missing[:10]}")
+
+    indexed, failed = [], []
+    if docs:
+        response = post_to_solr(docs)
+        if response.status_code == 200:
+            indexed = [str(d["order_id"]) for d in docs]
+        elif len(docs) == 1:
+            print(f"[Celery] ❌ Solr indexing failed ({response.status_code}): {response.text[:200]}")
+            failed = [str(docs[0]["order_id"])]
+        else:
+            # One bad doc rejects the whole update: isolate it per id
+            print(f"[Celery] ❌ Bulk update failed ({response.status_code}), retrying per order: {response.text[:200]}")
+            for doc in docs:
+                oid = str(doc["order_id"])
+                try:
+                    ok = post_to_solr([doc]).status_code == 200
+                except Exception:
+                    ok = False
+                (indexed if ok else failed).append(oid)
+
+    elapsed = time.perf_counter() - started
+    _metric(batches=1, docs=len(indexed), missing=len(missing), failed=len(failed), seconds=elapsed)
+    if indexed:
+        try:
+            _redis().hdel(INDEX_ATTEMPTS_KEY, *indexed)
+        except Exception:
+            pass  # direct (no-Redis) indexing
+    print(f"[Celery] ✅ Indexed {len(indexed)}/{len(order_ids)} orders in {elapsed * 1000:.0f}ms "
+          f"({len(indexed) / elapsed if elapsed else 0:.0f} docs/s)")
+    return {"indexed": indexed, "missing": missing, "failed": failed}
+
+
+@celery_app.task(name="tasks.order_indexer.flush_order_index")
+def flush_order_index():
+    """Drain the pending set in batches (SPOP: each id is claimed by one worker)."""
+    r = _redis()
+    r.delete(INDEX_SCHEDULED_KEY)  # later enqueues schedule the next window
+    total = 0
+    while True:
+        raw = r.spop(INDEX_PENDING_KEY, INDEX_BATCH_SIZE)
+        if not raw:
+            return total
+        ids = [v.decode("utf-8") for v in raw]
+        try:
+            result = index_orders_bulk(ids)
+        except Exception as e:
+            print(f"[Celery] 🔥 Error during bulk indexing of {len(ids)} orders: {e}")
+            _retry_or_dead_letter(ids, str(e))
+            continue
+        if result["failed"]:
+            _retry_or_dead_letter(result["failed"], "rejected by Solr")
+        total += len(result["indexed"])
+
+
+@celery_app.task(name="tasks.order_indexer.requeue_orders")
+def requeue_orders(order_ids):
+    _redis().sadd(INDEX_PENDING_KEY, *order_ids)
+    flush_order_index.delay()
+
 
 # ----------------------
 # Celery Task Definition
@@ -19,68 +190,137 @@ def default_serializer(obj):
 @celery_app.task(name="tasks.order_indexer.index_order_in_solr")
 def index_order_in_solr(order_id):
     """
-    Fetch order details + items from MySQL and index as a single doc in Solr.
+    Queue an order for (re)indexing. The id joins the pending set and is
+    indexed by the next flush: after INDEX_BATCH_WINDOW seconds, or right
+    away once INDEX_BATCH_SIZE ids are waiting. Each order is indexed as a
+    single doc with its lines' product fields denormalized into item_*
+    arrays (see order_items.py) so the read path needs no product join.
     """
-    print(f"[Celery] 🔍 Fetching order {order_id} from MySQL...")
-
     try:
-        # ---------------------- MySQL Connection ----------------------
-        conn = mysql.connector.connect(
-            host="localhost",
-            user="sa",
-            password="nimda",
-            database="openvoice360"
-        )
-        cursor = conn.cursor(dictionary=True)
+        r = _redis()
+        pipe = r.pipeline()
+        pipe.sadd(INDEX_PENDING_KEY, str(order_id))
+        pipe.scard(INDEX_PENDING_KEY)
+        pipe.set(INDEX_SCHEDULED_KEY, 1, nx=True, ex=max(int(INDEX_BATCH_WINDOW) * 2, 1))
+        _, pending, first = pipe.execute()
+    except Exception as e:
+        # No Redis: index this order on its own
+        print(f"[Celery] ⚠️ Batch queue unavailable ({e}); indexing {order_id} directly")
+        return index_orders_bulk([order_id])
 
-        # Fetch order_header
-        cursor.execute("SELECT * FROM order_header WHERE order_id = %s", (order_id,))
-        order_header = cursor.fetchone()
+    if pending % INDEX_BATCH_SIZE == 0:
+        flush_order_index.delay()  # a full batch is waiting
+    elif first:
+        flush_order_index.apply_async(countdown=INDEX_BATCH_WINDOW)
+    print(f"[Celery] 🔍 Queued order {order_id} for indexing ({pending} pending)")
 
-        if not order_header:
-            print(f"[Celery] ⚠️ No order found for ID {order_id}")
-            return
+# ----------------------
+# Re-denormalization when products change
+# ----------------------
+@celery_app.task(
+    name="tasks.order_indexer.redenormalize_products",
+    autoretry_for=(Exception,), retry_backoff=True, max_retries=5,
+)
+def redenormalize_products(product_ids, product_hashes=None):
+    """
+    Rewrite the denormalized item_* product fields of every order that
+    contains one of product_ids, using atomic "set" updates.
+    product_hashes (from sweep_product_changes) are recorded only once
+    every order was rewritten, so a failed run is detected again by the
+    next sweep.
+    """
+    product_ids = [str(p).strip() for p in product_ids if p]
+    if not product_ids:
+        return 0
 
-        # Fetch order_items
-        cursor.execute("""
-            SELECT quantity, unit_price, total_price
-            FROM order_item WHERE order_id = %s
-        """, (order_id,))
-        order_items = cursor.fetchall()
+    updated = 0
+    for i in range(0, len(product_ids), REDENORMALIZE_BATCH):
+        chunk = product_ids[i:i + REDENORMALIZE_BATCH]
+        terms = " OR ".join(json.dumps(p) for p in chunk)
+        mark = "*"
+        while True:
+            result = execute_sync(SolrQuery(
+                collection="orderHistory",
+                fq=[f"item_product_id:({terms})"],
+                fl=f"{UNIQUE_KEY},item_product_id",
+                page_size=REDENORMALIZE_BATCH,
+                max_page_size=REDENORMALIZE_BATCH,
+                sort=f"{UNIQUE_KEY} asc",
+                cursor=mark,
+            ), normalize=False)
 
-        total_items = len(order_items)
-        total_items_value = sum([float(item["total_price"]) for item in order_items]) if order_items else 0.0
+            if result.docs:
+                line_ids = [d.get("item_product_id") or [] for d in result.docs]
+                products = fetch_products([pid for ids in line_ids for pid in ids])
+                updates = []
+                for doc, ids in zip(result.docs, line_ids):
+                    fields = product_fields(ids, products)
+                    updates.append({UNIQUE_KEY: doc[UNIQUE_KEY], **{f: {"set": v} for f, v in fields.items()}})
+                response = post_to_solr(updates)
+                response.raise_for_status()
+                updated += len(updates)
 
-        # ---------------------- Combine into one document ----------------------
-        doc = {
-            **order_header,  # merge header columns directly
-            "total_items": total_items,
-            "order_items_value": total_items_value,
-        }
+            if not result.next_cursor or result.next_cursor == mark:
+                break
+            mark = result.next_cursor
 
-        # ---------------------- Solr Indexing ----------------------
-        solr_url = "https://localhost:8983/solr/orderHistory/update?commitWithin=2000"
+    if product_hashes:
+        _redis().hset(PRODUCT_HASH_KEY, mapping=product_hashes)
+    print(f"[Celery] 🔁 Re-denormalized {updated} orders for {len(product_ids)} changed products")
+    return updated
 
-        payload = json.dumps([doc], default=default_serializer)
 
-        response = requests.post(
-            solr_url,
-            data=payload,
-            headers={"Content-Type": "application/json"},
-            auth=("solr", "SolrRocks"),
-            verify=False
-        )
+def _product_hash(doc: dict) -> str:
+    return hashlib.sha1(json.dumps(doc, sort_keys=True, default=str).encode("utf-8")).hexdigest()
 
-        if response.status_code == 200:
-            print(f"[Celery] ✅ Indexed {order_id} successfully in Solr.")
-        else:
-            print(f"[Celery] ❌ Solr indexing failed ({response.status_code}): {response.text}")
 
-    except Exception as e:
-        print(f"[Celery] 🔥 Error during Solr indexing for {order_id}: {e}")
+@celery_app.task(name="tasks.order_indexer.sweep_product_changes")
+def sweep_product_changes():
+    """
+    Detect catalog changes (products are loaded by the Spark ETL, outside
+    this app): hash every product's enrichment fields, compare with the
+    hashes recorded after the last successful re-denormalization (Redis),
+    and re-denormalize the orders of changed products.
+    The first run (no hashes recorded yet) only seeds the hashes: the
+    orders were denormalized from the current catalog when indexed.
+    """
+    r = _redis()
+    seeding = not r.exists(PRODUCT_HASH_KEY)
+    seeded = 0
+    changed: Dict[str, str] = {}
+    mark = "*"
+    while True:
+        result = execute_sync(SolrQuery(
+            collection="products",
+            profile="enrichment",
+            page_size=1000,
+            max_page_size=1000,
+            sort=f"{UNIQUE_KEY} asc",
+            cursor=mark,
+        ), normalize=False)
 
-    finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
+        if result.docs:
+            ids = [str(d[UNIQUE_KEY]) for d in result.docs]
+            hashes = [_product_hash(d) for d in result.docs]
+            if seeding:
+                r.hset(PRODUCT_HASH_KEY, mapping=dict(zip(ids, hashes)))
+                seeded += len(ids)
+            else:
+                previous = r.hmget(PRODUCT_HASH_KEY, ids)
+                changed.update({pid: h for pid, h, old in zip(ids, hashes, previous)
+                                if old is None or old.decode("utf-8") != h})
+
+        if not result.next_cursor or result.next_cursor == mark:
+            break
+        mark = result.next_cursor
 
+    if seeding:
+        print(f"[Celery] 🌱 Product sweep: seeded {seeded} product hashes (nothing re-denormalized)")
+        return 0
+    print(f"[Celery] 🔎 Product sweep: {len(changed)} new/changed products")
+    ids = list(changed)
+    for i in range(0, len(ids), REDENORMALIZE_BATCH):
+        chunk = ids[i:i + REDENORMALIZE_BATCH]
+        # hashes are written by the task once it succeeds
+        redenormalize_products.delay(chunk, {pid: changed[pid] for pid in chunk})
+    return len(changed)
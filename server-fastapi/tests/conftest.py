@@ -0,0 +1,6 @@
+# tests/conftest.py
+# Modules live at the top level of server-fastapi/ (run: python -m pytest -q tests)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,191 @@
+import datetime
+import re
+from types import SimpleNamespace
+
+import pytest
+
+import cdc_indexer
+from cdc_indexer import ChangeCapture, CheckpointStore, doc_hash, read_changes
+
+T0 = datetime.datetime(2025, 1, 1, 12, 0, 0)
+
+
+class FakeCursor:
+    """Answers read_changes / current_watermark from in-memory rows (MySQL semantics, no server)."""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.executed = []
+        self._result = []
+
+    def execute(self, sql, args=()):
+        self.executed.append((sql, tuple(args)))
+        table = re.search(r"FROM (\w+)", sql).group(1)
+        pk = {"order_header": "order_id", "order_item": "item_id"}[table]
+        rows = sorted(self.tables[table], key=lambda r: (r["updated_at"], str(r[pk])))
+        if sql.startswith("SELECT updated_at"):  # current_watermark
+            self._result = rows[-1:]
+            return
+        _, *mark, limit = args
+        if mark:
+            ts, _, last_pk = mark
+            rows = [r for r in rows if (r["updated_at"], str(r[pk])) > (ts, last_pk)]
+        self._result = [{"order_id": r["order_id"], "_cdc_ts": r["updated_at"], "_cdc_pk": r[pk]}
+                        for r in rows[:limit]]
+
+    def fetchall(self):
+        return list(self._result)
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def mysql(monkeypatch):
+    tables = {"order_header": [], "order_item": []}
+    conn = SimpleNamespace(cursor=lambda dictionary=True: FakeCursor(tables), close=lambda: None)
+    monkeypatch.setattr(cdc_indexer, "get_pooled_connection", lambda: conn)
+    return tables
+
+
+@pytest.fixture
+def solr(monkeypatch):
+    state = SimpleNamespace(orders={}, posts=[], status=200)
+
+    def load_orders(order_ids):
+        return [dict(state.orders[o]) for o in order_ids if o in state.orders]
+
+    def post_to_solr(docs, collection="orderHistory"):
+        if state.status == 200:
+            state.posts.append((collection, [d["id"] for d in docs]))
+        return SimpleNamespace(status_code=state.status, text="boom")
+
+    monkeypatch.setattr(cdc_indexer, "_load_orders", load_orders)
+    monkeypatch.setattr(cdc_indexer, "post_to_solr", post_to_solr)
+    return state
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CheckpointStore(str(tmp_path / "cdc.sqlite3"))
+    yield store
+    store.close()
+
+
+def _order(order_id, status="new", minutes=0):
+    return {"id": order_id, "order_id": order_id, "status": status, "updated_at": T0 + datetime.timedelta(minutes=minutes)}
+
+
+def test_checkpoints_survive_a_restart(tmp_path):
+    path = str(tmp_path / "cdc.sqlite3")
+    store = CheckpointStore(path)
+    store.save({"order_header": (T0, "17")}, {"orderHistory": {"17": "abc"}})
+    store.close()
+
+    store = CheckpointStore(path)
+    assert store.watermark("order_header") == (T0, "17")
+    assert store.watermark("order_item") is None
+    assert store.hashes("orderHistory", ["17", "18"]) == {"17": "abc"}
+    store.close()
+
+
+def test_read_changes_filters_past_the_watermark():
+    cursor = FakeCursor({"order_header": [
+        {"order_id": "1", "updated_at": T0},
+        {"order_id": "2", "updated_at": T0},       # same timestamp, later pk
+        {"order_id": "3", "updated_at": T0 + datetime.timedelta(seconds=1)},
+    ]})
+    assert [r["_cdc_pk"] for r in read_changes(cursor, "order_header", "order_id", "order_id", (None, None), 10)] \
+        == ["1", "2", "3"]
+    assert [r["_cdc_pk"] for r in read_changes(cursor, "order_header", "order_id", "order_id", (T0, "1"), 10)] \
+        == ["2", "3"]
+    sql, args = cursor.executed[-1]
+    assert "updated_at >= %s AND (updated_at > %s OR order_id > %s)" in sql
+    assert args == (cdc_indexer.CDC_LAG_SECONDS, T0, T0, "1", 10)
+
+
+def test_hash_ignores_updated_at():
+    assert doc_hash(_order("1", minutes=0)) == doc_hash(_order("1", minutes=5))
+    assert doc_hash(_order("1")) != doc_hash(_order("1", status="shipped"))
+
+
+def test_first_run_starts_at_the_current_end(mysql, store):
+    mysql["order_header"].append({"order_id": "1", "updated_at": T0})
+    ChangeCapture(store).init_watermarks()
+    assert store.watermark("order_header") == (T0, "1")
+    assert store.watermark("order_item") == (None, None)  # empty table
+
+
+def test_only_changed_docs_are_pushed(mysql, store, solr):
+    capture = ChangeCapture(store)
+    capture.init_watermarks(from_start=True)
+    mysql["order_header"] += [{"order_id": "1", "updated_at": T0}, {"order_id": "2", "updated_at": T0}]
+    solr.orders = {"1": _order("1"), "2": _order("2")}
+
+    assert capture.poll_once() == 2
+    assert solr.posts == [("orderHistory", ["1", "2"])]
+    assert store.watermark("order_header") == (T0, "2")
+
+    # both rows touched again, only order 2 really changed
+    mysql["order_header"] += [{"order_id": "1", "updated_at": T0 + datetime.timedelta(minutes=1)},
+                              {"order_id": "2", "updated_at": T0 + datetime.timedelta(minutes=1)}]
+    solr.orders["2"] = _order("2", status="shipped", minutes=1)
+    assert capture.poll_once() == 2
+    assert solr.posts[-1] == ("orderHistory", ["2"])
+    assert capture.stats()["unchanged"] == 1
+
+    assert capture.poll_once() == 0  # caught up
+
+
+def test_failed_push_does_not_advance_the_watermark(mysql, store, solr):
+    capture = ChangeCapture(store)
+    capture.init_watermarks(from_start=True)
+    mysql["order_item"].append({"order_id": "1", "item_id": "10", "updated_at": T0})
+    solr.orders = {"1": _order("1")}
+
+    solr.status = 500
+    with pytest.raises(RuntimeError):
+        capture.poll_once()
+    assert store.watermark("order_item") == (None, None)
+    assert store.hashes("orderHistory", ["1"]) == {}
+
+    solr.status = 200
+    assert capture.poll_once() == 1  # the same row again
+    assert solr.posts == [("orderHistory", ["1"])]
+    assert store.watermark("order_item") == (T0, "10")
+
+
+def test_once_mode_exits_non_zero_on_error(monkeypatch, tmp_path):
+    def broken():
+        raise ConnectionError("mysql down")
+
+    monkeypatch.setattr(cdc_indexer, "get_pooled_connection", broken)
+    assert cdc_indexer.main(["--once", "--state", str(tmp_path / "cdc.sqlite3")]) == 1
+
+
+def test_daemon_retries_after_transient_errors(monkeypatch, store):
+    capture = ChangeCapture(store)
+    outcomes = iter([ConnectionError("mysql gone away"), 0])
+    sleeps = []
+
+    def poll_once():
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 2:
+            raise KeyboardInterrupt  # stop after the successful pass
+
+    monkeypatch.setattr(capture, "init_watermarks", lambda from_start=False: None)
+    monkeypatch.setattr(capture, "poll_once", poll_once)
+    monkeypatch.setattr(cdc_indexer.time, "sleep", sleep)
+    with pytest.raises(KeyboardInterrupt):
+        capture.run(interval=1)
+    assert sleeps == [2, 1]  # backoff, then the normal interval
+    assert capture.stats()["errors"] == 1 and "mysql gone away" in capture.stats()["last_error"]
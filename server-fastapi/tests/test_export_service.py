@@ -0,0 +1,29 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routes.export import router
+from services.export_service import _filter_queries
+
+
+def test_plain_values_are_quoted_and_escaped():
+    fq = _filter_queries({"brand": 'Acme" OR *:*', "color": "C:\\blue", "material": None})
+    assert fq == ['brand:"Acme\\" OR *:*"', 'color:"C:\\\\blue"']
+
+
+def test_ranges_pass_through_when_numeric():
+    assert _filter_queries({"price": "[0 TO 500]"}) == ["price:[0 TO 500]"]
+    assert _filter_queries({"price": "{10.5 TO *]"}) == ["price:{10.5 TO *]"]
+
+
+@pytest.mark.parametrize("value", ["[0 TO 500] OR id:*", "[a TO z]", "{!join from=id}"])
+def test_malformed_ranges_are_rejected(value):
+    with pytest.raises(ValueError):
+        _filter_queries({"price": value})
+
+
+def test_export_route_answers_400_for_bad_range():
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    response = TestClient(app).get("/api/export/products", params={"price": "[0 TO 1] OR *:*"})
+    assert response.status_code == 400
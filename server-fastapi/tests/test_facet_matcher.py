@@ -0,0 +1,55 @@
+# tests/test_facet_matcher.py
+import pytest
+
+from facet_matcher import FacetMatcher
+from ngram_index import TrigramIndex
+
+FACETS = {
+    "color": ["Black", "Blue", "Red"],
+    "material": ["ABS Plastic", "Stainless Steel"],
+    "brand": ["Bosch", "Makita", "3M"],
+    "account_id": [f"ACC{i}" for i in range(1001, 1041)],
+    "order_id": [f"ORD-{i}" for i in range(10000, 10010)],
+}
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return FacetMatcher(FACETS)
+
+
+@pytest.mark.parametrize("text", [
+    "back 2 product",          # "back to products" after normalization
+    "go back 2 product",
+    "what about plastic",
+    "show me product",
+])
+def test_command_phrases_yield_no_facets(matcher, text):
+    assert matcher.match(text) == {}
+
+
+@pytest.mark.parametrize("text", ["order 4 acc1053", "order acc1099 shipped", "where is ord-10093"])
+def test_identifiers_never_fuzzy_match(matcher, text):
+    assert matcher.match(text) == {}
+
+
+def test_literal_hits(matcher):
+    assert matcher.match("order acc1003") == {"account_id": "ACC1003"}
+    assert matcher.match("ord-10003 status") == {"order_id": "ORD-10003"}
+    assert matcher.match("black bosch drill") == {"color": "Black", "brand": "Bosch"}
+
+
+@pytest.mark.parametrize("text,expected", [
+    ("makitta drill", {"brand": "Makita"}),
+    ("stainles steel sink", {"material": "Stainless Steel"}),
+    ("abs plastik bin", {"material": "ABS Plastic"}),
+])
+def test_fuzzy_typos_still_match(matcher, text, expected):
+    assert matcher.match(text) == expected
+
+
+def test_trigram_top_k_ranks_closest_first():
+    index = TrigramIndex(["stainless steel", "steel", "plastic", "stain"])
+    assert index.top_k("stainles steel", 1) == [0]
+    assert index.top_k("zzzz", 3) == []
+    assert 2 not in index.top_k("stainless", 4, min_dice=0.3)
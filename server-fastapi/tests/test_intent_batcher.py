@@ -0,0 +1,45 @@
+import asyncio
+
+from intent_batcher import IntentBatcher
+
+
+def _classify(texts):
+    return [(t.upper(), 1.0) for t in texts]
+
+
+def test_concurrent_calls_are_batched_and_answered():
+    batcher = IntentBatcher(_classify, window_ms=5, max_batch=8)
+
+    async def run():
+        return await asyncio.wait_for(asyncio.gather(*(batcher.classify(f"q{i}") for i in range(50))), 2)
+
+    results = asyncio.run(run())
+    assert results == [(f"Q{i}", 1.0) for i in range(50)]
+    assert batcher.items == 50 and batcher.batches < 50
+
+
+def test_no_request_lost_at_window_edges():
+    # arrivals spaced around the window so gets keep timing out mid-flight
+    batcher = IntentBatcher(_classify, window_ms=1, max_batch=4)
+
+    async def caller(i):
+        await asyncio.sleep((i % 7) * 0.0005)
+        return await asyncio.wait_for(batcher.classify(str(i)), 2)
+
+    async def run():
+        return await asyncio.gather(*(caller(i) for i in range(300)))
+
+    results = asyncio.run(run())
+    assert [r[0] for r in results] == [str(i) for i in range(300)]
+
+
+def test_cancelled_caller_does_not_block_the_batch():
+    batcher = IntentBatcher(_classify, window_ms=5, max_batch=8)
+
+    async def run():
+        doomed = asyncio.ensure_future(batcher.classify("gone"))
+        await asyncio.sleep(0)
+        doomed.cancel()
+        return await asyncio.wait_for(batcher.classify("kept"), 2)
+
+    assert asyncio.run(run()) == ("KEPT", 1.0)
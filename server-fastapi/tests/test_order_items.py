@@ -0,0 +1,127 @@
+import json
+from types import SimpleNamespace
+
+import order_items
+import tasks.order_indexer as order_indexer
+from order_items import build_order_docs, product_fields, read_items
+
+PRODUCTS = {
+    "P1": {"id": "P1", "name": "Cordless Drill", "brand": "Makita", "price": 99.5,
+           "material": "ABS Plastic", "color": "Teal", "weight": "1.8kg", "image_url": "p1.png"},
+    "P2": {"id": "P2", "name": "Gift Card", "brand": None, "price": None},  # no price / brand
+}
+
+HEADERS = [{"order_id": 1001, "account_id": "A1", "status": "shipped"}]
+ITEMS = [
+    {"order_id": 1001, "item_id": "I1", "product_id": "P1", "quantity": 2, "unit_price": 0, "total_price": 0},
+    {"order_id": 1001, "item_id": "I2", "product_id": "P2", "quantity": None, "unit_price": None, "total_price": 25},
+    {"order_id": 1001, "item_id": "I3", "product_id": "P9", "quantity": 1, "unit_price": 5, "total_price": 5},
+]
+
+
+def _solr_roundtrip(doc):
+    """What a stored doc looks like when read back: JSON, no nulls or "" in the arrays."""
+    doc = json.loads(json.dumps(doc, default=order_items.default_serializer))
+    for field, val in doc.items():
+        if isinstance(val, list):
+            assert None not in val and "" not in val, field
+    return doc
+
+
+def _build(monkeypatch):
+    monkeypatch.setattr(order_items, "fetch_products", lambda ids: PRODUCTS)
+    return build_order_docs(HEADERS, ITEMS)
+
+
+def test_doc_id_is_the_order_id(monkeypatch):
+    [doc] = _build(monkeypatch)
+    assert doc["id"] == "1001"
+    assert doc["total_items"] == 3
+    assert doc["order_items_value"] == 30.0
+
+
+def test_write_read_roundtrip(monkeypatch):
+    [doc] = _build(monkeypatch)
+    doc = _solr_roundtrip(doc)
+    lengths = {len(doc[f]) for f in list(order_items.ITEM_LINE_FIELDS.values()) + list(order_items.ITEM_PRODUCT_FIELDS)}
+    assert lengths == {3}  # arrays stay aligned
+
+    items, details = read_items(doc)
+    assert items == [
+        {"item_id": "I1", "product_id": "P1", "product_name": "Cordless Drill", "brand": "Makita",
+         "quantity": 2, "unit_price": 0.0, "total_price": 0.0},
+        {"item_id": "I2", "product_id": "P2", "product_name": "Gift Card", "brand": None,
+         "quantity": None, "unit_price": None, "total_price": 25.0},
+        {"item_id": "I3", "product_id": "P9", "product_name": None, "brand": None,
+         "quantity": 1, "unit_price": 5.0, "total_price": 5.0},
+    ]
+    assert [d["product_id"] for d in details] == ["P1", "P2"]  # P9 unknown at index time
+    assert details[0]["price"] == 99.5
+    assert details[1]["price"] is None  # missing, not 0
+
+
+def test_item_keys_match_items_json_shape(monkeypatch):
+    [doc] = _build(monkeypatch)
+    items, _ = read_items(_solr_roundtrip(doc))
+    # client-angular OrderItem
+    assert set(items[0]) == {"item_id", "product_id", "product_name", "brand", "quantity", "unit_price", "total_price"}
+
+
+def test_single_line_order_survives_flattening(monkeypatch):
+    monkeypatch.setattr(order_items, "fetch_products", lambda ids: PRODUCTS)
+    [doc] = build_order_docs(HEADERS, ITEMS[1:2])
+    doc = {k: v[0] if isinstance(v, list) and len(v) == 1 else v for k, v in _solr_roundtrip(doc).items()}
+    items, _ = read_items(doc)  # normalize_solr_doc turns one-item arrays into scalars
+    assert items[0]["quantity"] is None and items[0]["total_price"] == 25.0
+
+
+def test_product_fields_clear_stale_null_markers():
+    fields = product_fields(["P1"], PRODUCTS)
+    assert fields[order_items.PRODUCT_NULLS_FIELD] == []  # sent as {"set": []} by redenormalize
+    fields = product_fields(["P2"], PRODUCTS)
+    assert fields[order_items.PRODUCT_NULLS_FIELD] == ["item_price:0"]
+
+
+def test_legacy_docs_are_not_denormalized():
+    assert read_items({"id": "1", "items_json": "[]"}) is None
+
+
+# --------------------------------------------------------
+# sweep_product_changes
+# --------------------------------------------------------
+class _FakeRedis:
+    def __init__(self, hashes=None):
+        self.hashes = dict(hashes or {})
+
+    def exists(self, key):
+        return int(bool(self.hashes))
+
+    def hset(self, key, mapping):
+        self.hashes.update(mapping)
+
+    def hmget(self, key, ids):
+        return [self.hashes[i].encode("utf-8") if i in self.hashes else None for i in ids]
+
+
+def _sweep(monkeypatch, redis):
+    docs = [PRODUCTS["P1"], PRODUCTS["P2"]]
+    queued = []
+    monkeypatch.setattr(order_indexer, "_redis", lambda: redis)
+    monkeypatch.setattr(order_indexer, "execute_sync",
+                        lambda query, normalize=True: SimpleNamespace(docs=docs, next_cursor=query.cursor))
+    monkeypatch.setattr(order_indexer.redenormalize_products, "delay", lambda ids, hashes: queued.append(ids))
+    return order_indexer.sweep_product_changes(), queued
+
+
+def test_first_sweep_only_seeds_hashes(monkeypatch):
+    redis = _FakeRedis()
+    changed, queued = _sweep(monkeypatch, redis)
+    assert changed == 0 and queued == []
+    assert set(redis.hashes) == {"P1", "P2"}
+
+
+def test_sweep_redenormalizes_changed_products(monkeypatch):
+    redis = _FakeRedis({"P1": order_indexer._product_hash(PRODUCTS["P1"]), "P2": "stale"})
+    changed, queued = _sweep(monkeypatch, redis)
+    assert changed == 1 and queued == [["P2"]]
+    assert redis.hashes["P2"] == "stale"  # recorded by the task once it succeeds
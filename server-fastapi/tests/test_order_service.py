@@ -0,0 +1,36 @@
+import asyncio
+import json
+
+import services.order_service as order_service
+from solr_query import FL_PROFILES
+
+
+def test_list_profile_leaves_items_json_out():
+    assert "items_json" not in FL_PROFILES["orderHistory"]["list"]
+    assert "items_json" in FL_PROFILES["orderHistory"]["detail"]
+
+
+def test_legacy_orders_fetch_items_json_on_demand(monkeypatch):
+    requested = []
+
+    async def fetch_items_json(ids):
+        requested.append(ids)
+        return {"legacy": json.dumps([{"product_id": "P1", "quantity": 2, "unit_price": 3.5}])}
+
+    async def fetch_products_bulk(ids):
+        return {"P1": {"name": "Cordless Drill", "brand": "Makita", "price": 99.5}}
+
+    monkeypatch.setattr(order_service, "fetch_items_json", fetch_items_json)
+    monkeypatch.setattr(order_service, "fetch_products_bulk", fetch_products_bulk)
+
+    orders = [
+        {"id": "legacy", "order_id": "legacy"},
+        {"id": "new", "order_id": "new", "item_product_id": ["P1"], "item_name": ["Cordless Drill"],
+         "item_quantity": [1], "item_unit_price": [99.5], "item_total_price": [99.5]},
+    ]
+    asyncio.run(order_service.enrich_orders(orders))
+
+    assert requested == [["legacy"]]  # denormalized docs never need the blob
+    assert orders[0]["items"][0]["quantity"] == 2
+    assert orders[0]["product_details"][0]["name"] == "Cordless Drill"
+    assert orders[1]["items"][0]["product_name"] == "Cordless Drill"
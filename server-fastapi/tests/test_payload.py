@@ -0,0 +1,19 @@
+import pytest
+
+from routes.payload import payload_flag
+
+
+@pytest.mark.parametrize("value", [False, 0, "false", "False", " FALSE ", "0", "no", "off", ""])
+def test_false_values(value):
+    assert payload_flag({"includeFacets": value}, "includeFacets") is False
+
+
+@pytest.mark.parametrize("value", [True, 1, "true", "TRUE", "1", "yes", "on"])
+def test_true_values(value):
+    assert payload_flag({"includeFacets": value}, "includeFacets", default=False) is True
+
+
+@pytest.mark.parametrize("payload", [None, {}, {"includeFacets": None}])
+def test_missing_values_use_the_default(payload):
+    assert payload_flag(payload, "includeFacets") is True
+    assert payload_flag(payload, "includeFacets", default=False) is False
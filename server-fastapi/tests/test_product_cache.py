@@ -0,0 +1,133 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import product_cache as product_cache_module
+from product_cache import ProductCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class Loader:
+    """Records every call; knows the ids in `docs`."""
+
+    def __init__(self, docs, delay=0.0, fail=False):
+        self.docs = docs
+        self.delay = delay
+        self.fail = fail
+        self.calls = []
+
+    async def __call__(self, ids):
+        self.calls.append(sorted(ids))
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("solr down")
+        return {i: dict(self.docs[i]) for i in ids if i in self.docs}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(product_cache_module, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def test_hits_skip_the_loader(clock):
+    cache, loader = ProductCache(ttl=60, stale_ttl=600), Loader({"P1": {"v": 1}, "P2": {"v": 2}})
+
+    async def run():
+        first = await cache.get_many(["P1", "P2"], loader)
+        second = await cache.get_many(["P2", "P1"], loader)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second == {"P1": {"v": 1}, "P2": {"v": 2}}
+    assert loader.calls == [["P1", "P2"]]
+    assert cache.stats()["hits"] == 2
+
+
+def test_unknown_ids_are_cached_as_misses(clock):
+    cache, loader = ProductCache(ttl=60, stale_ttl=600), Loader({"P1": {"v": 1}})
+
+    async def run():
+        await cache.get_many(["P1", "NOPE"], loader)
+        return await cache.get_many(["NOPE"], loader)
+
+    assert asyncio.run(run()) == {}
+    assert loader.calls == [["NOPE", "P1"]]  # not re-queried
+
+
+def test_stale_entries_are_served_and_refreshed_in_background(clock):
+    cache, loader = ProductCache(ttl=60, stale_ttl=600), Loader({"P1": {"v": 1}})
+
+    async def run():
+        await cache.get_many(["P1"], loader)
+        loader.docs["P1"] = {"v": 2}
+        clock.now += 120  # past ttl, within stale_ttl
+        stale = await cache.get_many(["P1"], loader)
+        await asyncio.gather(*cache._refreshing)
+        fresh = await cache.get_many(["P1"], loader)
+        return stale, fresh
+
+    stale, fresh = asyncio.run(run())
+    assert stale == {"P1": {"v": 1}}   # no waiting on Solr
+    assert fresh == {"P1": {"v": 2}}
+    assert len(loader.calls) == 2 and cache.stats()["stale_hits"] == 1
+
+
+def test_entries_past_the_stale_window_are_reloaded(clock):
+    cache, loader = ProductCache(ttl=60, stale_ttl=600), Loader({"P1": {"v": 1}})
+
+    async def run():
+        await cache.get_many(["P1"], loader)
+        loader.docs["P1"] = {"v": 2}
+        clock.now += 601
+        return await cache.get_many(["P1"], loader)
+
+    assert asyncio.run(run()) == {"P1": {"v": 2}}
+    assert cache.stats()["misses"] == 2
+
+
+def test_concurrent_requests_share_one_load(clock):
+    cache, loader = ProductCache(), Loader({"P1": {"v": 1}}, delay=0.01)
+
+    async def run():
+        return await asyncio.gather(cache.get_many(["P1"], loader), cache.get_many(["P1"], loader))
+
+    assert asyncio.run(run()) == [{"P1": {"v": 1}}, {"P1": {"v": 1}}]
+    assert len(loader.calls) == 1 and cache.stats()["coalesced"] == 1
+
+
+def test_load_errors_propagate_and_are_not_cached(clock):
+    cache, loader = ProductCache(), Loader({"P1": {"v": 1}}, fail=True)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(cache.get_many(["P1"], loader))
+    loader.fail = False
+    assert asyncio.run(cache.get_many(["P1"], loader)) == {"P1": {"v": 1}}
+    assert cache.stats()["load_errors"] == 1 and cache.stats()["inflight"] == 0
+
+
+def test_bounded_by_entries_and_bytes(clock):
+    docs = {f"P{i}": {"name": "x" * 100} for i in range(10)}
+    cache, loader = ProductCache(maxsize=3), Loader(docs)
+
+    async def run(c):
+        for i in range(10):
+            await c.get_many([f"P{i}"], loader)
+
+    asyncio.run(run(cache))
+    assert len(cache) == 3 and cache.stats()["evictions"] == 7
+    assert set(cache._data) == {"P7", "P8", "P9"}  # least recently used went first
+
+    small = ProductCache(max_bytes=500)
+    asyncio.run(run(small))
+    assert small.stats()["bytes"] <= 500 and len(small) < 10
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+import product_loader as product_loader_module
+from product_loader import ProductLoader
+
+CATALOG = {f"P{i}": {"id": f"P{i}", "name": f"Product {i}"} for i in range(10)}
+
+
+@pytest.fixture
+def solr(monkeypatch):
+    calls = []
+
+    async def solr_get(collection, params, handler="select", timeout=None):
+        calls.append((collection, handler, params))
+        if any(i == "BOOM" for i in params["ids"].split(",")):
+            raise RuntimeError("solr down")
+        docs = [CATALOG[i] for i in params["ids"].split(",") if i in CATALOG]
+        return {"response": {"docs": docs}}
+
+    monkeypatch.setattr(product_loader_module, "solr_get", solr_get)
+    return calls
+
+
+def test_loads_in_one_tick_share_a_batch(solr):
+    loader = ProductLoader(profile="enrichment")
+
+    async def run():
+        return await asyncio.gather(loader.load("P1"), loader.load_many(["P2", "P3", "P1"]), loader.load("P9 "))
+
+    one, many, nine = asyncio.run(run())
+    assert one["name"] == "Product 1" and set(many) == {"P1", "P2", "P3"} and nine["id"] == "P9"
+    assert len(solr) == 1
+    collection, handler, params = solr[0]
+    assert (collection, handler) == ("products", "get")
+    assert sorted(params["ids"].split(",")) == ["P1", "P2", "P3", "P9"]  # deduplicated
+    assert params["fl"] == "id,name,brand,price,material,color,weight,image_url"
+
+
+def test_unknown_ids_are_omitted(solr):
+    loader = ProductLoader()
+    result = asyncio.run(loader.load_many(["P1", "NOPE", None, ""]))
+    assert list(result) == ["P1"]
+    assert asyncio.run(loader.load("NOPE")) is None
+
+
+def test_large_batches_are_chunked(solr):
+    loader = ProductLoader(chunk_size=3)
+    result = asyncio.run(loader.load_many(list(CATALOG)))
+    assert len(result) == 10
+    assert len(solr) == 4 and loader.stats()["batches"] == 1 and loader.stats()["solr_requests"] == 4
+
+
+def test_separate_ticks_are_separate_batches(solr):
+    loader = ProductLoader()
+
+    async def run():
+        await loader.load("P1")
+        await loader.load("P2")
+
+    asyncio.run(run())
+    assert len(solr) == 2
+
+
+def test_errors_reach_every_waiter(solr):
+    loader = ProductLoader()
+
+    async def run():
+        return await asyncio.gather(loader.load("P1"), loader.load("BOOM"), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
@@ -0,0 +1,96 @@
+# tests/test_rule_compiler.py
+# Differential test: the compiled engine must rewrite exactly like the
+# sequential re.sub chain over the same rules.
+import random
+import re
+import time
+
+from rule_compiler import STAGES, RewriteEngine, compile_rules, load_tables
+
+TABLES = load_tables(None)
+ENGINE = compile_rules(TABLES)
+
+
+def sequential(text: str) -> str:
+    for name, is_regex, ignore_case in STAGES:
+        for key, repl in TABLES[name].items():
+            pattern = key if is_regex else rf"\b{re.escape(key)}\b"
+            text = re.sub(pattern, repl, text, flags=re.IGNORECASE if ignore_case else 0)
+    return text
+
+
+def _vocabulary():
+    words = {"order", "tool", "drill", "g", "r", "ge", "or", "+", "and", "x", "steel", "blue"}
+    for table in TABLES.values():
+        for key, repl in table.items():
+            words.update(re.sub(r"\\[bsdw]|[\\^$*?()\[\]|{}]", " ", key).split())
+            words.update(repl.split())
+    return sorted(w for w in words if w)
+
+
+def test_chains_through_context():
+    for text in ["3mr g", "3mr r tool", "god rage cartridge", "broad loom two vinyll"]:
+        assert ENGINE.rewrite(text) == sequential(text), text
+
+
+def test_matches_sequential_on_random_utterances():
+    rng = random.Random(1234)
+    vocab = _vocabulary()
+    for _ in range(20000):
+        text = " ".join(rng.choice(vocab) for _ in range(rng.randint(1, 6)))
+        assert ENGINE.rewrite(text) == sequential(text), text
+
+
+# Rules that feed, overlap or can't be combined must still chain exactly
+SYNTHETIC = [
+    (r"\bab\b", "x y", False),            # feeds the next rule
+    (r"\by z\b", "w", False),
+    (r"\bfoo bar\b", "q", True),          # overlaps the next rule
+    (r"\bbar baz\b", "r", False),
+    (r"\bcolou?r\b", "hue", True),
+    (r"\bhue\b", "tint", False),
+    (r"(\w+) \1", r"\1", False),          # backreference: applied on its own
+    (r"\bm\b", "m.", False),              # replacement ends on a non-word character
+    (r"\bm\.\s*k\b", "mk", False),
+    (r"\bk\b", "kay", False),
+]
+
+
+def test_synthetic_rules_match_sequential():
+    engine = RewriteEngine([SYNTHETIC])
+    assert engine.segment_count < len(SYNTHETIC)
+    words = ["ab", "y", "z", "foo", "bar", "baz", "color", "colour", "hue", "m", "k", "x", "w", "."]
+    rng = random.Random(99)
+    for _ in range(20000):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(1, 6)))
+        expected = text
+        for pattern, repl, ic in SYNTHETIC:
+            expected = re.sub(pattern, repl, expected, flags=re.IGNORECASE if ic else 0)
+        assert engine.rewrite(text) == expected, text
+
+
+def test_benchmark_against_one_sub_per_rule():
+    compiled = [
+        re.compile(key if is_regex else rf"\b{re.escape(key)}\b", re.IGNORECASE if ignore_case else 0)
+        for name, is_regex, ignore_case in STAGES for key in TABLES[name]
+    ]
+    repls = [repl for name, _, _ in STAGES for repl in TABLES[name].values()]
+    rng = random.Random(7)
+    vocab = _vocabulary()
+    texts = [" ".join(rng.choice(vocab) for _ in range(rng.randint(3, 12))) for _ in range(5000)]
+
+    def per_rule(text):
+        for pattern, repl in zip(compiled, repls):
+            text = pattern.sub(repl, text)
+        return text
+
+    timings = {}
+    for label, fn in (("per-rule", per_rule), ("engine", ENGINE.rewrite)):
+        start = time.perf_counter()
+        for text in texts:
+            fn(text)
+        timings[label] = time.perf_counter() - start
+    print(f"\n[bench] {ENGINE.rule_count} rules in {ENGINE.segment_count} passes: "
+          f"per-rule {timings['per-rule'] * 1000:.1f} ms, engine {timings['engine'] * 1000:.1f} ms "
+          f"for {len(texts)} utterances")
+    assert timings["engine"] < timings["per-rule"]
@@ -0,0 +1,95 @@
+import pytest
+
+from solr_query import (
+    FL_PROFILES, MAX_PAGE_SIZE, SolrQuery, SolrResult,
+    cursor_paging, decode_cursor, encode_cursor, next_cursor_token, with_tiebreak,
+)
+
+
+def test_cache_key_ignores_parameter_and_value_order():
+    a = SolrQuery(collection="products", q="drill", fq=["brand:\"Bosch\"", "color:\"Blue\""],
+                  facet_fields=["brand", "color"])
+    b = SolrQuery(collection="products", q="drill", fq=["color:\"Blue\"", "brand:\"Bosch\"", "color:\"Blue\""],
+                  facet_fields=["color", "brand"])
+    assert a.cache_key() == b.cache_key()
+    assert a.cache_key().startswith("products?")
+
+
+def test_cache_key_separates_what_changes_the_result():
+    base = SolrQuery(collection="products", q="drill")
+    for other in (
+        SolrQuery(collection="orderHistory", q="drill"),
+        SolrQuery(collection="products", q="saw"),
+        SolrQuery(collection="products", q="drill", page=2),
+        SolrQuery(collection="products", q="drill", fq=["brand:\"Bosch\""]),
+        SolrQuery(collection="products", q="drill", sort="price asc"),
+        SolrQuery(collection="products", q="drill", profile="list"),
+    ):
+        assert other.cache_key() != base.cache_key()
+
+
+def test_to_params_keeps_facet_field_order_for_solr():
+    query = SolrQuery(collection="products", facet_fields=["color", "brand"])
+    assert [v for k, v in query.to_params() if k == "facet.field"] == ["color", "brand"]
+
+
+def test_facet_query_shares_one_key_across_pages_sorts_and_profiles():
+    one = SolrQuery(collection="products", q="drill", facet_fields=["brand"], profile="list", sort="price asc")
+    two = SolrQuery(collection="products", q="drill", facet_fields=["brand"], page=4, cursor="AoE", sort="name asc")
+    assert one.facet_query().cache_key() == two.facet_query().cache_key()
+    assert dict(one.facet_query().to_params())["rows"] == "0"
+    assert "facet.field" not in dict(one.docs_query().to_params())
+
+
+def test_paging_guards_and_profiles():
+    query = SolrQuery(collection="orderHistory", q="  ", page=0, page_size=10_000, profile="list")
+    assert query.q == "*:*" and query.page == 1 and query.page_size == MAX_PAGE_SIZE
+    assert query.fl == ",".join(FL_PROFILES["orderHistory"]["list"])
+    assert SolrQuery(collection="orderHistory", profile="list", fl="id").fl == "id"
+
+
+def test_results_page_count():
+    result = SolrResult(num_found=41, docs=[], facets={}, facet_queries={}, page=1, page_size=20)
+    assert result.total_pages == 3
+
+
+# --------------------------------------------------------
+# cursorMark paging
+# --------------------------------------------------------
+def test_cursor_tokens_round_trip():
+    token = encode_cursor("AoEjUDEwMDA=", 3)
+    assert "=" not in token
+    assert decode_cursor(token) == ("AoEjUDEwMDA=", 3)
+
+
+@pytest.mark.parametrize("token", ["not-a-token", encode_cursor("x", 1)[:-3], "eyJtIjoieCJ9"])
+def test_malformed_cursor_tokens_raise_value_error(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token)
+
+
+def test_cursor_paging():
+    assert cursor_paging(1, None) == ("*", 1)      # page 1 starts a cursor
+    assert cursor_paging(5, None) == (None, 5)     # deep page by number: start offset
+    assert cursor_paging(1, encode_cursor("AoE", 2)) == ("AoE", 2)
+
+
+def test_cursor_queries_sort_on_the_unique_key():
+    assert with_tiebreak(None) == "score desc,id asc"
+    assert with_tiebreak("price asc") == "price asc,id asc"
+    assert with_tiebreak("id desc") == "id desc"
+    params = dict(SolrQuery(collection="products", sort="price asc", cursor="*").to_params())
+    assert params["sort"] == "price asc,id asc" and params["cursorMark"] == "*" and "start" not in params
+
+
+def _result(num_found, next_cursor):
+    return SolrResult(num_found=num_found, docs=[], facets={}, facet_queries={}, page=1, page_size=20,
+                      next_cursor=next_cursor)
+
+
+def test_next_cursor_token_stops_on_the_last_page():
+    first = SolrQuery(collection="products", cursor="*", page_size=20)
+    assert decode_cursor(next_cursor_token(first, _result(45, "AoE"))) == ("AoE", 2)
+    assert next_cursor_token(first, _result(20, "AoE")) is None           # everything on this page
+    assert next_cursor_token(first, _result(45, "*")) is None             # cursor did not move
+    assert next_cursor_token(SolrQuery(collection="products"), _result(45, "AoE")) is None  # offset query
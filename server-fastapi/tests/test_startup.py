@@ -0,0 +1,52 @@
+import pytest
+
+pytest.importorskip("transformers")  # startup -> nlu_registry
+
+import startup  # noqa: E402
+
+
+def _report(monkeypatch, steps, nlu_loaded=True):
+    monkeypatch.setattr(startup, "is_nlu_loaded", lambda: nlu_loaded)
+    monkeypatch.setattr(startup, "_last_recheck", 0.0)
+    monkeypatch.setitem(startup.STARTUP_REPORT, "complete", True)
+    monkeypatch.setitem(startup.STARTUP_REPORT, "steps",
+                        {name: {"ok": ok, "ms": 1.0, "detail": None} for name, ok in steps.items()})
+
+
+def test_failed_step_keeps_app_not_ready(monkeypatch):
+    _report(monkeypatch, {"solr": False, "celery": True})
+    monkeypatch.setitem(startup.WARMUP_STEPS, "solr", lambda: 1 / 0)
+    report = startup.readiness()
+    assert report["ready"] is False
+    assert report["failed_steps"] == ["solr"]
+    assert report["steps"]["solr"]["detail"].startswith("ZeroDivisionError")
+
+
+def test_failed_step_recovers_on_recheck(monkeypatch):
+    _report(monkeypatch, {"solr": False, "celery": True})
+    monkeypatch.setitem(startup.WARMUP_STEPS, "solr", lambda: "OK")
+    report = startup.readiness()
+    assert report["ready"] is True and report["failed_steps"] == []
+
+
+def test_recheck_is_throttled(monkeypatch):
+    calls = []
+    _report(monkeypatch, {"celery": False})
+    monkeypatch.setitem(startup.WARMUP_STEPS, "celery", lambda: calls.append(1) or 1 / 0)
+    startup.readiness()
+    startup.readiness()
+    assert len(calls) == 1
+
+
+def test_nlu_timeout_is_fine_once_loaded(monkeypatch):
+    _report(monkeypatch, {"nlu": False, "solr": True})
+    assert startup.readiness()["ready"] is True
+    _report(monkeypatch, {"nlu": False, "solr": True}, nlu_loaded=False)
+    monkeypatch.setitem(startup.WARMUP_STEPS, "nlu", lambda: 1 / 0)
+    assert startup.readiness()["ready"] is False
+
+
+def test_not_ready_before_warm_up_completes(monkeypatch):
+    _report(monkeypatch, {})
+    monkeypatch.setitem(startup.STARTUP_REPORT, "complete", False)
+    assert startup.readiness()["ready"] is False
@@ -188,3 +188,9 @@ os.makedirs("./intent_model",exist_ok=True)
 trainer.save_model("./intent_model")
 tokenizer.save_pretrained("./intent_model")
 print(f"[OK] Saved intent model with {len(labels_unique)} labels.")
+
+# --- ONNX export for INTENT_BACKEND=onnx ---
+if os.getenv("EXPORT_ONNX", "true").lower() == "true":
+    from intent_backends import export_onnx
+    onnx_path = export_onnx(trainer.model, tokenizer, "./intent_model")
+    print(f"[OK] Exported ONNX model to {onnx_path}")